@@ -0,0 +1,243 @@
+from array import array
+from typing import List, Dict, Optional, Iterable, Iterator, Tuple, Union
+from bson import ObjectId
+from NetElements.Relations.Relations import BiRelation, UniRelation
+
+# relations added after the CSR arrays were built are kept in a per node overlay until it holds more than
+# max(DELTA_MIN_SIZE, number of relations // DELTA_FRACTION) relations, then the arrays are rebuilt
+DELTA_MIN_SIZE = 1024
+DELTA_FRACTION = 8
+
+
+class _TypeAdjacency:
+    """
+    Adjacency of a single relation type in compressed sparse row (CSR) form.
+    Edges are collected as parallel (source, target, relation) arrays and compacted into CSR arrays lazily
+    on the first traversal after a removal. Added edges are looked up in an overlay until it grows too large.
+    """
+
+    def __init__(self, directed: bool):
+        self.directed = directed
+        self.sources = array('q')
+        self.targets = array('q')
+        self.relation_ids: List[ObjectId] = list()
+
+        self._dirty = True
+        self._node_count = 0
+        self._out_indptr = array('q')
+        self._out_indices = array('q')
+        self._out_edges = array('q')
+        self._in_indptr = array('q')
+        self._in_indices = array('q')
+        self._in_edges = array('q')
+        # {node: [(neighbour, edge)]} of the edges added since the last build
+        self._delta_out: Dict[int, List[Tuple[int, int]]] = dict()
+        self._delta_in: Dict[int, List[Tuple[int, int]]] = dict()
+        self._delta_size = 0
+
+    def __len__(self):
+        return len(self.relation_ids)
+
+    def add(self, source: int, target: int, relation_id: ObjectId) -> None:
+        edge = len(self.relation_ids)
+        self.sources.append(source)
+        self.targets.append(target)
+        self.relation_ids.append(relation_id)
+        if self._dirty:
+            return
+        self._delta_out.setdefault(source, list()).append((target, edge))
+        if self.directed:
+            self._delta_in.setdefault(target, list()).append((source, edge))
+        else:
+            self._delta_out.setdefault(target, list()).append((source, edge))
+        self._delta_size += 1
+        if self._delta_size > max(DELTA_MIN_SIZE, len(self.relation_ids) // DELTA_FRACTION):
+            self._dirty = True
+
+    def remove(self, node_indices: Iterable[int] = (), relation_ids: Iterable[ObjectId] = ()) -> None:
+        node_indices = set(node_indices)
+        relation_ids = set(relation_ids)
+        keep = [
+            i for i in range(len(self.relation_ids))
+            if self.sources[i] not in node_indices
+            and self.targets[i] not in node_indices
+            and self.relation_ids[i] not in relation_ids
+        ]
+        if len(keep) == len(self.relation_ids):
+            return
+        self.sources = array('q', (self.sources[i] for i in keep))
+        self.targets = array('q', (self.targets[i] for i in keep))
+        self.relation_ids = [self.relation_ids[i] for i in keep]
+        self._dirty = True
+
+    @staticmethod
+    def _compress(node_count: int, rows: array, columns: array) -> Tuple[array, array, array]:
+        indptr = array('q', bytes(8 * (node_count + 1)))
+        for row in rows:
+            indptr[row + 1] += 1
+        for i in range(node_count):
+            indptr[i + 1] += indptr[i]
+        indices = array('q', bytes(8 * len(rows)))
+        edges = array('q', bytes(8 * len(rows)))
+        fill = array('q', indptr[:-1])
+        for edge, (row, column) in enumerate(zip(rows, columns)):
+            position = fill[row]
+            indices[position] = column
+            edges[position] = edge
+            fill[row] += 1
+        return indptr, indices, edges
+
+    def _build(self, node_count: int) -> None:
+        if self.directed:
+            self._out_indptr, self._out_indices, self._out_edges = self._compress(
+                node_count, self.sources, self.targets)
+            self._in_indptr, self._in_indices, self._in_edges = self._compress(
+                node_count, self.targets, self.sources)
+        else:
+            # bidirectional relations are stored in both directions in the outgoing arrays
+            self._out_indptr, self._out_indices, self._out_edges = self._compress(
+                node_count, self.sources + self.targets, self.targets + self.sources)
+            relation_count = len(self.relation_ids)
+            self._out_edges = array('q', (edge % relation_count for edge in self._out_edges))
+            self._in_indptr, self._in_indices, self._in_edges = self._out_indptr, self._out_indices, self._out_edges
+        self._node_count = node_count
+        self._delta_out = dict()
+        self._delta_in = dict()
+        self._delta_size = 0
+        self._dirty = False
+
+    def neighbours(self, node: int, node_count: int, outgoing: bool = True, incoming: bool = False) -> Iterator[Tuple[int, int]]:
+        """
+        Yields (neighbour index, edge index) tuples of a node.
+        :param node: The index of the node.
+        :param node_count: The number of nodes currently known to the index.
+        :param outgoing: Whether to follow relations in their direction.
+        :param incoming: Whether to follow relations against their direction.
+        """
+        if self._dirty:
+            self._build(node_count)
+        # nodes indexed after the build only have edges in the overlay
+        built = node < self._node_count
+        if outgoing or not self.directed:
+            if built:
+                for position in range(self._out_indptr[node], self._out_indptr[node + 1]):
+                    yield self._out_indices[position], self._out_edges[position]
+            yield from self._delta_out.get(node, ())
+        if incoming and self.directed:
+            if built:
+                for position in range(self._in_indptr[node], self._in_indptr[node + 1]):
+                    yield self._in_indices[position], self._in_edges[position]
+            yield from self._delta_in.get(node, ())
+
+
+class AdjacencyIndex:
+    """
+    In-process adjacency index of all relations, one CSR structure per relation type.
+    Node ids are mapped to dense integer indices, so traversals run without any database round trip.
+    """
+
+    def __init__(self):
+        self._node_ids: List[ObjectId] = list()
+        self._node_index: Dict[ObjectId, int] = dict()
+        self._types: Dict[ObjectId, _TypeAdjacency] = dict()
+
+    @classmethod
+    def from_relation_dicts(cls, uni_relation_dicts: Iterable[Dict], bi_relation_dicts: Iterable[Dict]):
+        """
+        Builds an index from (projected) relation documents.
+        :param uni_relation_dicts: Documents containing '_id', 'type', 'node_from' and 'node_to'.
+        :param bi_relation_dicts: Documents containing '_id', 'type', 'node_1' and 'node_2'.
+        :return: The new AdjacencyIndex.
+        """
+        index = cls()
+        for relation_dict in uni_relation_dicts:
+            index._add(relation_dict['type'], True, relation_dict['node_from'], relation_dict['node_to'],
+                       relation_dict['_id'])
+        for relation_dict in bi_relation_dicts:
+            index._add(relation_dict['type'], False, relation_dict['node_1'], relation_dict['node_2'],
+                       relation_dict['_id'])
+        return index
+
+    def __len__(self):
+        return sum(len(type_adjacency) for type_adjacency in self._types.values())
+
+    def _index_of(self, node_id: ObjectId) -> int:
+        index = self._node_index.get(node_id)
+        if index is None:
+            index = len(self._node_ids)
+            self._node_index[node_id] = index
+            self._node_ids.append(node_id)
+        return index
+
+    def _add(self, relation_type_id: ObjectId, uni: bool, node_1_id: ObjectId, node_2_id: ObjectId,
+             relation_id: ObjectId) -> None:
+        type_adjacency = self._types.get(relation_type_id)
+        if type_adjacency is None:
+            type_adjacency = self._types[relation_type_id] = _TypeAdjacency(directed=uni)
+        type_adjacency.add(self._index_of(node_1_id), self._index_of(node_2_id), relation_id)
+
+    def add_relation(self, relation: Union[UniRelation, BiRelation], relation_id: Optional[ObjectId] = None) -> None:
+        """
+        Adds a single relation to the index.
+        :param relation: The relation. Its id is used unless relation_id is given.
+        :param relation_id: The ID of the relation, if it is not set on the relation object.
+        """
+        self._add(relation.type, relation.is_uni, relation.node_1, relation.node_2,
+                  relation_id if relation_id is not None else relation.id)
+
+    def remove_nodes(self, node_ids: Iterable[ObjectId]) -> None:
+        """
+        Removes all relations from or to the given nodes.
+        :param node_ids: The IDs of the removed nodes.
+        """
+        node_indices = [self._node_index[node_id] for node_id in node_ids if node_id in self._node_index]
+        if not node_indices:
+            return
+        for type_adjacency in self._types.values():
+            type_adjacency.remove(node_indices=node_indices)
+
+    def remove_relations(self, relation_ids: Iterable[ObjectId]) -> None:
+        relation_ids = list(relation_ids)
+        for type_adjacency in self._types.values():
+            type_adjacency.remove(relation_ids=relation_ids)
+
+    def connected_nodes(self,
+                        start_node_id: ObjectId,
+                        relation_type_id: ObjectId,
+                        stop_at: Optional[ObjectId] = None,
+                        include_direction: bool = True,
+                        inverse_direction: bool = False,
+                        max_depth: Optional[int] = None,
+                        ) -> List[ObjectId]:
+        """
+        Breadth first search over the relations of one type.
+        :param start_node_id: The ID of the node to start at.
+        :param relation_type_id: The ID of the relation type to follow.
+        :param stop_at: Stop the search as soon as this node is found.
+        :param include_direction: Only follow unidirectional relations in one direction.
+        :param inverse_direction: Follow unidirectional relations against their direction instead.
+        :param max_depth: The maximal number of hops from the start node.
+        :return: List of the IDs of all visited nodes, including the start node.
+        """
+        type_adjacency = self._types.get(relation_type_id)
+        start = self._node_index.get(start_node_id)
+        if type_adjacency is None or start is None:
+            return [start_node_id]
+        stop = self._node_index.get(stop_at) if stop_at is not None else None
+        outgoing = not include_direction or not inverse_direction
+        incoming = not include_direction or inverse_direction
+        node_count = len(self._node_ids)
+
+        visited = {start}
+        current_nodes = [start]
+        depth = 0
+        while current_nodes and stop not in visited and (max_depth is None or depth < max_depth):
+            next_nodes = list()
+            for node in current_nodes:
+                for neighbour, _ in type_adjacency.neighbours(node, node_count, outgoing, incoming):
+                    if neighbour not in visited:
+                        visited.add(neighbour)
+                        next_nodes.append(neighbour)
+            current_nodes = next_nodes
+            depth += 1
+        return [self._node_ids[node] for node in visited]
@@ -0,0 +1,694 @@
+import asyncio
+import pymongo
+try:
+    from pymongo import AsyncMongoClient
+except ImportError:
+    # the asyncio API of pymongo needs pymongo 4.10 or newer
+    AsyncMongoClient = None
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
+from collections import Counter
+from itertools import islice, product
+from typing import List, Dict, Set, Tuple, Optional, Union, Iterable, AsyncIterator, Sequence
+from NetElements.Nodes.Node import Node, NodeView
+from NetElements.Relations.Relations import BiRelation, UniRelation, Relation, RelationType
+from KnowledgeNetBackend import KnowledgeNetBackend
+from MongoBackend import MongoBackend, AdjacencyStorage, INDEXES, INDEXES_FINGERPRINT, ENDPOINTS_BACKFILL
+from NameSearch import normalize_name
+from RelationTypeCache import RelationTypeCache
+
+
+class AsyncMongoBackend:
+    """
+    asyncio version of the MongoBackend with the same collections and methods.
+    Independent queries of one call run concurrently and many calls can be gathered over the shared connection pool
+    of the client. The queries and updates are built by the static helpers of MongoBackend.
+    Administration and analysis are left to a MongoBackend on the same database: the adjacency index and the
+    traversal modes, transactions, adjacency storage migrations, closure rebuilds, relation batches and the probable
+    path queries are intentionally not offered here.
+    """
+
+    def __init__(self, db_path, db_name='world', max_pool_size: int = 100):
+        """
+        :raises ImportError: If the installed pymongo has no asyncio API (before pymongo 4.10).
+        """
+        if AsyncMongoClient is None:
+            raise ImportError(f'AsyncMongoBackend requires pymongo 4.10 or newer, found pymongo {pymongo.version}')
+        self.client = AsyncMongoClient(db_path, maxPoolSize=max_pool_size)
+        self.db = self.client[db_name]
+        self.node_coll = self.db['nodes']
+        self.uni_rel_coll = self.db['uni_relations']
+        self.bi_rel_coll = self.db['bi_relations']
+        self.uni_rel_type_coll = self.db['uni_relation_types']
+        self.bi_rel_type_coll = self.db['bi_relation_types']
+        self.closure_coll = self.db['closure']
+        self.settings_coll = self.db['settings']
+        self._adjacency_storage: Optional[AdjacencyStorage] = None
+        self._name_search_fields = False
+        self.relation_type_cache = RelationTypeCache()
+        self._relation_type_lock = asyncio.Lock()
+
+    async def close(self) -> None:
+        await self.client.close()
+
+    async def adjacency_storage(self) -> AdjacencyStorage:
+        """
+        :return: The adjacency storage mode of the database, see MongoBackend.adjacency_storage. Databases without a
+        stored mode use AdjacencyStorage.EMBEDDED.
+        """
+        if self._adjacency_storage is None:
+            setting = await self.settings_coll.find_one({'_id': 'adjacency_storage'})
+            self._adjacency_storage = AdjacencyStorage.EMBEDDED if setting is None else \
+                AdjacencyStorage(setting['value'])
+        return self._adjacency_storage
+
+    async def _embedded_relations(self) -> bool:
+        return await self.adjacency_storage() == AdjacencyStorage.EMBEDDED
+
+    async def ensure_indexes(self, backfill: bool = True) -> None:
+        """
+        See MongoBackend.ensure_indexes. Unlike the MongoBackend, connecting does not create the indexes.
+        """
+        await asyncio.gather(*[
+            self.db[collection_name].create_indexes([pymongo.IndexModel(keys, name=name) for keys, name in indexes])
+            for collection_name, indexes in INDEXES.items()
+        ])
+        if backfill:
+            await asyncio.gather(self.backfill_relation_endpoints(), self.backfill_name_search())
+        await self.settings_coll.update_one({'_id': 'indexes'}, {'$set': {'value': INDEXES_FINGERPRINT}}, upsert=True)
+
+    async def backfill_relation_endpoints(self, batch_size: int = 1000) -> int:
+        """
+        See MongoBackend.backfill_relation_endpoints.
+        """
+        async def backfill(collection) -> int:
+            updated = 0
+            cursor = collection.find({'endpoints': {'$exists': False}}, {'_id': 1}, batch_size=batch_size)
+            batch = [relation['_id'] for relation in await cursor.to_list(batch_size)]
+            while batch:
+                result = await collection.update_many({'_id': {'$in': batch}}, ENDPOINTS_BACKFILL[collection.name])
+                updated += result.modified_count
+                batch = [relation['_id'] for relation in await cursor.to_list(batch_size)]
+            return updated
+
+        updated = sum(await asyncio.gather(backfill(self.uni_rel_coll), backfill(self.bi_rel_coll)))
+        await self.settings_coll.update_one({'_id': 'relation_endpoints'}, {'$set': {'value': True}}, upsert=True)
+        return updated
+
+    async def backfill_name_search(self, batch_size: int = 1000) -> int:
+        """
+        See MongoBackend.backfill_name_search.
+        """
+        updated = 0
+        cursor = self.node_coll.find({'name_normalized': {'$exists': False}}, {'name': 1}, batch_size=batch_size)
+        batch = await cursor.to_list(batch_size)
+        while batch:
+            result = await self.node_coll.bulk_write([MongoBackend._name_search_update(node_dict)
+                                                      for node_dict in batch], ordered=False)
+            updated += result.modified_count
+            batch = await cursor.to_list(batch_size)
+        await self.settings_coll.update_one({'_id': 'name_search'}, {'$set': {'value': True}}, upsert=True)
+        self._name_search_fields = True
+        return updated
+
+    async def name_search_fields(self) -> bool:
+        """
+        See MongoBackend.name_search_fields.
+        """
+        if not self._name_search_fields:
+            setting = await self.settings_coll.find_one({'_id': 'name_search'})
+            self._name_search_fields = setting is not None and setting['value']
+        return self._name_search_fields
+
+    # relation types
+    ################
+
+    async def add_rel_type(self, rel_type: RelationType) -> ObjectId:
+        rel_type_dict = rel_type.to_dict(include_id=rel_type.id is not None)
+        rel_type_dict['usage_count'] = 0
+        if rel_type.is_uni:
+            result = await self.uni_rel_type_coll.insert_one(rel_type_dict)
+        else:
+            result = await self.bi_rel_type_coll.insert_one(rel_type_dict)
+        if self.relation_type_cache.loaded:
+            self.relation_type_cache.add(RelationType.from_dict(rel_type_dict))
+        return result.inserted_id
+
+    def invalidate_relation_type_cache(self) -> None:
+        self.relation_type_cache.invalidate()
+
+    async def _load_relation_types(self) -> List[RelationType]:
+        uni_types, bi_types = await asyncio.gather(
+            self.uni_rel_type_coll.find().to_list(None),
+            self.bi_rel_type_coll.find().to_list(None))
+        return RelationType.from_dict_list(uni_types + bi_types)
+
+    async def _relation_types(self) -> RelationTypeCache:
+        # the lock keeps concurrent callers from loading the relation types more than once
+        async with self._relation_type_lock:
+            if not self.relation_type_cache.loaded:
+                self.relation_type_cache.load(await self._load_relation_types())
+        return self.relation_type_cache
+
+    async def get_relation_type(self, rel_type_id: ObjectId, uni: Optional[bool] = None) -> Optional[RelationType]:
+        relation_types = await self._relation_types()
+        generation = relation_types.generation
+        rel_type = relation_types.get(rel_type_id, uni)
+        if rel_type is None and not relation_types.knows(rel_type_id):
+            # one reload for all callers missing at the same time, see RelationTypeCache.reload
+            async with self._relation_type_lock:
+                if relation_types.generation == generation:
+                    relation_types.load(await self._load_relation_types())
+            rel_type = relation_types.get(rel_type_id, uni)
+        return rel_type
+
+    async def get_relation_type_name(self, rel_type_id: ObjectId, uni: bool) -> str:
+        return (await self.get_relation_type(rel_type_id, uni)).name
+
+    async def list_relationtypes_by_name(self, relation_type_name, uni) -> List[RelationType]:
+        return (await self._relation_types()).by_name(relation_type_name, uni)
+
+    async def get_uni_relationtypes(self, relation_ids: Optional[List[ObjectId]] = None) -> List[RelationType]:
+        if relation_ids is None:
+            return (await self._relation_types()).all(uni=True)
+        rel_types = [await self.get_relation_type(relation_id, uni=True) for relation_id in relation_ids]
+        return [rel_type for rel_type in rel_types if rel_type is not None]
+
+    async def get_bi_relationtypes(self, relation_ids: Optional[List[ObjectId]] = None) -> List[RelationType]:
+        if relation_ids is None:
+            return (await self._relation_types()).all(uni=False)
+        rel_types = [await self.get_relation_type(relation_id, uni=False) for relation_id in relation_ids]
+        return [rel_type for rel_type in rel_types if rel_type is not None]
+
+    async def get_relationtype_usage_numbers(self, relation_type_ids: List[ObjectId], uni: bool) -> Dict[ObjectId, int]:
+        type_coll, rel_coll = (self.uni_rel_type_coll, self.uni_rel_coll) if uni else \
+            (self.bi_rel_type_coll, self.bi_rel_coll)
+        usage_numbers = dict()
+        uncounted_ids = list()
+        async for rel_type_dict in type_coll.find({'_id': {'$in': relation_type_ids}}, {'usage_count': 1}):
+            if 'usage_count' in rel_type_dict:
+                usage_numbers[rel_type_dict['_id']] = rel_type_dict['usage_count']
+            else:
+                uncounted_ids.append(rel_type_dict['_id'])
+        if uncounted_ids:
+            usage_numbers.update({rel_type_id: 0 for rel_type_id in uncounted_ids})
+            async for group in await rel_coll.aggregate([{'$match': {'type': {'$in': uncounted_ids}}},
+                                                         {'$group': {'_id': '$type', 'count': {'$sum': 1}}}]):
+                usage_numbers[group['_id']] = group['count']
+        return usage_numbers
+
+    async def get_uni_relationtype_usage_number(self, relation_type_id: ObjectId) -> int:
+        return (await self.get_relationtype_usage_numbers([relation_type_id], uni=True)).get(relation_type_id, 0)
+
+    async def get_bi_relationtype_usage_number(self, relation_type_id: ObjectId) -> int:
+        return (await self.get_relationtype_usage_numbers([relation_type_id], uni=False)).get(relation_type_id, 0)
+
+    async def _increment_usage(self, counts: Dict[Tuple[bool, ObjectId], int]) -> None:
+        await asyncio.gather(*(
+            type_coll.bulk_write(updates, ordered=False)
+            for type_coll, updates in ((self.uni_rel_type_coll, MongoBackend._usage_updates(counts, True)),
+                                       (self.bi_rel_type_coll, MongoBackend._usage_updates(counts, False)))
+            if updates
+        ))
+
+    # nodes
+    #######
+
+    async def add_node(self, node: Node) -> ObjectId:
+        result = await self.node_coll.insert_one(MongoBackend._node_document(node, await self._embedded_relations()))
+        return result.inserted_id
+
+    async def add_nodes(self, nodes: Iterable[Node]) -> List[ObjectId]:
+        include_relations = await self._embedded_relations()
+        result = await self.node_coll.insert_many([MongoBackend._node_document(node, include_relations)
+                                                   for node in nodes])
+        return result.inserted_ids
+
+    async def delete_node(self, node_id: ObjectId) -> None:
+        """
+        Deletes a node and all relations to that node
+        :param node_id: The ID of the deleted node
+        """
+        await self.delete_nodes([node_id])
+
+    async def delete_nodes(self, node_ids: Iterable[ObjectId], batch_size: int = 1000) -> None:
+        """
+        Deletes nodes, all their relations and the IDs of these relations on the remaining neighbour nodes, see
+        MongoBackend.delete_nodes.
+        :param node_ids: The IDs of the deleted nodes.
+        :param batch_size: The number of nodes deleted per batch.
+        """
+        node_ids = iter(node_ids)
+        batch = list(islice(node_ids, batch_size))
+        while batch:
+            await self._delete_node_batch(batch)
+            batch = list(islice(node_ids, batch_size))
+
+    async def _delete_node_batch(self, node_ids: List[ObjectId]) -> None:
+        deleted = set(node_ids)
+        closure_affected = await self._closure_before_delete(node_ids)
+        uni_relations, bi_relations = await asyncio.gather(
+            self.uni_rel_coll.find(MongoBackend._touching_query(node_ids, uni=True),
+                                   {'node_from': 1, 'node_to': 1, 'type': 1}).to_list(None),
+            self.bi_rel_coll.find(MongoBackend._touching_query(node_ids, uni=False),
+                                  {'node_1': 1, 'node_2': 1, 'type': 1}).to_list(None),
+        )
+        writes = [self.node_coll.delete_many({'_id': {'$in': node_ids}})]
+        pulls = MongoBackend._pull_updates(uni_relations, bi_relations, deleted) \
+            if await self._embedded_relations() else []
+        if pulls:
+            writes.append(self.node_coll.bulk_write(pulls, ordered=False))
+        if uni_relations:
+            writes.append(self.uni_rel_coll.delete_many(
+                {'_id': {'$in': [relation['_id'] for relation in uni_relations]}}))
+        if bi_relations:
+            writes.append(self.bi_rel_coll.delete_many(
+                {'_id': {'$in': [relation['_id'] for relation in bi_relations]}}))
+        await asyncio.gather(*writes)
+        await self._increment_usage(MongoBackend._deleted_usage(uni_relations, bi_relations))
+        await self._closure_after_delete(node_ids, closure_affected)
+
+    async def _nodes_from_dicts(self, node_dicts: List[Dict]) -> List[Node]:
+        # in DERIVED databases the relation arrays are queried from the relation collections
+        if not await self._embedded_relations():
+            relation_ids = await self._relation_ids_of_nodes([node_dict['_id'] for node_dict in node_dicts])
+            for node_dict in node_dicts:
+                node_dict.update(relation_ids[node_dict['_id']])
+        return Node.from_dict_list(node_dicts)
+
+    async def get_node(self, node_id: ObjectId) -> Node:
+        node_dict = await self.node_coll.find_one({'_id': node_id})
+        return None if node_dict is None else (await self._nodes_from_dicts([node_dict]))[0]
+
+    async def get_nodes(self, node_ids: List[ObjectId]) -> List[Node]:
+        return await self._nodes_from_dicts(await self.node_coll.find({'_id': {'$in': node_ids}}).to_list(None))
+
+    async def list_nodes_by_name(self, node_name: str, sloppy: bool = False) -> List[Node]:
+        if sloppy:
+            query = MongoBackend._sloppy_name_query(node_name, not await self.name_search_fields())
+        else:
+            query = {'name': node_name}
+        return await self._nodes_from_dicts(await self.node_coll.find(query).to_list(None))
+
+    async def search_nodes(self,
+                           query: str,
+                           limit: int = 10,
+                           prefix: bool = False,
+                           min_similarity: float = 0.2,
+                           ) -> List[Tuple[Node, float]]:
+        """
+        See KnowledgeNetBackend.search_nodes, the nodes are always complete.
+        """
+        normalized_query = normalize_name(query)
+        projection = MongoBackend._search_projection(NodeView.FULL)
+        if prefix:
+            cursor = self.node_coll.find(MongoBackend._prefix_name_query(normalized_query),
+                                         dict(projection, name_normalized=1))
+            indexed = cursor.sort('name_normalized', pymongo.ASCENDING).limit(limit).to_list(None)
+        else:
+            indexed = self._aggregate(self.node_coll, MongoBackend._similar_names_pipeline(
+                normalized_query, projection, min_similarity, limit))
+        unindexed = self._no_documents()
+        if not await self.name_search_fields():
+            unindexed = self.node_coll.find(MongoBackend._unindexed_search_query(normalized_query, prefix),
+                                            projection).to_list(None)
+        node_dicts, scores = MongoBackend._search_results(normalized_query, limit, prefix, min_similarity,
+                                                          *await asyncio.gather(indexed, unindexed))
+        return list(zip(await self._nodes_from_dicts(node_dicts), scores))
+
+    @staticmethod
+    async def _aggregate(collection, pipeline: List[Dict]) -> List[Dict]:
+        return await (await collection.aggregate(pipeline)).to_list(None)
+
+    @staticmethod
+    async def _no_documents() -> List[Dict]:
+        return []
+
+    async def iter_nodes(self,
+                         name_prefix: Optional[str] = None,
+                         after: Optional[ObjectId] = None,
+                         limit: Optional[int] = None,
+                         fields: Sequence[str] = ('name',),
+                         batch_size: int = 1000,
+                         ) -> AsyncIterator[Dict]:
+        """
+        See KnowledgeNetBackend.iter_nodes.
+        """
+        cursor = self.node_coll.find(MongoBackend._iter_nodes_query(name_prefix, after),
+                                     {field: 1 for field in fields}, batch_size=batch_size)
+        cursor = cursor.sort('_id', pymongo.ASCENDING)
+        if limit:
+            cursor = cursor.limit(limit)
+        async for node_dict in cursor:
+            yield node_dict
+
+    async def get_all_node_names(self) -> List[str]:
+        return [node['name'] async for node in self.node_coll.find({}, {'name': 1})]
+
+    # relations
+    ###########
+
+    async def add_relation(self, relation: Union[UniRelation, BiRelation]) -> ObjectId:
+        KnowledgeNetBackend._check_relation(relation, await self.get_relation_type(relation.type, relation.is_uni))
+        embedded_relations = await self._embedded_relations()
+        if relation.is_uni:
+            relation_id = (await self.uni_rel_coll.insert_one(MongoBackend._relation_document(relation))).inserted_id
+            if embedded_relations:
+                await asyncio.gather(
+                    self.node_coll.update_one({'_id': relation.node_from}, {'$push': {'out_relations': relation_id}}),
+                    self.node_coll.update_one({'_id': relation.node_to}, {'$push': {'in_relations': relation_id}}),
+                )
+        else:
+            relation_id = (await self.bi_rel_coll.insert_one(MongoBackend._relation_document(relation))).inserted_id
+            if embedded_relations:
+                await asyncio.gather(
+                    self.node_coll.update_one({'_id': relation.node_1}, {'$push': {'bi_relations': relation_id}}),
+                    self.node_coll.update_one({'_id': relation.node_2}, {'$push': {'bi_relations': relation_id}}),
+                )
+        await self._increment_usage({(relation.is_uni, relation.type): 1})
+        await self._closure_after_add([relation])
+        return relation_id
+
+    async def add_relations(self,
+                            relations: Iterable[Union[UniRelation, BiRelation]],
+                            batch_size: int = 1000,
+                            ) -> Tuple[List[ObjectId], List[Tuple[int, Exception]]]:
+        """
+        Adds many relations in batches, see MongoBackend.add_relations. The inserts into both relation collections
+        of a batch run concurrently.
+        """
+        inserted_ids: List[ObjectId] = list()
+        failures: List[Tuple[int, Exception]] = list()
+        relations = iter(relations)
+        offset = 0
+        batch = list(islice(relations, batch_size))
+        while batch:
+            batch_ids, batch_failures = await self._add_relation_batch(batch, offset)
+            inserted_ids += batch_ids
+            failures += batch_failures
+            offset += len(batch)
+            batch = list(islice(relations, batch_size))
+        return inserted_ids, failures
+
+    async def _add_relation_batch(self,
+                                  relations: List[Union[UniRelation, BiRelation]],
+                                  offset: int,
+                                  ) -> Tuple[List[ObjectId], List[Tuple[int, Exception]]]:
+        type_keys = list({(relation.type, relation.is_uni) for relation in relations})
+        relation_types = dict(zip(type_keys, await asyncio.gather(*(
+            self.get_relation_type(rel_type_id, uni) for rel_type_id, uni in type_keys))))
+        pending, failures = MongoBackend._pending_relations(relations, offset, relation_types)
+
+        async def insert(uni: bool, collection) -> List[Tuple[int, Union[UniRelation, BiRelation], ObjectId]]:
+            if not pending[uni]:
+                return list()
+            error = None
+            try:
+                await collection.insert_many([relation_dict for _, _, relation_dict in pending[uni]], ordered=False)
+            except BulkWriteError as e:
+                error = e
+            return MongoBackend._inserted_relations(pending[uni], error, failures)
+
+        uni_inserted, bi_inserted = await asyncio.gather(insert(True, self.uni_rel_coll),
+                                                         insert(False, self.bi_rel_coll))
+        inserted = uni_inserted + bi_inserted
+        if inserted and await self._embedded_relations():
+            await self.node_coll.bulk_write(MongoBackend._push_updates(inserted), ordered=False)
+        await self._increment_usage(Counter((relation.is_uni, relation.type) for _, relation, _ in inserted))
+        await self._closure_after_add([relation for _, relation, _ in inserted])
+        inserted.sort(key=lambda insert: insert[0])
+        failures.sort(key=lambda failure: failure[0])
+        return [relation_id for _, _, relation_id in inserted], failures
+
+    async def _relation_ids_of_nodes(self, node_ids: List[ObjectId]) -> Dict[ObjectId, Dict[str, List[ObjectId]]]:
+        """
+        See MongoBackend._relation_ids_of_nodes.
+        """
+        uni_relations, bi_relations = await asyncio.gather(
+            self.uni_rel_coll.find(MongoBackend._touching_query(node_ids, uni=True),
+                                   {'node_from': 1, 'node_to': 1}).sort('_id', pymongo.ASCENDING).to_list(None),
+            self.bi_rel_coll.find(MongoBackend._touching_query(node_ids, uni=False),
+                                  {'node_1': 1, 'node_2': 1}).sort('_id', pymongo.ASCENDING).to_list(None),
+        )
+        return MongoBackend._relation_ids_by_node(node_ids, uni_relations, bi_relations)
+
+    async def get_relation_ids_of_node(self, node_id: ObjectId) -> Dict:
+        if not await self._embedded_relations():
+            if await self.node_coll.find_one({'_id': node_id}, {'_id': 1}) is None:
+                return None
+            return dict(_id=node_id, **(await self._relation_ids_of_nodes([node_id]))[node_id])
+        return await self.node_coll.find_one(
+            {'_id': node_id},
+            {'in_relations': 1, 'out_relations': 1, 'bi_relations': 1})
+
+    async def get_relation_objects_of_node(self, node_id: ObjectId) -> Dict:
+        if not await self._embedded_relations():
+            # one query per collection, without the detour over the relation ids
+            uni_relations, bi_relations = await self.get_relations_of_nodes([node_id])
+            return {
+                'in_relations': [relation for relation in uni_relations if relation.node_to == node_id],
+                'out_relations': [relation for relation in uni_relations if relation.node_from == node_id],
+                'bi_relations': bi_relations,
+            }
+        relations = await self.get_relation_ids_of_node(node_id)
+        in_relations, out_relations, bi_relations = await asyncio.gather(
+            self.uni_rel_coll.find({'_id': {'$in': relations['in_relations']}}).to_list(None),
+            self.uni_rel_coll.find({'_id': {'$in': relations['out_relations']}}).to_list(None),
+            self.bi_rel_coll.find({'_id': {'$in': relations['bi_relations']}}).to_list(None),
+        )
+        return {
+            'in_relations': Relation.from_dict_list(in_relations),
+            'out_relations': Relation.from_dict_list(out_relations),
+            'bi_relations': Relation.from_dict_list(bi_relations),
+        }
+
+    async def get_relation_info_of_node(self, node_id: ObjectId) -> Dict:
+        """
+        Same as KnowledgeNetBackend.get_relation_info_of_node.
+        """
+        relations = await self.get_relation_objects_of_node(node_id)
+        uni_types, bi_types, neighbours = await asyncio.gather(
+            self.get_uni_relationtypes(
+                list({relation.type for relation in relations['in_relations'] + relations['out_relations']})),
+            self.get_bi_relationtypes(list({relation.type for relation in relations['bi_relations']})),
+            self.get_nodes(KnowledgeNetBackend._neighbour_ids(node_id, relations)),
+        )
+        return KnowledgeNetBackend._join_relation_info(node_id, relations, uni_types, bi_types, neighbours)
+
+    async def get_relation_info_of_nodes(self, node_ids: List[ObjectId]) -> List[Dict]:
+        """
+        Runs get_relation_info_of_node for many nodes concurrently.
+        :param node_ids: The IDs of the nodes.
+        :return: The relation infos in the order of node_ids.
+        """
+        return list(await asyncio.gather(*[self.get_relation_info_of_node(node_id) for node_id in node_ids]))
+
+    async def get_relations_between(self, node_1_id: ObjectId, node_2_id: ObjectId) -> Tuple[List[UniRelation], List[BiRelation]]:
+        uni_relations, bi_relations = await asyncio.gather(
+            self.uni_rel_coll.find({'$or': [
+                {'node_from': node_1_id, 'node_to': node_2_id},
+                {'node_from': node_2_id, 'node_to': node_1_id},
+            ]}).to_list(None),
+            self.bi_rel_coll.find({'$or': [
+                {'node_1': node_1_id, 'node_2': node_2_id},
+                {'node_1': node_2_id, 'node_2': node_1_id},
+            ]}).to_list(None),
+        )
+        return Relation.from_dict_list(uni_relations), Relation.from_dict_list(bi_relations)
+
+    async def get_relations_between_many(self,
+                                         pairs: Iterable[Tuple[ObjectId, ObjectId]],
+                                         batch_size: int = 1000,
+                                         ) -> Dict[Tuple[ObjectId, ObjectId],
+                                                   Tuple[List[Tuple[RelationType, UniRelation]],
+                                                         List[Tuple[RelationType, BiRelation]]]]:
+        """
+        See KnowledgeNetBackend.get_relations_between_many.
+        """
+        results, requested_pairs = KnowledgeNetBackend._requested_pairs(pairs)
+        keys = iter(list(requested_pairs))
+        batch = list(islice(keys, batch_size))
+        while batch:
+            relations = await self._relations_between_pairs([requested_pairs[key][0] for key in batch])
+            type_keys = list({(relation.type, relation.is_uni) for relation in relations[0] + relations[1]})
+            relation_types = dict(zip(type_keys, await asyncio.gather(*(
+                self.get_relation_type(rel_type_id, uni) for rel_type_id, uni in type_keys))))
+            KnowledgeNetBackend._collect_pair_relations(results, requested_pairs, set(batch), relations,
+                                                        lambda rel_type_id, uni: relation_types[(rel_type_id, uni)])
+            batch = list(islice(keys, batch_size))
+        return results
+
+    async def _relations_between_pairs(self,
+                                       pairs: List[Tuple[ObjectId, ObjectId]],
+                                       ) -> Tuple[List[UniRelation], List[BiRelation]]:
+        queries = list(MongoBackend._pair_queries(pairs))
+        results = await asyncio.gather(*(collection.find(query).to_list(None)
+                                         for uni_query, bi_query in queries
+                                         for collection, query in ((self.uni_rel_coll, uni_query),
+                                                                   (self.bi_rel_coll, bi_query))))
+        return (Relation.from_dict_list([relation for result in results[0::2] for relation in result]),
+                Relation.from_dict_list([relation for result in results[1::2] for relation in result]))
+
+    async def get_relations_of_nodes(self,
+                                     node_ids: List[ObjectId],
+                                     relation_type_ids: Optional[List[ObjectId]] = None,
+                                     outgoing: bool = True,
+                                     incoming: bool = True,
+                                     ) -> Tuple[List[UniRelation], List[BiRelation]]:
+        """
+        See KnowledgeNetBackend.get_relations_of_nodes, the queries of both collections run concurrently.
+        """
+        uni_query, bi_query = MongoBackend._relations_of_nodes_queries(node_ids, relation_type_ids, outgoing,
+                                                                       incoming)
+        uni_relations, bi_relations = await asyncio.gather(
+            self.uni_rel_coll.find(uni_query).to_list(None) if uni_query is not None else self._no_documents(),
+            self.bi_rel_coll.find(bi_query).to_list(None),
+        )
+        return Relation.from_dict_list(uni_relations), Relation.from_dict_list(bi_relations)
+
+    # transitive closure
+    ####################
+    # the closure of the transitive relation types is maintained like in KnowledgeNetBackend, on the closure
+    # collection of the MongoBackend
+
+    async def _closure_neighbours(self, relation_type_id: ObjectId, node_ids: List[ObjectId],
+                                  targets: bool) -> Set[ObjectId]:
+        known, wanted = ('node_from', 'node_to') if targets else ('node_to', 'node_from')
+        return {pair[wanted] async for pair in self.closure_coll.find(
+            {'type': relation_type_id, known: {'$in': node_ids}}, {'_id': 0, wanted: 1})}
+
+    async def _closure_contains(self, relation_type_id: ObjectId, node_from_id: ObjectId,
+                                node_to_id: ObjectId) -> bool:
+        return await self.closure_coll.find_one(
+            {'type': relation_type_id, 'node_from': node_from_id, 'node_to': node_to_id}, {'_id': 1}) is not None
+
+    async def _add_closure_pairs(self, relation_type_id: ObjectId,
+                                 pairs: Iterable[Tuple[ObjectId, ObjectId]]) -> None:
+        pairs = iter(pairs)
+        batch = list(islice(pairs, 1000))
+        while batch:
+            await self.closure_coll.bulk_write(MongoBackend._closure_pair_updates(relation_type_id, batch),
+                                               ordered=False)
+            batch = list(islice(pairs, 1000))
+
+    async def _delete_closure_sources(self, relation_type_id: ObjectId, node_ids: List[ObjectId]) -> None:
+        await self.closure_coll.delete_many({'type': relation_type_id, 'node_from': {'$in': node_ids}})
+
+    async def _reachable_from(self, node_id: ObjectId, relation_type_id: ObjectId) -> Set[ObjectId]:
+        """
+        See KnowledgeNetBackend._reachable_from.
+        """
+        reached = set()
+        frontier = {node_id}
+        while frontier:
+            uni_relations, bi_relations = await self.get_relations_of_nodes(list(frontier), [relation_type_id],
+                                                                            outgoing=True, incoming=False)
+            neighbours = {relation.node_to for relation in uni_relations}
+            neighbours.update(relation.node_2 if relation.node_1 in frontier else relation.node_1
+                              for relation in bi_relations)
+            frontier = neighbours - reached
+            reached |= neighbours
+        return reached
+
+    async def _closure_after_add(self, relations: Iterable[Union[UniRelation, BiRelation]]) -> None:
+        """
+        See KnowledgeNetBackend._closure_after_add.
+        """
+        for relation in relations:
+            relation_type = await self.get_relation_type(relation.type, relation.is_uni)
+            if not relation_type.transitive or \
+                    await self._closure_contains(relation.type, relation.node_1, relation.node_2):
+                continue
+            if relation.is_uni:
+                sources, targets = await asyncio.gather(
+                    self._closure_neighbours(relation.type, [relation.node_1], targets=False),
+                    self._closure_neighbours(relation.type, [relation.node_2], targets=True))
+                sources.add(relation.node_1)
+                targets.add(relation.node_2)
+                await self._add_closure_pairs(relation.type, product(sources, targets))
+            else:
+                component = await self._closure_neighbours(relation.type, [relation.node_1, relation.node_2],
+                                                           targets=True)
+                component.update((relation.node_1, relation.node_2))
+                await self._add_closure_pairs(relation.type, product(component, component))
+
+    async def _closure_before_delete(self, node_ids: List[ObjectId]) -> Dict[RelationType, Set[ObjectId]]:
+        """
+        See KnowledgeNetBackend._closure_before_delete.
+        """
+        relation_types = await self._relation_types()
+        transitive_types = [relation_type for uni in (True, False) for relation_type in relation_types.all(uni)
+                            if relation_type.transitive]
+        affected = await asyncio.gather(*(
+            self._closure_neighbours(relation_type.id, node_ids, targets=not relation_type.is_uni)
+            for relation_type in transitive_types))
+        return dict(zip(transitive_types, affected))
+
+    async def _closure_after_delete(self, node_ids: List[ObjectId],
+                                    affected: Dict[RelationType, Set[ObjectId]]) -> None:
+        """
+        See KnowledgeNetBackend._closure_after_delete.
+        """
+        deleted = set(node_ids)
+        for relation_type, sources in affected.items():
+            sources -= deleted
+            await self._delete_closure_sources(relation_type.id, list(sources | deleted))
+            while sources:
+                source = sources.pop()
+                reached = await self._reachable_from(source, relation_type.id)
+                if relation_type.is_uni:
+                    await self._add_closure_pairs(relation_type.id, ((source, target) for target in reached))
+                else:
+                    await self._add_closure_pairs(relation_type.id, product(reached, reached))
+                    sources -= reached
+
+    # traversals
+    ############
+
+    async def get_all_uni_connected_nodes(self, start_node_id: ObjectId, relation_type_id: ObjectId, stop_at: Optional[ObjectId] = None, include_direction: bool = True, inverse_direction: bool = False) -> List[ObjectId]:
+        if include_direction:
+            from_field, to_field = ('node_to', 'node_from') if inverse_direction else ('node_from', 'node_to')
+            return await self._connected_nodes(self.uni_rel_coll, [(from_field, to_field)], start_node_id,
+                                               relation_type_id, stop_at)
+        return await self._connected_nodes(self.uni_rel_coll, [('node_from', 'node_to'), ('node_to', 'node_from')],
+                                           start_node_id, relation_type_id, stop_at)
+
+    async def get_all_bi_connected_nodes(self, start_node_id: ObjectId, relation_type_id: ObjectId, stop_at: Optional[ObjectId] = None) -> List[ObjectId]:
+        return await self._connected_nodes(self.bi_rel_coll, [('node_1', 'node_2'), ('node_2', 'node_1')],
+                                           start_node_id, relation_type_id, stop_at)
+
+    async def shortest_path(self,
+                            start_node_id: ObjectId,
+                            goal_node_id: ObjectId,
+                            relation_type_ids: Optional[List[ObjectId]] = None,
+                            max_depth: Optional[int] = None,
+                            directed: bool = False,
+                            ) -> Optional[Tuple[List[ObjectId], List[Union[UniRelation, BiRelation]]]]:
+        """
+        See KnowledgeNetBackend.shortest_path.
+        """
+        search = KnowledgeNetBackend._shortest_path_search(start_node_id, goal_node_id, max_depth, directed)
+        try:
+            frontier, outgoing, incoming = next(search)
+            while True:
+                frontier, outgoing, incoming = search.send(
+                    await self.get_relations_of_nodes(frontier, relation_type_ids, outgoing, incoming))
+        except StopIteration as stop:
+            return stop.value
+
+    async def _connected_nodes(self, collection, directions: List[Tuple[str, str]], start_node_id: ObjectId,
+                               relation_type_id: ObjectId, stop_at: Optional[ObjectId]) -> List[ObjectId]:
+        # breadth first search; the queries for the different directions of one hop run concurrently
+        visited_nodes = set()
+        current_nodes = {start_node_id}
+        while current_nodes and (stop_at is None or stop_at not in visited_nodes):
+            results = await asyncio.gather(*[
+                collection.find({from_field: {'$in': list(current_nodes)}, 'type': relation_type_id},
+                                {'_id': 0, to_field: 1}).to_list(None)
+                for from_field, to_field in directions
+            ])
+            visited_nodes |= current_nodes
+            current_nodes = {result_elem[to_field]
+                             for (_, to_field), result in zip(directions, results) for result_elem in result}
+            current_nodes -= visited_nodes
+        return list(visited_nodes)
@@ -0,0 +1,134 @@
+from typing import List, Dict, Optional, Iterable, Any
+from bson import ObjectId
+import numpy
+import scipy.sparse
+import scipy.sparse.csgraph
+from KnowledgeNetBackend import KnowledgeNetBackend
+
+
+class SparseGraph:
+    """
+    The relations of a KnowledgeNet as a SciPy sparse adjacency matrix, together with the mapping between node IDs
+    and matrix rows. Entry (i, j) is the number of relations (or the sum of their probabilities) from row i to row j.
+    Bidirectional relations are entered in both directions.
+    """
+
+    def __init__(self, node_ids: List[ObjectId], matrix: scipy.sparse.csr_matrix):
+        self.node_ids = node_ids
+        self.rows: Dict[ObjectId, int] = {node_id: row for row, node_id in enumerate(node_ids)}
+        self.matrix = matrix
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    @classmethod
+    def from_backend(cls,
+                     backend: KnowledgeNetBackend,
+                     relation_type_ids: Optional[List[ObjectId]] = None,
+                     uni: bool = True,
+                     bi: bool = True,
+                     weighted: bool = False,
+                     include_isolated: bool = False,
+                     ):
+        """
+        Streams the relations into a sparse matrix. The node IDs of the relations are mapped to rows in a vectorized
+        way on their packed 12 byte representation (see RelationBatch.as_numpy).
+        :param backend: The backend to read from.
+        :param relation_type_ids: Only export relations of these (uni or bi) types. All types if None.
+        :param uni: Export the unidirectional relations.
+        :param bi: Export the bidirectional relations.
+        :param weighted: Weight the entries by the probability of the relations instead of 1.
+        :param include_isolated: Also give a row to nodes without exported relations.
+        :return: The SparseGraph.
+        """
+        sources, targets, weights = list(), list(), list()
+        for is_uni in [direction for direction, selected in ((True, uni), (False, bi)) if selected]:
+            batch = backend.get_relation_batch(is_uni, relation_type_ids)
+            if not len(batch):
+                continue
+            columns = batch.as_numpy()
+            nodes_1 = columns['nodes_1'].copy().view('V12').ravel()
+            nodes_2 = columns['nodes_2'].copy().view('V12').ravel()
+            probabilities = columns['probabilities'] if weighted else numpy.ones(len(batch))
+            sources.append(nodes_1)
+            targets.append(nodes_2)
+            weights.append(probabilities.copy())
+            if not is_uni:
+                sources.append(nodes_2)
+                targets.append(nodes_1)
+                weights.append(probabilities.copy())
+
+        endpoints = [numpy.concatenate(sources + targets)] if sources else []
+        if include_isolated:
+            endpoints.append(numpy.array([node['_id'].binary for node in backend.iter_nodes(fields=('_id',))],
+                                         dtype='V12'))
+        if not endpoints:
+            return cls(list(), scipy.sparse.csr_matrix((0, 0)))
+        unique_nodes, inverse = numpy.unique(numpy.concatenate(endpoints), return_inverse=True)
+        node_ids = [ObjectId(node.tobytes()) for node in unique_nodes]
+        edge_count = sum(len(column) for column in sources)
+        matrix = scipy.sparse.coo_matrix(
+            (numpy.concatenate(weights) if weights else numpy.zeros(0),
+             (inverse[:edge_count], inverse[edge_count:2 * edge_count])),
+            shape=(len(node_ids), len(node_ids))).tocsr()
+        return cls(node_ids, matrix)
+
+    def to_dict(self, values: Iterable[Any]) -> Dict[ObjectId, Any]:
+        """
+        :param values: One value per row, e.g. the result of an analytics method.
+        :return: {node ID: value}
+        """
+        return {node_id: value.item() if hasattr(value, 'item') else value
+                for node_id, value in zip(self.node_ids, values)}
+
+    # analytics
+    ###########
+
+    def out_degrees(self) -> numpy.ndarray:
+        return numpy.asarray(self.matrix.sum(axis=1)).ravel()
+
+    def in_degrees(self) -> numpy.ndarray:
+        return numpy.asarray(self.matrix.sum(axis=0)).ravel()
+
+    def pagerank(self, damping: float = 0.85, tolerance: float = 1e-10, max_iterations: int = 100) -> numpy.ndarray:
+        """
+        PageRank by power iteration. Nodes without outgoing relations distribute their rank over all nodes.
+        :param damping: The probability of following a relation instead of jumping to a random node.
+        :param tolerance: Stop once the L1 change of the ranks is below this value.
+        :param max_iterations: The maximal number of iterations.
+        :return: The rank of every row, summing up to 1.
+        """
+        node_count = len(self)
+        if node_count == 0:
+            return numpy.zeros(0)
+        out_degrees = self.out_degrees()
+        dangling = out_degrees == 0
+        inverse_degrees = numpy.divide(1.0, out_degrees, out=numpy.zeros(node_count), where=~dangling)
+        # transposed transition matrix, so that one iteration is a single sparse matrix vector product
+        transition = (scipy.sparse.diags(inverse_degrees) @ self.matrix).T.tocsr()
+        ranks = numpy.full(node_count, 1.0 / node_count)
+        for _ in range(max_iterations):
+            new_ranks = damping * (transition @ ranks + ranks[dangling].sum() / node_count) + (1 - damping) / node_count
+            change = numpy.abs(new_ranks - ranks).sum()
+            ranks = new_ranks
+            if change < tolerance:
+                break
+        return ranks
+
+    def connected_components(self) -> numpy.ndarray:
+        """
+        :return: The component label of every row. Relation directions are ignored (weak components).
+        """
+        _, labels = scipy.sparse.csgraph.connected_components(self.matrix, directed=True, connection='weak')
+        return labels
+
+
+def write_node_field(backend: KnowledgeNetBackend, graph: SparseGraph, field: str, values: Iterable[Any]) -> None:
+    """
+    Stores one value per row of the graph as a field of the nodes.
+    :param backend: The backend the graph was exported from.
+    :param graph: The graph.
+    :param field: The name of the node field, e.g. 'pagerank'.
+    :param values: One value per row of the graph.
+    """
+    backend.set_node_field(field, graph.to_dict(values))
@@ -0,0 +1,893 @@
+import heapq
+import math
+from abc import ABC, abstractmethod
+from itertools import count, islice, product
+from bson import ObjectId
+from typing import List, Dict, Set, Tuple, Optional, Union, Iterable, Iterator, Sequence, Any, Callable, Generator
+import KnowledgeNetExceptions
+from NetElements.Nodes.Node import Node, NodeView
+from NetElements.Relations.Relations import BiRelation, UniRelation, RelationType
+from NetElements.Relations.RelationBatch import RelationBatch
+from RelationTypeCache import RelationTypeCache
+from KnowledgeNetConfig import load_config
+
+# node fields which are managed by the backend and can not be set with set_node_field
+RESERVED_NODE_FIELDS = ('_id', 'name', 'description', 'in_relations', 'out_relations', 'bi_relations',
+                        'name_normalized', 'name_trigrams')
+
+
+class KnowledgeNetBackend(ABC):
+    """
+    Storage interface of the KnowledgeNet. Implementations store nodes, relations and relation types and return
+    them as Node, UniRelation, BiRelation and RelationType objects.
+    Relation type lookups are served from a RelationTypeCache, all other methods are implemented per storage engine.
+    """
+    # whether one instance may be used from several threads at once
+    thread_safe = False
+
+    def __init__(self):
+        self.relation_type_cache = RelationTypeCache()
+
+    def ensure_indexes(self) -> None:
+        """
+        Creates the indexes the backend relies on, if they do not exist yet.
+        """
+        pass
+
+    def index_report(self) -> Dict[str, Dict[str, List[str]]]:
+        """
+        :return: {collection name: {'missing': [index names], 'unused': [index names]}}
+        """
+        return dict()
+
+    def set_profiler(self, profiler) -> None:
+        """
+        Collects statistics of the database commands issued by the backend methods, see QueryInstrumentation.
+        :param profiler: The QueryProfiler.
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not support query profiling')
+
+    # relation types
+    ################
+
+    @abstractmethod
+    def add_rel_type(self, rel_type: RelationType) -> ObjectId:
+        """
+        Stores a relation type. The ID of rel_type is kept if it is set, otherwise a new one is assigned.
+        """
+        pass
+
+    @abstractmethod
+    def _load_relation_types(self) -> List[RelationType]:
+        """
+        :return: All relation types from the storage.
+        """
+        pass
+
+    def invalidate_relation_type_cache(self) -> None:
+        """
+        Empties the relation type cache. It is reloaded on the next relation type lookup.
+        Needed when relation types were changed by another process.
+        """
+        self.relation_type_cache.invalidate()
+
+    def _relation_types(self) -> RelationTypeCache:
+        if not self.relation_type_cache.loaded:
+            self.relation_type_cache.ensure_loaded(self._load_relation_types)
+        return self.relation_type_cache
+
+    def get_relation_type(self, rel_type_id: ObjectId, uni: Optional[bool] = None) -> Optional[RelationType]:
+        """
+        Returns a relation type from the relation type cache. The cache is reloaded once if no relation type of
+        either direction has the id, e.g. because another process added it.
+        :param rel_type_id: The ID of the relation type.
+        :param uni: If given, only relation types of this direction are returned.
+        :return: The relation type or None if there is no such relation type.
+        """
+        relation_types = self._relation_types()
+        generation = relation_types.generation
+        rel_type = relation_types.get(rel_type_id, uni)
+        if rel_type is None and not relation_types.knows(rel_type_id):
+            relation_types.reload(self._load_relation_types, generation)
+            rel_type = relation_types.get(rel_type_id, uni)
+        return rel_type
+
+    def get_relation_type_name(self, rel_type_id: ObjectId, uni: bool) -> str:
+        return self.get_relation_type(rel_type_id, uni).name
+
+    def list_relationtypes_by_name(self, relation_type_name, uni):
+        return self._relation_types().by_name(relation_type_name, uni)
+
+    def get_uni_relationtypes(self, relation_ids: Optional[List[ObjectId]] = None) -> List[RelationType]:
+        if relation_ids is None:
+            return self._relation_types().all(uni=True)
+        rel_types = [self.get_relation_type(relation_id, uni=True) for relation_id in relation_ids]
+        return [rel_type for rel_type in rel_types if rel_type is not None]
+
+    def get_bi_relationtypes(self, relation_ids: Optional[List[ObjectId]] = None) -> List[RelationType]:
+        if relation_ids is None:
+            return self._relation_types().all(uni=False)
+        rel_types = [self.get_relation_type(relation_id, uni=False) for relation_id in relation_ids]
+        return [rel_type for rel_type in rel_types if rel_type is not None]
+
+    @abstractmethod
+    def get_relationtype_usage_numbers(self, relation_type_ids: List[ObjectId], uni: bool) -> Dict[ObjectId, int]:
+        """
+        Reads the usage counters which the backend maintains on the relation types.
+        :param relation_type_ids: The IDs of the relation types.
+        :param uni: Whether the relation types are unidirectional.
+        :return: {relation type ID: number of relations of the type}
+        """
+        pass
+
+    @abstractmethod
+    def rebuild_relation_type_usage(self) -> None:
+        """
+        Recounts the relations of every relation type and overwrites the usage counters.
+        """
+        pass
+
+    def get_uni_relationtype_usage_number(self, relation_type_id: ObjectId) -> int:
+        return self.get_relationtype_usage_numbers([relation_type_id], uni=True).get(relation_type_id, 0)
+
+    def get_bi_relationtype_usage_number(self, relation_type_id: ObjectId) -> int:
+        return self.get_relationtype_usage_numbers([relation_type_id], uni=False).get(relation_type_id, 0)
+
+    # nodes
+    #######
+
+    @abstractmethod
+    def add_node(self, node: Node) -> ObjectId:
+        pass
+
+    @abstractmethod
+    def add_nodes(self, nodes: Iterable[Node]) -> List[ObjectId]:
+        """
+        Stores nodes. The IDs of the nodes are kept if they are set, otherwise new ones are assigned.
+        """
+        pass
+
+    def delete_node(self, node_id: ObjectId) -> None:
+        """
+        Deletes a node and all relations to that node
+        :param node_id: The ID of the deleted node
+        """
+        self.delete_nodes([node_id])
+
+    @abstractmethod
+    def delete_nodes(self, node_ids: Iterable[ObjectId], batch_size: int = 1000) -> None:
+        """
+        Deletes nodes and all relations to these nodes.
+        :param node_ids: The IDs of the deleted nodes.
+        :param batch_size: The number of nodes deleted per batch.
+        """
+        pass
+
+    @abstractmethod
+    def get_node(self, node_id: ObjectId, view: NodeView = NodeView.FULL) -> Node:
+        """
+        :param view: NodeView.SUMMARY only fetches the id, name and description. The relation id arrays of the
+        node are then loaded on first access.
+        """
+        pass
+
+    @abstractmethod
+    def get_nodes(self, node_ids: List[ObjectId], view: NodeView = NodeView.FULL) -> List[Node]:
+        pass
+
+    @abstractmethod
+    def list_nodes_by_name(self, node_name: str, sloppy: bool = False, view: NodeView = NodeView.FULL) -> List[Node]:
+        """
+        :param sloppy: List the nodes whose normalized name (see NameSearch.normalize_name) contains the normalized
+        node_name, instead of the nodes named exactly node_name.
+        """
+        pass
+
+    @abstractmethod
+    def search_nodes(self,
+                     query: str,
+                     limit: int = 10,
+                     prefix: bool = False,
+                     min_similarity: float = 0.2,
+                     view: NodeView = NodeView.SUMMARY,
+                     ) -> List[Tuple[Node, float]]:
+        """
+        Searches nodes by name using the index of the normalized names and their trigrams.
+        :param query: The (partial or misspelled) name.
+        :param limit: The maximal number of results.
+        :param prefix: Only find nodes whose normalized name starts with the normalized query, in name order.
+        Otherwise, find the nodes with the most similar names, the most similar first.
+        :param min_similarity: The minimal trigram similarity of fuzzy results (see NameSearch.similarity).
+        :return: List of (node, similarity) tuples.
+        """
+        pass
+
+    def backfill_name_search(self) -> int:
+        """
+        Adds the normalized names and trigrams used by search_nodes to nodes stored before name search existed.
+        :return: The number of updated nodes.
+        """
+        return 0
+
+    def complete_node_name(self, prefix: str, limit: int = 10) -> List[str]:
+        """
+        :return: The names of up to limit nodes starting with prefix (ignoring case and accents).
+        """
+        return [node.name for node, _ in self.search_nodes(prefix, limit=limit, prefix=True)]
+
+    @abstractmethod
+    def iter_nodes(self,
+                   name_prefix: Optional[str] = None,
+                   after: Optional[ObjectId] = None,
+                   limit: Optional[int] = None,
+                   fields: Sequence[str] = ('name',),
+                   batch_size: int = 1000,
+                   ) -> Iterator[Dict]:
+        """
+        Streams nodes in the order of their IDs, fetching only the requested fields.
+        :param name_prefix: Only list nodes whose name starts with this prefix (case sensitive).
+        :param after: Only list nodes with an ID greater than this one (keyset pagination).
+        :param limit: The maximal number of listed nodes.
+        :param fields: The fields to fetch besides '_id', e.g. 'name' and 'description'.
+        :param batch_size: The number of nodes fetched per round trip.
+        :return: Iterator of node dictionaries containing '_id' and the requested fields.
+        """
+        pass
+
+    def get_all_node_names(self) -> List[str]:
+        return [node['name'] for node in self.iter_nodes()]
+
+    @staticmethod
+    def _check_node_field(field: str) -> None:
+        if field in RESERVED_NODE_FIELDS or not field or '.' in field or field.startswith('$'):
+            raise ValueError(f'"{field}" can not be used as a node field')
+
+    @abstractmethod
+    def set_node_field(self, field: str, values: Dict[ObjectId, Any]) -> None:
+        """
+        Stores an additional field, e.g. the result of an analytics job, on many nodes.
+        :param field: The name of the field. Must not be one of RESERVED_NODE_FIELDS.
+        :param values: {node ID: JSON serializable value}
+        """
+        pass
+
+    @abstractmethod
+    def get_node_field(self, field: str, node_ids: Optional[List[ObjectId]] = None) -> Dict[ObjectId, Any]:
+        """
+        :param field: The name of the field.
+        :param node_ids: Only return the values of these nodes. All nodes having the field if None.
+        :return: {node ID: value} of the nodes having the field.
+        """
+        pass
+
+    # relations
+    ###########
+
+    @staticmethod
+    def _check_relation(relation: Union[UniRelation, BiRelation], relation_type: Optional[RelationType]) -> None:
+        if relation_type is None:
+            raise KnowledgeNetExceptions.UnknownRelationTypeException(
+                f'There is no {"uni" if relation.is_uni else "bi"}directional relation type with id {relation.type}!'
+            )
+        if relation.node_1 == relation.node_2 and not relation_type.reflexive:
+            raise KnowledgeNetExceptions.ReflexiveException(
+                'Tried to apply a reflexive relation of non-reflexive relation type!'
+            )
+        if relation.probability != 1.0 and not relation_type.probabilistic:
+            raise KnowledgeNetExceptions.ProbabilisticException(
+                f'Tried to add an uncertain relation with non-probabilistic type (\"{relation_type.name}\")!'
+            )
+
+    @abstractmethod
+    def add_relation(self, relation: Union[UniRelation, BiRelation]) -> ObjectId:
+        pass
+
+    @abstractmethod
+    def add_relations(self,
+                      relations: Iterable[Union[UniRelation, BiRelation]],
+                      batch_size: int = 1000,
+                      ) -> Tuple[List[ObjectId], List[Tuple[int, Exception]]]:
+        """
+        Adds many relations in batches.
+        :param relations: The relations to add.
+        :param batch_size: The number of relations written per batch.
+        :return: The IDs of the inserted relations and a list of (position, exception) tuples of the relations
+        which could not be added.
+        """
+        pass
+
+    @abstractmethod
+    def get_relation_ids_of_node(self, node_id: ObjectId) -> Dict:
+        """
+        Returns a dictionary of lists of relations ('in_relations', 'out_relations' and 'bi_relations'
+        of a certain node.
+        :param node_id: The ID of the node.
+        :return: dictionary of lists of relations ('in_relations', 'out_relations' and 'bi_relations' of the node.
+        """
+        pass
+
+    @abstractmethod
+    def get_relation_objects_of_node(self, node_id: ObjectId) -> Dict:
+        pass
+
+    def get_relation_info_of_node(self, node_id) -> Dict:
+        """
+        Returns the relations of a node together with their relation types and neighbour nodes.
+        All relation types and neighbour nodes are fetched with one query per collection.
+        :param node_id: The ID of the node.
+        :return: dictionary of lists of relation infos ('in_relations', 'out_relations' and 'bi_relations').
+        """
+        relations = self.get_relation_objects_of_node(node_id)
+        uni_types = self.get_uni_relationtypes(
+            list({relation.type for relation in relations['in_relations'] + relations['out_relations']}))
+        bi_types = self.get_bi_relationtypes(list({relation.type for relation in relations['bi_relations']}))
+        neighbours = self.get_nodes(self._neighbour_ids(node_id, relations), NodeView.SUMMARY)
+        return self._join_relation_info(node_id, relations, uni_types, bi_types, neighbours)
+
+    @staticmethod
+    def _neighbour_ids(node_id: ObjectId, relations: Dict) -> List[ObjectId]:
+        """
+        :param relations: The relation objects of the node, see get_relation_objects_of_node.
+        :return: The IDs of the nodes at the other ends of the relations.
+        """
+        neighbour_ids = {relation.node_from for relation in relations['in_relations']}
+        neighbour_ids.update(relation.node_to for relation in relations['out_relations'])
+        neighbour_ids.update(relation.node_1 if relation.node_1 != node_id else relation.node_2
+                             for relation in relations['bi_relations'])
+        return list(neighbour_ids)
+
+    @staticmethod
+    def _join_relation_info(node_id: ObjectId,
+                            relations: Dict,
+                            uni_types: List[RelationType],
+                            bi_types: List[RelationType],
+                            neighbours: List[Node],
+                            ) -> Dict:
+        """
+        Builds the result of get_relation_info_of_node from the fetched relations, relation types and neighbours.
+        """
+        uni_types = {rel_type.id: rel_type for rel_type in uni_types}
+        bi_types = {rel_type.id: rel_type for rel_type in bi_types}
+        neighbours = {node.id: node for node in neighbours}
+        return {
+            'in_relations': [{
+                'id': relation.id,
+                'prob': relation.probability,
+                'type': uni_types[relation.type],
+                'from': neighbours[relation.node_from]
+            } for relation in relations['in_relations']],
+            'out_relations': [{
+                'id': relation.id,
+                'prob': relation.probability,
+                'type': uni_types[relation.type],
+                'to': neighbours[relation.node_to]
+            } for relation in relations['out_relations']],
+            'bi_relations': [{
+                'id': relation.id,
+                'prob': relation.probability,
+                'type': bi_types[relation.type],
+                'with': neighbours[relation.node_1]
+                if relation.node_1 != node_id
+                else neighbours[relation.node_2]
+            } for relation in relations['bi_relations']]
+        }
+
+    @abstractmethod
+    def iter_relations(self,
+                       uni: bool,
+                       relation_type_ids: Optional[List[ObjectId]] = None,
+                       batch_size: int = 1000,
+                       ) -> Iterator[Union[UniRelation, BiRelation]]:
+        """
+        Streams the relations of one direction without loading them all at once.
+        :param uni: Whether to stream the unidirectional or the bidirectional relations.
+        :param relation_type_ids: Only stream relations of these types. All types if None.
+        :param batch_size: The number of relations fetched per round trip.
+        """
+        pass
+
+    @abstractmethod
+    def get_relation_batch(self, uni: bool, relation_type_ids: Optional[List[ObjectId]] = None) -> RelationBatch:
+        """
+        Loads all relations of one direction into a columnar RelationBatch.
+        :param uni: Whether to load the unidirectional or the bidirectional relations.
+        :param relation_type_ids: Only load relations of these types. All types if None.
+        :return: The RelationBatch.
+        """
+        pass
+
+    @abstractmethod
+    def get_relations_between(self, node_1_id: ObjectId, node_2_id: ObjectId) -> Tuple[List[UniRelation], List[BiRelation]]:
+        pass
+
+    @abstractmethod
+    def _relations_between_pairs(self,
+                                 pairs: List[Tuple[ObjectId, ObjectId]],
+                                 ) -> Tuple[List[UniRelation], List[BiRelation]]:
+        """
+        :param pairs: Node pairs, each unordered pair at most once.
+        :return: At least the relations between the nodes of any of the pairs, in either direction. May contain
+        further relations of these nodes.
+        """
+        pass
+
+    def get_relations_between_many(self,
+                                   pairs: Iterable[Tuple[ObjectId, ObjectId]],
+                                   batch_size: int = 1000,
+                                   ) -> Dict[Tuple[ObjectId, ObjectId], Tuple[List[Tuple[RelationType, UniRelation]],
+                                                                              List[Tuple[RelationType, BiRelation]]]]:
+        """
+        Looks up the relations between many node pairs with a few queries per batch of pairs.
+        :param pairs: (node 1 ID, node 2 ID) tuples. Relations in both directions are returned for every pair.
+        :param batch_size: The number of pairs looked up per query.
+        :return: {pair: ([(relation type, unidirectional relation)], [(relation type, bidirectional relation)])}
+        with an entry for every given pair.
+        """
+        results, requested_pairs = self._requested_pairs(pairs)
+        keys = iter(list(requested_pairs))
+        batch = list(islice(keys, batch_size))
+        while batch:
+            relations = self._relations_between_pairs([requested_pairs[key][0] for key in batch])
+            self._collect_pair_relations(results, requested_pairs, set(batch), relations, self.get_relation_type)
+            batch = list(islice(keys, batch_size))
+        return results
+
+    @staticmethod
+    def _requested_pairs(pairs: Iterable[Tuple[ObjectId, ObjectId]]) -> Tuple[Dict, Dict[frozenset, List]]:
+        """
+        :return: The empty results of get_relations_between_many and the given pairs of every unordered pair.
+        """
+        results = dict()
+        requested_pairs: Dict[frozenset, List[Tuple[ObjectId, ObjectId]]] = dict()
+        for pair in pairs:
+            if pair not in results:
+                results[pair] = ([], [])
+                requested_pairs.setdefault(frozenset(pair), list()).append(pair)
+        return results, requested_pairs
+
+    @staticmethod
+    def _collect_pair_relations(results: Dict,
+                                requested_pairs: Dict[frozenset, List[Tuple[ObjectId, ObjectId]]],
+                                batch_keys: Set[frozenset],
+                                relations: Tuple[List[UniRelation], List[BiRelation]],
+                                relation_type_of: Callable[[ObjectId, bool], RelationType],
+                                ) -> None:
+        """
+        Adds the relations between the pairs of one batch of get_relations_between_many to the results.
+        :param relation_type_of: Returns the relation type of a (relation type ID, uni) tuple.
+        """
+        for position, relations_of_collection in enumerate(relations):
+            for relation in relations_of_collection:
+                key = frozenset((relation.node_1, relation.node_2))
+                if key not in batch_keys:
+                    continue
+                relation_type = relation_type_of(relation.type, relation.is_uni)
+                for pair in requested_pairs[key]:
+                    results[pair][position].append((relation_type, relation))
+
+    @abstractmethod
+    def get_relations_of_nodes(self,
+                               node_ids: List[ObjectId],
+                               relation_type_ids: Optional[List[ObjectId]] = None,
+                               outgoing: bool = True,
+                               incoming: bool = True,
+                               session=None,
+                               ) -> Tuple[List[UniRelation], List[BiRelation]]:
+        """
+        Returns the relations touching any of the given nodes, with one query per relation collection.
+        :param node_ids: The IDs of the nodes.
+        :param relation_type_ids: Only return relations of these (uni or bi) types. All types if None.
+        :param outgoing: Return the unidirectional relations starting at the nodes.
+        :param incoming: Return the unidirectional relations ending at the nodes.
+        :param session: The client session of a running transaction, for backends which have sessions.
+        :return: The unidirectional and the bidirectional relations.
+        """
+        pass
+
+    # traversals
+    ############
+
+    @abstractmethod
+    def get_all_uni_connected_nodes(self, start_node_id: ObjectId, relation_type_id: ObjectId, stop_at: Optional[ObjectId] = None, include_direction: bool = True, inverse_direction: bool = False) -> List[ObjectId]:
+        pass
+
+    @abstractmethod
+    def get_all_bi_connected_nodes(self, start_node_id: ObjectId, relation_type_id: ObjectId, stop_at: Optional[ObjectId] = None) -> List[ObjectId]:
+        pass
+
+    @staticmethod
+    def _expand_frontier(frontier: Set[ObjectId],
+                         parents: Dict[ObjectId, Tuple[Optional[ObjectId], Optional[Union[UniRelation, BiRelation]]]],
+                         uni_relations: List[UniRelation],
+                         bi_relations: List[BiRelation],
+                         directed: bool,
+                         forward: bool,
+                         ) -> Set[ObjectId]:
+        """
+        Expands one level of a breadth first search. New nodes are recorded in parents together with the node and
+        relation they were reached by.
+        :param frontier: The IDs of the nodes of the current level.
+        :param uni_relations: The unidirectional relations of the frontier, see _shortest_path_search.
+        :param bi_relations: The bidirectional relations of the frontier.
+        :param forward: Whether the search runs from the start node (True) or from the goal node (False).
+        :return: The IDs of the nodes of the next level.
+        """
+        edges = [(relation.node_from, relation.node_to, relation) for relation in uni_relations]
+        edges += [(relation.node_1, relation.node_2, relation) for relation in bi_relations]
+        next_frontier = set()
+        for node_1, node_2, relation in edges:
+            for node, neighbour in ((node_1, node_2), (node_2, node_1)):
+                if node not in frontier or neighbour in parents:
+                    continue
+                if directed and relation.is_uni and (node == node_1) != forward:
+                    continue
+                parents[neighbour] = (node, relation)
+                next_frontier.add(neighbour)
+        return next_frontier
+
+    def shortest_path(self,
+                      start_node_id: ObjectId,
+                      goal_node_id: ObjectId,
+                      relation_type_ids: Optional[List[ObjectId]] = None,
+                      max_depth: Optional[int] = None,
+                      directed: bool = False,
+                      ) -> Optional[Tuple[List[ObjectId], List[Union[UniRelation, BiRelation]]]]:
+        """
+        Finds a shortest path between two nodes with a bidirectional breadth first search. The searches from both
+        ends always expand the smaller frontier and stop as soon as they meet, so only a fraction of the closure of
+        the start node is explored.
+        :param start_node_id: The ID of the first node.
+        :param goal_node_id: The ID of the second node.
+        :param relation_type_ids: Only follow relations of these (uni or bi) types. All types if None.
+        :param max_depth: The maximal number of relations on the path.
+        :param directed: Only follow unidirectional relations in their direction. Otherwise all relations are
+        treated as undirected.
+        :return: The node IDs of the path (including both ends) and the relations between them, or None if there
+        is no such path.
+        """
+        search = self._shortest_path_search(start_node_id, goal_node_id, max_depth, directed)
+        try:
+            frontier, outgoing, incoming = next(search)
+            while True:
+                frontier, outgoing, incoming = search.send(
+                    self.get_relations_of_nodes(frontier, relation_type_ids, outgoing=outgoing, incoming=incoming))
+        except StopIteration as stop:
+            return stop.value
+
+    @classmethod
+    def _shortest_path_search(cls,
+                              start_node_id: ObjectId,
+                              goal_node_id: ObjectId,
+                              max_depth: Optional[int],
+                              directed: bool,
+                              ) -> Generator[Tuple[List[ObjectId], bool, bool],
+                                             Tuple[List[UniRelation], List[BiRelation]],
+                                             Optional[Tuple[List[ObjectId], List[Union[UniRelation, BiRelation]]]]]:
+        """
+        The search of shortest_path without the queries, so that backends with other query APIs can run it.
+        Yields (node IDs, outgoing, incoming) for every level to expand and expects the result of
+        get_relations_of_nodes for these arguments to be sent back. Returns the result of shortest_path.
+        """
+        if start_node_id == goal_node_id:
+            return [start_node_id], []
+        forward_parents = {start_node_id: (None, None)}
+        backward_parents = {goal_node_id: (None, None)}
+        forward_frontier = {start_node_id}
+        backward_frontier = {goal_node_id}
+        forward_depth = backward_depth = 0
+        while forward_frontier and backward_frontier:
+            if max_depth is not None and forward_depth + backward_depth >= max_depth:
+                return None
+            forward = len(forward_frontier) <= len(backward_frontier)
+            if forward:
+                frontier, parents, other_parents = forward_frontier, forward_parents, backward_parents
+            else:
+                frontier, parents, other_parents = backward_frontier, backward_parents, forward_parents
+            # unidirectional relations are followed in their direction from the start and against it from the goal
+            uni_relations, bi_relations = yield list(frontier), forward or not directed, not forward or not directed
+            frontier = cls._expand_frontier(frontier, parents, uni_relations, bi_relations, directed, forward)
+            if forward:
+                forward_frontier = frontier
+                forward_depth += 1
+            else:
+                backward_frontier = frontier
+                backward_depth += 1
+            meetings = [node for node in frontier if node in other_parents]
+            if meetings:
+                # the meeting nodes can have different depths on the other side
+                return min((cls._join_paths(node, forward_parents, backward_parents) for node in meetings),
+                           key=lambda path: len(path[1]))
+        return None
+
+    def _most_probable_first(self,
+                             start_node_id: ObjectId,
+                             relation_type_ids: Optional[List[ObjectId]] = None,
+                             min_probability: float = 0.0,
+                             max_depth: Optional[int] = None,
+                             directed: bool = False,
+                             ) -> Iterator[Tuple[ObjectId, float, Tuple]]:
+        """
+        Dijkstra search on -log(probability). Yields every reachable node once, in the order of decreasing
+        probability of its most probable path. Paths below min_probability are pruned and not explored further.
+        :return: Iterator over (node ID, path probability, path) tuples. The path is a linked tuple
+        (previous path, node ID, relation) which is () for the start node, see _unlink_path.
+        """
+        max_cost = -math.log(min_probability) if min_probability > 0 else math.inf
+        tie_breaker = count()
+        heap = [(0.0, next(tie_breaker), 0, start_node_id, ())]
+        settled = set()
+        expanded_hops: Dict[ObjectId, int] = dict()
+        while heap:
+            cost, _, hops, node_id, path = heapq.heappop(heap)
+            if node_id not in settled:
+                settled.add(node_id)
+                yield node_id, math.exp(-cost), path
+            if max_depth is not None and hops >= max_depth:
+                continue
+            # with a depth limit a less probable path with fewer hops can still lead further
+            if node_id in expanded_hops and (max_depth is None or expanded_hops[node_id] <= hops):
+                continue
+            expanded_hops[node_id] = hops
+            uni_relations, bi_relations = self.get_relations_of_nodes([node_id], relation_type_ids,
+                                                                      outgoing=True, incoming=not directed)
+            for relation in uni_relations + bi_relations:
+                if relation.probability <= 0:
+                    continue
+                neighbour_id = relation.node_2 if relation.node_1 == node_id else relation.node_1
+                neighbour_cost = cost - math.log(relation.probability)
+                if neighbour_cost > max_cost:
+                    continue
+                if neighbour_id in expanded_hops and (max_depth is None or expanded_hops[neighbour_id] <= hops + 1):
+                    continue
+                heapq.heappush(heap, (neighbour_cost, next(tie_breaker), hops + 1, neighbour_id,
+                                      (path, neighbour_id, relation)))
+
+    @staticmethod
+    def _unlink_path(start_node_id: ObjectId, path: Tuple) -> Tuple[List[ObjectId], List[Union[UniRelation, BiRelation]]]:
+        nodes, relations = [], []
+        while path:
+            path, node_id, relation = path
+            nodes.append(node_id)
+            relations.append(relation)
+        nodes.append(start_node_id)
+        return nodes[::-1], relations[::-1]
+
+    def most_probable_path(self,
+                           start_node_id: ObjectId,
+                           goal_node_id: ObjectId,
+                           relation_type_ids: Optional[List[ObjectId]] = None,
+                           min_probability: float = 0.0,
+                           max_depth: Optional[int] = None,
+                           directed: bool = False,
+                           ) -> Optional[Tuple[float, List[ObjectId], List[Union[UniRelation, BiRelation]]]]:
+        """
+        Finds the most probable chain of relations between two nodes. The probability of a chain is the product of
+        the probabilities of its relations.
+        :param start_node_id: The ID of the first node.
+        :param goal_node_id: The ID of the second node.
+        :param relation_type_ids: Only follow relations of these (uni or bi) types. All types if None.
+        :param min_probability: Chains less probable than this are not explored.
+        :param max_depth: The maximal number of relations of the chain.
+        :param directed: Only follow unidirectional relations in their direction.
+        :return: The probability, the node IDs and the relations of the chain, or None if there is no chain
+        above min_probability.
+        """
+        for node_id, probability, path in self._most_probable_first(start_node_id, relation_type_ids,
+                                                                    min_probability, max_depth, directed):
+            if node_id == goal_node_id:
+                return (probability, *self._unlink_path(start_node_id, path))
+        return None
+
+    def most_probable_neighbours(self,
+                                 start_node_id: ObjectId,
+                                 k: int,
+                                 max_depth: int = 1,
+                                 relation_type_ids: Optional[List[ObjectId]] = None,
+                                 min_probability: float = 0.0,
+                                 directed: bool = False,
+                                 ) -> List[Tuple[ObjectId, float]]:
+        """
+        Returns the k nodes within max_depth hops which are connected to the start node by the most probable chains.
+        The search stops after the k-th node, so only nodes at least as probable as the result are explored.
+        :param start_node_id: The ID of the node to start at.
+        :param k: The maximal number of nodes to return.
+        :param max_depth: The maximal number of hops from the start node.
+        :param relation_type_ids: Only follow relations of these (uni or bi) types. All types if None.
+        :param min_probability: Nodes reachable only by less probable chains are not returned.
+        :param directed: Only follow unidirectional relations in their direction.
+        :return: List of (node ID, probability) tuples, most probable first.
+        """
+        reached = self._most_probable_first(start_node_id, relation_type_ids, min_probability, max_depth, directed)
+        next(reached)  # the start node
+        return [(node_id, probability) for node_id, probability, _ in islice(reached, k)]
+
+    # transitive closure
+    ####################
+
+    @abstractmethod
+    def _closure_neighbours(self, relation_type_id: ObjectId, node_ids: List[ObjectId], targets: bool,
+                            session=None) -> Set[ObjectId]:
+        """
+        Looks up the stored closure of a transitive relation type.
+        :param targets: Return the nodes reachable from the given nodes (True) or the nodes reaching them (False).
+        :param session: See get_relations_of_nodes, the same applies to the other closure methods.
+        """
+        pass
+
+    @abstractmethod
+    def _closure_contains(self, relation_type_id: ObjectId, node_from_id: ObjectId, node_to_id: ObjectId) -> bool:
+        pass
+
+    @abstractmethod
+    def _add_closure_pairs(self, relation_type_id: ObjectId, pairs: Iterable[Tuple[ObjectId, ObjectId]],
+                           session=None) -> None:
+        """
+        Stores (node from, node to) pairs of the closure. Pairs which are already stored are ignored.
+        """
+        pass
+
+    @abstractmethod
+    def _delete_closure_sources(self, relation_type_id: ObjectId, node_ids: Optional[List[ObjectId]],
+                                session=None) -> None:
+        """
+        Deletes the closure pairs starting at the given nodes, or all pairs of the type if node_ids is None.
+        """
+        pass
+
+    def _transitive_types(self) -> List[RelationType]:
+        return [relation_type for uni in (True, False) for relation_type in self._relation_types().all(uni)
+                if relation_type.transitive]
+
+    def _reachable_from(self, node_id: ObjectId, relation_type_id: ObjectId, session=None) -> Set[ObjectId]:
+        """
+        Breadth first search over the stored relations of one type. The start node is only part of the result if
+        it lies on a cycle.
+        """
+        reached = set()
+        frontier = {node_id}
+        while frontier:
+            uni_relations, bi_relations = self.get_relations_of_nodes(list(frontier), [relation_type_id],
+                                                                      outgoing=True, incoming=False, session=session)
+            neighbours = {relation.node_to for relation in uni_relations}
+            neighbours.update(relation.node_2 if relation.node_1 in frontier else relation.node_1
+                              for relation in bi_relations)
+            frontier = neighbours - reached
+            reached |= neighbours
+        return reached
+
+    def _closure_after_add(self, relations: Iterable[Union[UniRelation, BiRelation]]) -> None:
+        """
+        Extends the closure of the transitive relation types by newly added relations: every node reaching the
+        first node now reaches every node reachable from the second node.
+        """
+        for relation in relations:
+            relation_type = self.get_relation_type(relation.type, relation.is_uni)
+            if not relation_type.transitive or self._closure_contains(relation.type, relation.node_1, relation.node_2):
+                continue
+            if relation.is_uni:
+                sources = self._closure_neighbours(relation.type, [relation.node_1], targets=False)
+                targets = self._closure_neighbours(relation.type, [relation.node_2], targets=True)
+                sources.add(relation.node_1)
+                targets.add(relation.node_2)
+                self._add_closure_pairs(relation.type, product(sources, targets))
+            else:
+                # the closure of a bidirectional type relates all nodes of a connected component
+                component = self._closure_neighbours(relation.type, [relation.node_1, relation.node_2], targets=True)
+                component.update((relation.node_1, relation.node_2))
+                self._add_closure_pairs(relation.type, product(component, component))
+
+    def _closure_before_delete(self, node_ids: List[ObjectId], session=None) -> Dict[ObjectId, Set[ObjectId]]:
+        """
+        :param session: The session the nodes are deleted in, see get_relations_of_nodes.
+        :return: {transitive relation type ID: IDs of the nodes whose closure may change if the nodes are deleted}
+        """
+        return {relation_type.id: self._closure_neighbours(relation_type.id, node_ids,
+                                                           targets=not relation_type.is_uni, session=session)
+                for relation_type in self._transitive_types()}
+
+    def _closure_after_delete(self, node_ids: List[ObjectId], affected: Dict[ObjectId, Set[ObjectId]],
+                              session=None) -> None:
+        """
+        Recomputes the closure of the nodes which reached the deleted nodes, see _closure_before_delete.
+        Must run in the session which deleted the relations, so that it does not follow them any more.
+        """
+        deleted = set(node_ids)
+        for relation_type_id, sources in affected.items():
+            sources -= deleted
+            self._delete_closure_sources(relation_type_id, list(sources | deleted), session=session)
+            uni = self.get_relation_type(relation_type_id).is_uni
+            while sources:
+                source = sources.pop()
+                reached = self._reachable_from(source, relation_type_id, session=session)
+                if uni:
+                    self._add_closure_pairs(relation_type_id, ((source, target) for target in reached),
+                                            session=session)
+                else:
+                    self._add_closure_pairs(relation_type_id, product(reached, reached), session=session)
+                    sources -= reached
+
+    def rebuild_transitive_closure(self, relation_type_id: Optional[ObjectId] = None) -> None:
+        """
+        Recomputes the stored closure from the relations, e.g. after a relation type was marked as transitive.
+        :param relation_type_id: The transitive relation type to rebuild. All transitive types if None.
+        """
+        relation_types = self._transitive_types()
+        if relation_type_id is not None:
+            relation_types = [relation_type for relation_type in relation_types if relation_type.id == relation_type_id]
+        for relation_type in relation_types:
+            batch = self.get_relation_batch(relation_type.is_uni, [relation_type.id])
+            adjacency: Dict[ObjectId, Set[ObjectId]] = dict()
+            for i in range(len(batch)):
+                adjacency.setdefault(batch.node_1(i), set()).add(batch.node_2(i))
+                if not relation_type.is_uni:
+                    adjacency.setdefault(batch.node_2(i), set()).add(batch.node_1(i))
+            self._delete_closure_sources(relation_type.id, None)
+            for source in adjacency:
+                reached = set()
+                frontier = adjacency[source]
+                while frontier:
+                    reached |= frontier
+                    frontier = {neighbour for node in frontier for neighbour in adjacency.get(node, ())} - reached
+                self._add_closure_pairs(relation_type.id, ((source, target) for target in reached))
+
+    def is_reachable(self, node_from_id: ObjectId, node_to_id: ObjectId, relation_type_id: ObjectId) -> bool:
+        """
+        Checks whether a chain of relations of one type leads from one node to another. For transitive types this
+        is a single lookup in the stored closure, otherwise a bidirectional breadth first search.
+        A node always reaches itself.
+        :param node_from_id: The ID of the first node.
+        :param node_to_id: The ID of the second node.
+        :param relation_type_id: The ID of the (uni or bi) relation type to follow.
+        """
+        if node_from_id == node_to_id:
+            return True
+        relation_type = self.get_relation_type(relation_type_id)
+        if relation_type is None:
+            raise KnowledgeNetExceptions.UnknownRelationTypeException(f'Unknown relation type {relation_type_id}')
+        if relation_type.transitive:
+            return self._closure_contains(relation_type_id, node_from_id, node_to_id)
+        return self.shortest_path(node_from_id, node_to_id, [relation_type_id], directed=True) is not None
+
+    @staticmethod
+    def _join_paths(meeting_node_id: ObjectId,
+                    forward_parents: Dict,
+                    backward_parents: Dict,
+                    ) -> Tuple[List[ObjectId], List[Union[UniRelation, BiRelation]]]:
+        nodes, relations = [meeting_node_id], []
+        node, relation = forward_parents[meeting_node_id]
+        while node is not None:
+            nodes.insert(0, node)
+            relations.insert(0, relation)
+            node, relation = forward_parents[node]
+        node, relation = backward_parents[meeting_node_id]
+        while node is not None:
+            nodes.append(node)
+            relations.append(relation)
+            node, relation = backward_parents[node]
+        return nodes, relations
+
+
+def open_backend(uri: Optional[str] = None, **kwargs) -> KnowledgeNetBackend:
+    """
+    Opens the backend selected by the scheme of the URI. A MongoBackend connects on its first database access.
+    'mongodb://' and 'mongodb+srv://' URIs open a MongoBackend. 'sqlite:///relative.db' and 'sqlite:////absolute.db'
+    open an SQLiteBackend on that file and 'sqlite://' opens an in-memory SQLiteBackend.
+    :param uri: The URI of the storage. Defaults to the configured 'db_uri' (see KnowledgeNetConfig).
+    :param kwargs: Further keyword arguments for the backend.
+    :return: The backend.
+    """
+    config = load_config()
+    if uri is None:
+        uri = config['db_uri']
+    scheme = uri.split('://', 1)[0].lower() if '://' in uri else ''
+    if scheme in ('mongodb', 'mongodb+srv'):
+        from MongoBackend import MongoBackend
+        kwargs.setdefault('db_name', config['db_name'])
+        return MongoBackend(uri, **kwargs)
+    if scheme == 'sqlite':
+        from SQLiteBackend import SQLiteBackend
+        path = uri[len('sqlite://'):]
+        if path.startswith('/'):
+            path = path[1:]
+        return SQLiteBackend(path or ':memory:', **kwargs)
+    raise ValueError(f'Unknown backend URI scheme in \"{uri}\"')
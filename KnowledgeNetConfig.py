@@ -0,0 +1,34 @@
+import json
+import os
+from typing import Dict
+
+DEFAULT_CONFIG = {
+    'db_uri': 'mongodb://localhost:27017/',
+    'db_name': 'world',
+}
+
+CONFIG_PATH_ENV = 'KNOWLEDGENET_CONFIG'
+DEFAULT_CONFIG_PATH = os.path.join('~', '.config', 'knowledgenet', 'config.json')
+
+# environment variables overriding single config entries
+ENV_OVERRIDES = {
+    'db_uri': 'KNOWLEDGENET_DB_URI',
+    'db_name': 'KNOWLEDGENET_DB_NAME',
+}
+
+
+def load_config() -> Dict:
+    """
+    Loads the configuration. The defaults are overridden by the JSON config file (KNOWLEDGENET_CONFIG or
+    ~/.config/knowledgenet/config.json) and then by the KNOWLEDGENET_* environment variables.
+    :return: The configuration dictionary.
+    """
+    config = dict(DEFAULT_CONFIG)
+    config_path = os.path.expanduser(os.environ.get(CONFIG_PATH_ENV, DEFAULT_CONFIG_PATH))
+    if os.path.isfile(config_path):
+        with open(config_path) as config_file:
+            config.update(json.load(config_file))
+    for key, env_name in ENV_OVERRIDES.items():
+        if env_name in os.environ:
+            config[key] = os.environ[env_name]
+    return config
@@ -5,4 +5,8 @@ class ReflexiveException(Exception):
 
 
 class ProbabilisticException(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+class UnknownRelationTypeException(Exception):
+    pass
@@ -1,15 +1,17 @@
 #! /usr/bin/env python
-from MongoBackend import *
+from KnowledgeNetBackend import KnowledgeNetBackend, open_backend
+import KnowledgeNetIO
+from SessionCache import CachingBackend
 from bson import ObjectId
 
-from NetElements.Nodes.Node import Node
+from NetElements.Nodes.Node import Node, NodeView
 from NetElements.Relations.Relations import BiRelation, UniRelation, Relation, RelationType
 
 from enum import IntEnum
-from typing import Union, List, Dict
+from typing import Union, List, Dict, Tuple, Optional
 import argparse
+import shutil
 import sys
-import os
 
 
 class MenuAction(IntEnum):
@@ -31,9 +33,8 @@ class ParamsType(IntEnum):
 
 class KnowledgeNetFrontend:
 
-    def __init__(self):
-        self.rows, self.columns = os.popen('stty size', 'r').read().split()
-
+    def __init__(self, backend: Optional[KnowledgeNetBackend] = None):
+        self.backend: Optional[KnowledgeNetBackend] = backend
         self.node_menu_action_mappings = [
             {
                 'name': 'Delete',
@@ -93,9 +94,18 @@ class KnowledgeNetFrontend:
             }
         ]
 
-        self.backend: MongoBackend = b
+    def build_parser(self) -> argparse.ArgumentParser:
         parser = argparse.ArgumentParser(prog='KnowledgeNet UI')
         # parser.add_argument('--foo', action='store_true', help='foo help')
+        parser.add_argument('--db', default=None,
+                            help='URI of the storage backend, e.g. mongodb://localhost:27017/ or sqlite:///world.db. '
+                                 'Defaults to the configured db_uri.')
+        parser.add_argument('--profile', action='store_true', default=False,
+                            help='print the database queries of every backend method after the command')
+        parser.add_argument('--cache-size', type=int, default=256, dest='session_cache_size',
+                            help='number of nodes and relation infos cached during the session, 0 disables the cache')
+        parser.add_argument('--prefetch', action='store_true', default=False,
+                            help='fetch the neighbours of the displayed node in the background (MongoDB only)')
         subparsers = parser.add_subparsers(help='command groups')
 
         # create the parser for the "node" command group
@@ -106,8 +116,20 @@ class KnowledgeNetFrontend:
 
         # create a parser for the "node list" command
         parser_node_list = node_subparsers.add_parser('list', help='List all nodes')
+        parser_node_list.add_argument('--prefix', default=None, help='only list nodes whose name starts with this')
+        parser_node_list.add_argument('--after', default=None, help='only list nodes after this node id')
+        parser_node_list.add_argument('--limit', type=int, default=None, help='maximal number of listed nodes')
+        parser_node_list.add_argument('--ids', action='store_true', default=False, help='print the node ids')
         parser_node_list.set_defaults(func=self.list_nodes)
 
+        # create a parser for the "node search" command
+        parser_node_search = node_subparsers.add_parser('search', help='Search nodes by a similar name')
+        parser_node_search.add_argument('query')
+        parser_node_search.add_argument('--prefix', action='store_true', default=False,
+                                        help='find names starting with the query')
+        parser_node_search.add_argument('--limit', type=int, default=10, help='maximal number of found nodes')
+        parser_node_search.set_defaults(func=self.search_nodes)
+
         # create a parser for the "node create" command
         parser_node_create = node_subparsers.add_parser('create', help='Create a new node')
         parser_node_create.add_argument('node_name', default='', nargs='?')
@@ -140,12 +162,26 @@ class KnowledgeNetFrontend:
         parser_relation_create.set_defaults(func=self.create_relation)
 
         # create a parser for the "relation between" command
-        parser_relation_between = relation_subparsers.add_parser('between', help='Create a new relation')
-        # parser_relation_between.add_argument('relation_name', default='', nargs='?')
-        parser_relation_between.add_argument('--uni', action='store_true', default=True)
-        parser_relation_between.add_argument('--bi', action='store_true', default=True)
+        parser_relation_between = relation_subparsers.add_parser('between', help='List the relations between two nodes')
+        parser_relation_between.add_argument('node_1_name', default='', nargs='?')
+        parser_relation_between.add_argument('node_2_name', default='', nargs='?')
+        parser_relation_between.add_argument('--uni', action='store_true', default=False,
+                                             help='only list unidirectional relations')
+        parser_relation_between.add_argument('--bi', action='store_true', default=False,
+                                             help='only list bidirectional relations')
         parser_relation_between.set_defaults(func=self.relations_between)
 
+        # create a parser for the "relation path" command
+        parser_relation_path = relation_subparsers.add_parser('path', help='Find a shortest path between two nodes')
+        parser_relation_path.add_argument('node_1_name', default='', nargs='?')
+        parser_relation_path.add_argument('node_2_name', default='', nargs='?')
+        parser_relation_path.add_argument('--type', '-t', dest='relation_types', action='append', default=None,
+                                          help='only follow relations of this type (repeatable)')
+        parser_relation_path.add_argument('--max-depth', type=int, default=None)
+        parser_relation_path.add_argument('--directed', action='store_true', default=False,
+                                          help='only follow unidirectional relations in their direction')
+        parser_relation_path.set_defaults(func=self.relation_path)
+
         # create the parser for the "relationtype" command group
         ########################################################
         parser_relationtype = subparsers.add_parser('relationtype', help='relation type related commands')
@@ -165,27 +201,202 @@ class KnowledgeNetFrontend:
         parser_relationtype_list.add_argument('--bi', action='store_true', default=True)
         parser_relationtype_list.set_defaults(func=self.list_relationtypes)
 
-        
-        
-        # do stuff
-        args = parser.parse_args()
-        args.func(args)
+        # create the parsers for the "import" and "export" commands
+        #########################################################
+        parser_import = subparsers.add_parser('import', help='Import relation types, nodes and relations')
+        parser_import.add_argument('file', help='JSON lines or CSV file, - for stdin')
+        parser_import.add_argument('--format', choices=['jsonl', 'csv'], default=None,
+                                   help='defaults to csv for .csv files and jsonl otherwise')
+        parser_import.add_argument('--batch-size', type=int, default=10000)
+        parser_import.add_argument('--name-cache-size', type=int, default=100000,
+                                   help='maximal number of cached node names')
+        parser_import.set_defaults(func=self.import_net)
+
+        parser_export = subparsers.add_parser('export', help='Export relation types, nodes and relations')
+        parser_export.add_argument('file', help='JSON lines or CSV file, - for stdout')
+        parser_export.add_argument('--format', choices=['jsonl', 'csv'], default=None,
+                                   help='defaults to csv for .csv files and jsonl otherwise')
+        parser_export.add_argument('--type', '-t', dest='relation_types', action='append', default=None,
+                                   help='only export relations of this type (repeatable)')
+        parser_export.add_argument('--batch-size', type=int, default=10000)
+        parser_export.set_defaults(func=self.export_net)
+
+        # create the parser for the "admin" command group
+        #################################################
+        parser_admin = subparsers.add_parser('admin', help='database administration commands')
+        admin_subparsers = parser_admin.add_subparsers()
+
+        # create a parser for the "admin indexes" command
+        parser_admin_indexes = admin_subparsers.add_parser('indexes', help='Report missing and unused indexes')
+        parser_admin_indexes.add_argument('--create', action='store_true', default=False,
+                                          help='create the missing indexes')
+        parser_admin_indexes.set_defaults(func=self.admin_indexes)
+
+        # create a parser for the "admin closure" command
+        parser_admin_closure = admin_subparsers.add_parser(
+            'closure', help='Rebuild the stored closure of the transitive relation types')
+        parser_admin_closure.add_argument('relation_type_name', default=None, nargs='?')
+        parser_admin_closure.set_defaults(func=self.admin_closure)
+
+        # create a parser for the "admin usage" command
+        parser_admin_usage = admin_subparsers.add_parser(
+            'usage', help='Recount the relations of every relation type')
+        parser_admin_usage.set_defaults(func=self.admin_usage)
+
+        # create a parser for the "admin adjacency" command
+        parser_admin_adjacency = admin_subparsers.add_parser(
+            'adjacency', help='Show or migrate how the relations of the nodes are stored (MongoDB only)')
+        parser_admin_adjacency.add_argument('mode', choices=['embedded', 'derived'], default=None, nargs='?',
+                                            help='embedded: relation id arrays on the node documents, '
+                                                 'derived: queried from the indexed relation collections')
+        parser_admin_adjacency.set_defaults(func=self.admin_adjacency)
+
+        # create a parser for the "admin analytics" command
+        parser_admin_analytics = admin_subparsers.add_parser(
+            'analytics', help='Rank the nodes and store the results as node fields (requires numpy and scipy)')
+        parser_admin_analytics.add_argument('metric', choices=['pagerank', 'in_degree', 'out_degree', 'component'])
+        parser_admin_analytics.add_argument('--type', '-t', dest='relation_types', action='append', default=None,
+                                            help='only use relations of this type (repeatable)')
+        parser_admin_analytics.add_argument('--weighted', action='store_true', default=False,
+                                            help='weight the relations by their probability')
+        parser_admin_analytics.add_argument('--field', default=None,
+                                            help='the node field to store the results in, defaults to the metric')
+        parser_admin_analytics.set_defaults(func=self.admin_analytics)
+        return parser
+
+    def run(self, argv: Optional[List[str]] = None) -> None:
+        parser = self.build_parser()
+        args = parser.parse_args(argv)
+        if 'func' not in args:
+            parser.print_help()
+            return
+        if self.backend is None:
+            self.backend = open_backend(args.db)
+        profiler = None
+        if args.profile:
+            from QueryInstrumentation import QueryProfiler
+            profiler = QueryProfiler()
+            try:
+                self.backend.set_profiler(profiler)
+            except (NotImplementedError, RuntimeError) as e:
+                print(f'Profiling disabled: {e}', file=sys.stderr)
+                profiler = None
+        if args.session_cache_size > 0 and not isinstance(self.backend, CachingBackend):
+            self.backend = CachingBackend(self.backend, max_size=args.session_cache_size, prefetch=args.prefetch)
+        try:
+            args.func(args)
+        finally:
+            if isinstance(self.backend, CachingBackend):
+                self.backend.stop_prefetch()
+            if profiler is not None:
+                print(profiler.summary(), file=sys.stderr)
 
     def list_nodes(self, args):
-        print(self.backend.get_all_node_names())
+        last_id = None
+        count = 0
+        for node in self.backend.iter_nodes(name_prefix=args.prefix,
+                                            after=ObjectId(args.after) if args.after else None,
+                                            limit=args.limit):
+            print(f'{node["_id"]} {node["name"]}' if args.ids else node['name'])
+            last_id = node['_id']
+            count += 1
+        if args.limit and count == args.limit:
+            print(f'More nodes may follow, continue with --after {last_id}', file=sys.stderr)
+
+    def search_nodes(self, args):
+        for node, score in self.backend.search_nodes(args.query, limit=args.limit, prefix=args.prefix):
+            print(f'{score:.2f} {node.name}: {node.description}')
 
     def list_relationtypes(self, args):
         if args.uni:
             print('Unidirectional relation types:')
             self.print_line('-')
-            for uni_type in self.backend.get_uni_relationtypes():
-                print(f'{uni_type.name}: {uni_type.description}')
+            uni_types = self.backend.get_uni_relationtypes()
+            usage_numbers = self.backend.get_relationtype_usage_numbers([uni_type.id for uni_type in uni_types],
+                                                                        uni=True)
+            for uni_type in uni_types:
+                print(f'{uni_type.name}: {uni_type.description} ({usage_numbers.get(uni_type.id, 0)} relations)')
             print()
         if args.bi:
             print('Bidirectional relation types:')
             self.print_line('-')
-            for bi_type in self.backend.get_bi_relationtypes():
-                print(f'{bi_type.name}: {bi_type.description}')
+            bi_types = self.backend.get_bi_relationtypes()
+            usage_numbers = self.backend.get_relationtype_usage_numbers([bi_type.id for bi_type in bi_types], uni=False)
+            for bi_type in bi_types:
+                print(f'{bi_type.name}: {bi_type.description} ({usage_numbers.get(bi_type.id, 0)} relations)')
+
+    def import_net(self, args):
+        file_format = args.format or KnowledgeNetIO.guess_format(args.file)
+        source = sys.stdin if args.file == '-' else open(args.file, newline='')
+        try:
+            importer = KnowledgeNetIO.import_net(self.backend, source, file_format, args.batch_size,
+                                                 args.name_cache_size)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        for line_number, error in importer.failures:
+            print(f'line {line_number}: {error}', file=sys.stderr)
+        print('Imported {relation_type} relation types, {node} nodes and {relation} relations.'.format(
+            **importer.counts), file=sys.stderr)
+
+    def export_net(self, args):
+        file_format = args.format or KnowledgeNetIO.guess_format(args.file)
+        relation_type_ids = None
+        if args.relation_types:
+            relation_type_ids = [self.find_relationtype_id(name)[1] for name in args.relation_types]
+        output = sys.stdout if args.file == '-' else open(args.file, 'w', newline='')
+        try:
+            count = KnowledgeNetIO.export_net(self.backend, output, file_format, relation_type_ids, args.batch_size)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        print(f'Exported {count} records.', file=sys.stderr)
+
+    def admin_indexes(self, args):
+        if args.create:
+            backfilled = self.backend.backfill_name_search()
+            if backfilled:
+                print(f'Added the name search fields to {backfilled} nodes.')
+            self.backend.ensure_indexes()
+        for collection, report in self.backend.index_report().items():
+            print(f'{collection}:')
+            print(f'\tmissing: {", ".join(report["missing"]) or "-"}')
+            print(f'\tunused: {", ".join(report["unused"]) or "-"}')
+
+    def admin_closure(self, args):
+        relation_type_id = None
+        if args.relation_type_name:
+            _, relation_type_id = self.find_relationtype_id(args.relation_type_name)
+        self.backend.rebuild_transitive_closure(relation_type_id)
+
+    def admin_usage(self, args):
+        self.backend.rebuild_relation_type_usage()
+
+    def admin_adjacency(self, args):
+        if not hasattr(self.backend, 'migrate_adjacency_storage'):
+            print('This backend has no adjacency storage modes, the relations of the nodes are always derived.')
+            return
+        from MongoBackend import AdjacencyStorage
+        if args.mode is not None:
+            self.backend.migrate_adjacency_storage(AdjacencyStorage[args.mode.upper()])
+        print(f'adjacency storage: {self.backend.adjacency_storage.name.lower()}')
+
+    def admin_analytics(self, args):
+        # numpy and scipy are only imported when needed
+        from GraphAnalytics import SparseGraph, write_node_field
+        relation_type_ids = None
+        if args.relation_types:
+            relation_type_ids = [self.find_relationtype_id(name)[1] for name in args.relation_types]
+        graph = SparseGraph.from_backend(self.backend, relation_type_ids, weighted=args.weighted,
+                                         include_isolated=True)
+        metrics = {
+            'pagerank': graph.pagerank,
+            'in_degree': graph.in_degrees,
+            'out_degree': graph.out_degrees,
+            'component': graph.connected_components,
+        }
+        write_node_field(self.backend, graph, args.field or args.metric, metrics[args.metric]())
+        print(f'Stored {args.metric} of {len(graph)} nodes in the field "{args.field or args.metric}".')
 
     def create_node(self, args=None):
         if args is not None:
@@ -219,12 +430,14 @@ class KnowledgeNetFrontend:
             description = input('Enter the description of the new relation type: ')
         reflexive = self.yes_no('Is the new relation type reflexive (allows loops)? [Y/n] ')
         probabilistic = self.yes_no('Is the new relation type probabilistic (allows uncertain relations)? [Y/n] ')
+        transitive = self.yes_no('Is the new relation type transitive (a to b and b to c imply a to c)? [Y/n] ')
         result = self.backend.add_rel_type(RelationType(
             name=name,
             uni=uni,
             description=description,
             probabilistic=probabilistic,
-            reflexive=reflexive))
+            reflexive=reflexive,
+            transitive=transitive))
         print(result)
 
     def node_info(self, args):
@@ -249,7 +462,7 @@ class KnowledgeNetFrontend:
             node_ids = self.backend.get_all_uni_connected_nodes(node.id, relation_type_id, include_direction=directed)
         else:
             node_ids = self.backend.get_all_bi_connected_nodes(node.id, relation_type_id)
-        nodes: List[Node] = self.backend.get_nodes(node_ids)
+        nodes: List[Node] = self.backend.get_nodes(node_ids, NodeView.SUMMARY)
         self.print_line()
         print(f'Nodes connected to {node.name}: ')
         self.print_line('-')
@@ -307,10 +520,9 @@ class KnowledgeNetFrontend:
             self.print_line()
             print(node.name)
             self.print_line('-')
-            node_dict = node.to_dict()
+            node_dict = node.to_dict(include_relations=False)
             for key in node_dict.keys():
-                if 'relations' not in key:
-                    print('{}: {}'.format(key, node_dict[key]))
+                print('{}: {}'.format(key, node_dict[key]))
         if relation_info['in_relations']:
             if not ask:
                 print('in_relations: ')
@@ -417,35 +629,82 @@ class KnowledgeNetFrontend:
         print(result)
 
     def relations_between(self, args):
-        # TODO: Fix this mess
-        node_1_id = self.to_node_id(input('Enter the name of the first node: '))
-        node_2_id = self.to_node_id(input('Enter the name of the second node: '))
-        uni_relations, bi_relations = self.backend.get_relations_between(node_1_id, node_2_id)
-        print(list(zip(self.backend.get_bi_relationtypes([rel['_id'] for rel in bi_relations]), bi_relations)))
-        if args.uni:
+        node_1_name, node_2_name = str(args.node_1_name), str(args.node_2_name)
+        if node_1_name == '':
+            node_1_name = input('Enter the name of the first node: ')
+        if node_2_name == '':
+            node_2_name = input('Enter the name of the second node: ')
+        node_1 = self.to_node(node_1_name)
+        node_2 = self.to_node(node_2_name)
+        names = {node_1.id: node_1.name, node_2.id: node_2.name}
+        uni_relations, bi_relations = self.backend.get_relations_between_many([(node_1.id, node_2.id)])[
+            (node_1.id, node_2.id)]
+        # without --uni or --bi both are listed
+        if args.uni or not args.bi:
             print('Unidirectional relations:')
             self.print_line('-')
-            for uni_relation in zip(self.backend.get_uni_relationtypes([rel.id for rel in uni_relations]), uni_relations):
-                print(f'{uni_relation[0].name}: {uni_relation[1].id}')
+            for relation_type, relation in uni_relations:
+                print(f'"{names[relation.node_from]}" {relation_type.name} "{names[relation.node_to]}" '
+                      f'{self.probability_str(relation_type, relation)}({relation.id})')
             print()
-        if args.bi:
+        if args.bi or not args.uni:
             print('Bidirectional relations:')
             self.print_line('-')
-            for bi_relation in zip(self.backend.get_bi_relationtypes([rel.id for rel in bi_relations]), bi_relations):
-                print(f'{bi_relation[0].name}: {bi_relation[1].id}')
+            for relation_type, relation in bi_relations:
+                print(f'{relation_type.name} {self.probability_str(relation_type, relation)}({relation.id})')
+
+    @staticmethod
+    def probability_str(relation_type: RelationType, relation: Union[UniRelation, BiRelation]) -> str:
+        return f'[{relation.probability}] ' if relation_type.probabilistic else ''
+
+    def relation_path(self, args):
+        node_1_name, node_2_name = str(args.node_1_name), str(args.node_2_name)
+        if node_1_name == '':
+            node_1_name = input('Enter the name of the first node: ')
+        if node_2_name == '':
+            node_2_name = input('Enter the name of the second node: ')
+        node_1_id = self.to_node_id(node_1_name)
+        node_2_id = self.to_node_id(node_2_name)
+        relation_type_ids = None
+        if args.relation_types:
+            relation_type_ids = [self.find_relationtype_id(name)[1] for name in args.relation_types]
+
+        path = self.backend.shortest_path(node_1_id, node_2_id, relation_type_ids,
+                                          max_depth=args.max_depth, directed=args.directed)
+        if path is None:
+            print(f'There is no path between \"{node_1_name}\" and \"{node_2_name}\".')
+            return
+        node_ids, relations = path
+        names = {node.id: node.name for node in self.backend.get_nodes(node_ids, NodeView.SUMMARY)}
+        line = names[node_ids[0]]
+        for node_id, next_node_id, relation in zip(node_ids, node_ids[1:], relations):
+            type_name = self.backend.get_relation_type_name(relation.type, relation.is_uni)
+            if not relation.is_uni:
+                line += f' <-{type_name}-> '
+            elif relation.node_from == node_id:
+                line += f' -{type_name}-> '
+            else:
+                line += f' <-{type_name}- '
+            line += names[next_node_id]
+        print(line)
 
     def to_node(self, name: Union[str, ObjectId, Dict, Node], exit_on_err: bool = True) -> Optional[Node]:
         if type(name) == ObjectId:
-            return self.backend.get_node(name)
+            return self.backend.get_node(name, NodeView.SUMMARY)
         if type(name) == dict:
             return Node.from_dict(name)
         if type(name) == Node:
             return name
 
         # so it has to be str:
-        nodes = self.backend.list_nodes_by_name(name)
+        nodes = self.backend.list_nodes_by_name(name, view=NodeView.SUMMARY)
         if not nodes:
             print('There is no node known by the name \"{}\"'.format(name))
+            suggestions = [node for node, _ in self.backend.search_nodes(name)]
+            if suggestions:
+                selection = self.select_suggestion(suggestions)
+                if selection is not None:
+                    return suggestions[selection]
             if exit_on_err:
                 print('Exiting...')
                 sys.exit()
@@ -495,9 +754,9 @@ class KnowledgeNetFrontend:
 
     def find_relationtype_id(self, name: Union[ObjectId, str], dir: Tuple[bool, bool] = (True, True), exit_on_err: bool = True) -> Tuple[Optional[bool], Optional[ObjectId]]:
         if type(name) == ObjectId:
-            if dir[0] and self.backend.uni_rel_type_coll.find({'_id': name}).limit(1).size():
+            if dir[0] and self.backend.get_relation_type(name, uni=True):
                 uni = True
-            elif dir[1] and self.backend.bi_rel_type_coll.find({'_id': name}).limit(1).size():
+            elif dir[1] and self.backend.get_relation_type(name, uni=False):
                 uni = False
             else:
                 uni = None
@@ -532,18 +791,31 @@ class KnowledgeNetFrontend:
             selection = input('Enter your selection: ')
         return int(selection)
 
+    def select_suggestion(self, nodes: List[Node]) -> Optional[int]:
+        print('Did you mean: ')
+        for i, node in enumerate(nodes):
+            print('{} - {}: {}'.format(i, node.name, node.description))
+        selection = ''
+        while not selection.isdigit() or len(nodes) <= int(selection):
+            selection = input('Enter your selection (q to quit): ')
+            if selection.strip().lower() == 'q':
+                return None
+        return int(selection)
+
     def select_relationtype(self, types: List[RelationType], uni_count=-1):
-        print('There exist multiple relation types with the name \"{}\": '.format(types[0]['name']))
+        print('There exist multiple relation types with the name \"{}\": '.format(types[0].name))
         rel_type_group = ''
+        usage_numbers = dict()
+        if uni_count >= 0:
+            usage_numbers = self.backend.get_relationtype_usage_numbers([type.id for type in types[:uni_count]],
+                                                                        uni=True)
+            usage_numbers.update(
+                self.backend.get_relationtype_usage_numbers([type.id for type in types[uni_count:]], uni=False))
         for i, type in enumerate(types):
             usage_count = ''
             if uni_count >= 0:
-                if i < uni_count:
-                    rel_type_group = '[uni]'
-                    usage_count = ' (used in {} relations)'.format(self.backend.get_uni_relationtype_usage_number(type.id))
-                else:
-                    rel_type_group = '[bi]'
-                    usage_count = ' (used in {} relations)'.format(self.backend.get_bi_relationtype_usage_number(type.id))
+                rel_type_group = '[uni]' if i < uni_count else '[bi]'
+                usage_count = ' (used in {} relations)'.format(usage_numbers.get(type.id, 0))
 
             print('{} - {} {}: {}{}'.format(i, type.name, rel_type_group, type.description, usage_count))
         selection = ''
@@ -598,7 +870,8 @@ class KnowledgeNetFrontend:
             print(f"{action['key']} - {action['name']}: {action['description']}")
 
     def print_line(self, char='#') -> None:
-        print(char * int(self.columns))
+        print(char * shutil.get_terminal_size().columns)
 
 
-twf = KnowledgeNetFrontend()
+if __name__ == '__main__':
+    KnowledgeNetFrontend().run()
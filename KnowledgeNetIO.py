@@ -0,0 +1,280 @@
+import csv
+import json
+from typing import List, Dict, Tuple, Optional, Union, Iterable, Iterator, TextIO
+from bson import ObjectId
+from NetElements.Nodes.Node import Node, NodeView
+from NetElements.Relations.Relations import BiRelation, UniRelation, Relation, RelationType
+from KnowledgeNetBackend import KnowledgeNetBackend
+from SessionCache import BoundedCache
+
+# Every record has a 'kind' ('relation_type', 'node' or 'relation'). Nodes and relation types are referenced by ID
+# or by name. Exports write relation types first, then nodes, then relations, so they can be imported in one pass.
+CSV_COLUMNS = ['kind', 'id', 'name', 'description', 'uni', 'type', 'from', 'to', 'probability', 'reflexive',
+               'probabilistic', 'transitive', 'values']
+FORMATS = ('jsonl', 'csv')
+
+
+def guess_format(path: str) -> str:
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def _object_id(reference: str) -> Optional[ObjectId]:
+    return ObjectId(reference) if len(reference) == 24 and ObjectId.is_valid(reference) else None
+
+
+# export
+########
+
+def iter_records(backend: KnowledgeNetBackend,
+                 relation_type_ids: Optional[List[ObjectId]] = None,
+                 batch_size: int = 10000,
+                 ) -> Iterator[Dict]:
+    """
+    Streams the net as export records. Nodes and relations are read from cursors and never held in memory at once.
+    :param backend: The backend to export.
+    :param relation_type_ids: Only export relations (and relation types) of these types. All types if None.
+    :param batch_size: The number of nodes and relations fetched per round trip.
+    """
+    for uni in (True, False):
+        for relation_type in backend.get_uni_relationtypes() if uni else backend.get_bi_relationtypes():
+            if relation_type_ids is not None and relation_type.id not in relation_type_ids:
+                continue
+            yield {'kind': 'relation_type', 'id': str(relation_type.id), 'name': relation_type.name, 'uni': uni,
+                   'description': relation_type.description, 'reflexive': relation_type.reflexive,
+                   'probabilistic': relation_type.probabilistic, 'transitive': relation_type.transitive,
+                   'values': relation_type.values}
+    for node in backend.iter_nodes(fields=('name', 'description'), batch_size=batch_size):
+        yield {'kind': 'node', 'id': str(node['_id']), 'name': node['name'],
+               'description': node.get('description', '')}
+    for uni in (True, False):
+        for relation in backend.iter_relations(uni, relation_type_ids, batch_size=batch_size):
+            yield {'kind': 'relation', 'uni': uni, 'type': str(relation.type), 'from': str(relation.node_1),
+                   'to': str(relation.node_2), 'probability': relation.probability}
+
+
+def export_net(backend: KnowledgeNetBackend,
+               output: TextIO,
+               file_format: str = 'jsonl',
+               relation_type_ids: Optional[List[ObjectId]] = None,
+               batch_size: int = 10000,
+               ) -> int:
+    """
+    Writes the net as JSON lines or CSV.
+    :param output: The text file to write to.
+    :param file_format: 'jsonl' or 'csv'.
+    :return: The number of written records.
+    """
+    records = iter_records(backend, relation_type_ids, batch_size)
+    count = 0
+    if file_format == 'csv':
+        writer = csv.DictWriter(output, CSV_COLUMNS)
+        writer.writeheader()
+        for record in records:
+            if 'values' in record:
+                record['values'] = json.dumps(record['values'])
+            writer.writerow(record)
+            count += 1
+    else:
+        for record in records:
+            output.write(json.dumps(record))
+            output.write('\n')
+            count += 1
+    return count
+
+
+# import
+########
+
+def _parse_bool(value: Union[bool, str, None], default: bool = False) -> bool:
+    if isinstance(value, bool):
+        return value
+    if value is None or value == '':
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+def read_records(source: TextIO, file_format: str = 'jsonl') -> Iterator[Tuple[int, Dict]]:
+    """
+    :return: Iterator over (line number, record) tuples. Empty CSV cells are left out of the records. Lines that are
+    not valid JSON are yielded with the decoding error in place of the record.
+    """
+    if file_format == 'csv':
+        for line_number, row in enumerate(csv.DictReader(source), start=2):
+            yield line_number, {key: value for key, value in row.items() if value not in (None, '')}
+    else:
+        for line_number, line in enumerate(source, start=1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, e
+
+
+class NetImporter:
+    """
+    Imports records (see iter_records) in batches. Names are resolved to IDs through bounded caches, so memory use
+    does not grow with the size of the import.
+    """
+
+    def __init__(self, backend: KnowledgeNetBackend, batch_size: int = 10000, cache_size: int = 100000):
+        self.backend = backend
+        self.batch_size = batch_size
+        self._node_ids = BoundedCache(cache_size)
+        self._nodes: List[Node] = list()
+        self._node_lines: List[int] = list()
+        # IDs and names of the buffered nodes, relations to them have to wait until the nodes are written
+        self._buffered_node_references = set()
+        self._relations: List[Union[UniRelation, BiRelation]] = list()
+        self._relation_lines: List[int] = list()
+        self.counts = {'relation_type': 0, 'node': 0, 'relation': 0}
+        self.failures: List[Tuple[int, str]] = list()
+
+    def import_records(self, records: Iterable[Tuple[int, Union[Dict, ValueError]]]) -> None:
+        """
+        :param records: (line number, record) tuples, see read_records. Records that are errors are reported as
+        failures of their line.
+        """
+        try:
+            for line_number, record in records:
+                try:
+                    if isinstance(record, ValueError):
+                        raise record
+                    kind = record['kind']
+                    if kind == 'relation_type':
+                        self._import_relation_type(record)
+                    elif kind == 'node':
+                        self._import_node(line_number, record)
+                    elif kind == 'relation':
+                        self._import_relation(line_number, record)
+                    else:
+                        raise ValueError(f'unknown kind "{kind}"')
+                except (KeyError, TypeError, ValueError) as e:
+                    self.failures.append((line_number, f'{type(e).__name__}: {e}'))
+        finally:
+            # the buffered records are written even if reading the source fails
+            self.flush()
+            self.failures.sort(key=lambda failure: failure[0])
+
+    def flush(self) -> None:
+        self._flush_nodes()
+        self._flush_relations()
+
+    def _flush_nodes(self) -> None:
+        if not self._nodes:
+            return
+        # nodes whose IDs are taken (by an earlier import or earlier in this one) are reported instead of written
+        existing_ids = {node.id for node in self.backend.get_nodes([node.id for node in self._nodes],
+                                                                    view=NodeView.SUMMARY)}
+        nodes = list()
+        for line_number, node in zip(self._node_lines, self._nodes):
+            if node.id in existing_ids:
+                self.failures.append((line_number, f'ValueError: node {node.id} already exists'))
+            else:
+                existing_ids.add(node.id)
+                nodes.append(node)
+        if nodes:
+            self.backend.add_nodes(nodes)
+        self.counts['node'] += len(nodes)
+        self._nodes = list()
+        self._node_lines = list()
+        self._buffered_node_references = set()
+
+    def _flush_relations(self) -> None:
+        if not self._relations:
+            return
+        inserted_ids, failures = self.backend.add_relations(self._relations, batch_size=self.batch_size)
+        self.counts['relation'] += len(inserted_ids)
+        self.failures += [(self._relation_lines[position], f'{type(e).__name__}: {e}') for position, e in failures]
+        self._relations = list()
+        self._relation_lines = list()
+
+    def _import_relation_type(self, record: Dict) -> None:
+        uni = _parse_bool(record.get('uni'), default=True)
+        relation_type_id = _object_id(record.get('id', ''))
+        if relation_type_id is not None and self.backend.get_relation_type(relation_type_id) is not None:
+            return
+        if relation_type_id is None and self.backend.list_relationtypes_by_name(record['name'], uni):
+            return
+        values = record.get('values') or dict()
+        if isinstance(values, str):
+            values = json.loads(values)
+        self.backend.add_rel_type(RelationType(
+            name=record['name'],
+            uni=uni,
+            description=record.get('description', ''),
+            values=values,
+            reflexive=_parse_bool(record.get('reflexive')),
+            probabilistic=_parse_bool(record.get('probabilistic')),
+            relation_type_id=relation_type_id,
+            transitive=_parse_bool(record.get('transitive')),
+        ))
+        self.counts['relation_type'] += 1
+
+    def _import_node(self, line_number: int, record: Dict) -> None:
+        node = Node(name=record['name'], description=record.get('description', ''),
+                    object_id=_object_id(record.get('id', '')) or ObjectId())
+        self._nodes.append(node)
+        self._node_lines.append(line_number)
+        self._buffered_node_references.update((str(node.id), node.name))
+        if len(self._nodes) >= self.batch_size:
+            self._flush_nodes()
+
+    def _node_id(self, reference: str) -> ObjectId:
+        node_id = _object_id(reference)
+        if node_id is not None:
+            return node_id
+        node_id = self._node_ids.get(reference)
+        if node_id is None:
+            nodes = self.backend.list_nodes_by_name(reference, view=NodeView.SUMMARY)
+            if len(nodes) != 1:
+                raise ValueError(f'{"no" if not nodes else "more than one"} node named "{reference}"')
+            node_id = nodes[0].id
+            self._node_ids.put(reference, node_id)
+        return node_id
+
+    def _refers_to_buffered_node(self, reference: str) -> bool:
+        node_id = _object_id(reference)
+        return (str(node_id) if node_id is not None else reference) in self._buffered_node_references
+
+    def _relation_type_id(self, reference: str, uni: bool) -> ObjectId:
+        relation_type_id = _object_id(reference)
+        if relation_type_id is not None:
+            return relation_type_id
+        relation_types = self.backend.list_relationtypes_by_name(reference, uni)
+        if len(relation_types) != 1:
+            raise ValueError(f'{"no" if not relation_types else "more than one"} relation type named "{reference}"')
+        return relation_types[0].id
+
+    def _import_relation(self, line_number: int, record: Dict) -> None:
+        if self._refers_to_buffered_node(str(record['from'])) or self._refers_to_buffered_node(str(record['to'])):
+            self._flush_nodes()
+        uni = _parse_bool(record.get('uni'), default=True)
+        self._relations.append(Relation.create_relation(
+            is_uni=uni,
+            relation_type_id=self._relation_type_id(str(record['type']), uni),
+            node_from_id=self._node_id(str(record['from'])),
+            node_to_id=self._node_id(str(record['to'])),
+            probability=float(record.get('probability', 1)),
+        ))
+        self._relation_lines.append(line_number)
+        if len(self._relations) >= self.batch_size:
+            self._flush_relations()
+
+
+def import_net(backend: KnowledgeNetBackend,
+               source: TextIO,
+               file_format: str = 'jsonl',
+               batch_size: int = 10000,
+               cache_size: int = 100000,
+               ) -> NetImporter:
+    """
+    Imports JSON lines or CSV records into the net.
+    :param source: The text file to read from.
+    :param file_format: 'jsonl' or 'csv'.
+    :param batch_size: The number of nodes and relations written per batch.
+    :param cache_size: The maximal number of cached node names.
+    :return: The importer, holding the counts of imported records and the failed lines.
+    """
+    importer = NetImporter(backend, batch_size, cache_size)
+    importer.import_records(read_records(source, file_format))
+    return importer
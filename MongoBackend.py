@@ -1,84 +1,688 @@
+import re
 import pymongo
+from pymongo.errors import BulkWriteError
 from bson import ObjectId
-from typing import List, Set, Dict, Tuple, Optional, Union
-import KnowledgeNetExceptions
-from NetElements.Nodes.Node import Node
+from collections import Counter, defaultdict
+from functools import partial
+from enum import IntEnum
+from itertools import islice
+from typing import List, Set, Dict, Tuple, Optional, Union, Iterable, Iterator, Sequence, Any
+from NetElements.Nodes.Node import Node, NodeView
 from NetElements.Relations.Relations import BiRelation, UniRelation, Relation, RelationType
+from NetElements.Relations.RelationBatch import RelationBatch
+from AdjacencyIndex import AdjacencyIndex
+from KnowledgeNetBackend import KnowledgeNetBackend
+from NameSearch import PREFIX_END, normalize_name, name_trigrams, query_trigrams, similarity
+from QueryInstrumentation import QueryProfiler, instrument_methods
 
 
-class MongoBackend:
-    def __init__(self, db_path, db_name='world'):
-        self.client = pymongo.MongoClient(db_path)
-        self.db = self.client[db_name]
-        self.node_coll = self.db['nodes']
-        self.uni_rel_coll = self.db['uni_relations']
-        self.bi_rel_coll = self.db['bi_relations']
-        self.uni_rel_type_coll = self.db['uni_relation_types']
-        self.bi_rel_type_coll = self.db['bi_relation_types']
+# indexes matching the query shapes of the backend: {collection name: [(keys, index name)]}
+INDEXES = {
+    'nodes': [
+        ([('name', pymongo.ASCENDING)], 'name'),
+        ([('name_normalized', pymongo.ASCENDING)], 'name_normalized'),
+        ([('name_trigrams', pymongo.ASCENDING)], 'name_trigrams'),
+    ],
+    'uni_relations': [
+        ([('node_from', pymongo.ASCENDING), ('type', pymongo.ASCENDING)], 'node_from_type'),
+        ([('node_to', pymongo.ASCENDING), ('type', pymongo.ASCENDING)], 'node_to_type'),
+        ([('endpoints', pymongo.ASCENDING), ('type', pymongo.ASCENDING)], 'endpoints_type'),
+        ([('type', pymongo.ASCENDING)], 'type'),
+    ],
+    'bi_relations': [
+        ([('node_1', pymongo.ASCENDING), ('type', pymongo.ASCENDING)], 'node_1_type'),
+        ([('node_2', pymongo.ASCENDING), ('type', pymongo.ASCENDING)], 'node_2_type'),
+        ([('endpoints', pymongo.ASCENDING), ('type', pymongo.ASCENDING)], 'endpoints_type'),
+        ([('type', pymongo.ASCENDING)], 'type'),
+    ],
+    'uni_relation_types': [
+        ([('name', pymongo.ASCENDING)], 'name'),
+    ],
+    'bi_relation_types': [
+        ([('name', pymongo.ASCENDING)], 'name'),
+    ],
+    'closure': [
+        ([('type', pymongo.ASCENDING), ('node_from', pymongo.ASCENDING), ('node_to', pymongo.ASCENDING)],
+         'type_from_to'),
+        ([('type', pymongo.ASCENDING), ('node_to', pymongo.ASCENDING)], 'type_to'),
+    ],
+}
+
+# stored in the settings by ensure_indexes, identifies the declared indexes
+INDEXES_FINGERPRINT = repr(sorted(INDEXES.items()))
+
+# the maximal number of $or branches of one query of _relations_between_pairs
+PAIR_QUERY_BRANCHES = 500
+
+# the update pipelines of backfill_relation_endpoints: {collection name: pipeline}
+ENDPOINTS_BACKFILL = {
+    'uni_relations': [{'$set': {'endpoints': ['$node_from', '$node_to']}}],
+    'bi_relations': [{'$set': {'endpoints': ['$node_1', '$node_2']}}],
+}
+
+
+class TraversalMode(IntEnum):
+    CLIENT = 0  # breadth first search driven from python, one query per hop
+    INDEX = 1  # breadth first search on the in-process adjacency index
+    SERVER = 2  # a single $graphLookup aggregation
+
+
+class AdjacencyStorage(IntEnum):
+    EMBEDDED = 0  # the relation ids are pushed onto arrays of the node documents
+    DERIVED = 1  # node documents have no relation arrays, they are queried from the indexed relation collections
+
+
+@instrument_methods
+class MongoBackend(KnowledgeNetBackend):
+    # the client has its own connection pool
+    thread_safe = True
+
+    def __init__(self, db_path, db_name='world', adjacency_index: bool = False, ensure_indexes: bool = True,
+                 adjacency_storage: Optional[AdjacencyStorage] = None):
+        """
+        The connection is opened lazily on the first database access.
+        :param db_path: The MongoDB URI.
+        :param db_name: The name of the database.
+        :param adjacency_index: Build the in-process adjacency index on the first traversal which may use it.
+        :param ensure_indexes: Create the indexes when connecting, unless the declared indexes were already created in
+        this database. The backfills of older databases are left to ensure_indexes.
+        :param adjacency_storage: How the relations of the nodes are stored in a new database. A database keeps its
+        mode (see migrate_adjacency_storage), databases without a stored mode use AdjacencyStorage.EMBEDDED.
+        """
+        super().__init__()
+        self.db_path = db_path
+        self.db_name = db_name
+        self._ensure_indexes_on_connect = ensure_indexes
+        self._client: Optional[pymongo.MongoClient] = None
+        self._db = None
+        self._requested_adjacency_storage = adjacency_storage
+        self._adjacency_storage: Optional[AdjacencyStorage] = None
+        self._relation_endpoints = False
+        self._name_search_fields = False
+        self.profiler: Optional[QueryProfiler] = None
+        self.adjacency_index: Optional[AdjacencyIndex] = None
+        # built lazily, so that the scan of all relations shows up in profiles like any other query
+        self._adjacency_index_requested = adjacency_index
+
+    def _connect(self) -> None:
+        listeners = [self.profiler] if self.profiler is not None else []
+        self._client = pymongo.MongoClient(self.db_path, event_listeners=listeners)
+        self._db = self._client[self.db_name]
+        if self._ensure_indexes_on_connect:
+            # one settings lookup instead of a createIndexes command per collection on every connect
+            marker = self._db['settings'].find_one({'_id': 'indexes'})
+            if marker is None or marker['value'] != INDEXES_FINGERPRINT:
+                # the backfills update every document of an older database, they only run here for new databases
+                new_database = marker is None and self._db['nodes'].find_one({}, {'_id': 1}) is None
+                self.ensure_indexes(backfill=new_database)
+
+    @property
+    def client(self) -> pymongo.MongoClient:
+        if self._client is None:
+            self._connect()
+        return self._client
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._connect()
+        return self._db
+
+    @property
+    def node_coll(self):
+        return self.db['nodes']
+
+    @property
+    def uni_rel_coll(self):
+        return self.db['uni_relations']
+
+    @property
+    def bi_rel_coll(self):
+        return self.db['bi_relations']
+
+    @property
+    def uni_rel_type_coll(self):
+        return self.db['uni_relation_types']
+
+    @property
+    def bi_rel_type_coll(self):
+        return self.db['bi_relation_types']
+
+    @property
+    def settings_coll(self):
+        # database wide settings: {_id: setting name, value}
+        return self.db['settings']
+
+    @property
+    def adjacency_storage(self) -> AdjacencyStorage:
+        if self._adjacency_storage is None:
+            self._adjacency_storage = self._load_adjacency_storage()
+        return self._adjacency_storage
+
+    def _load_adjacency_storage(self) -> AdjacencyStorage:
+        setting = self.settings_coll.find_one({'_id': 'adjacency_storage'})
+        if setting is not None:
+            stored = AdjacencyStorage(setting['value'])
+            if self._requested_adjacency_storage not in (None, stored):
+                raise ValueError(f'The database uses {stored.name} adjacency storage, '
+                                 f'migrate it with migrate_adjacency_storage')
+            return stored
+        requested = self._requested_adjacency_storage
+        if requested is None or requested == AdjacencyStorage.EMBEDDED:
+            return AdjacencyStorage.EMBEDDED
+        if self.node_coll.find_one({}, {'_id': 1}) is not None:
+            raise ValueError('The database uses EMBEDDED adjacency storage, migrate it with migrate_adjacency_storage')
+        self._store_adjacency_storage(requested)
+        return requested
+
+    def _store_adjacency_storage(self, adjacency_storage: AdjacencyStorage) -> None:
+        self.settings_coll.update_one({'_id': 'adjacency_storage'}, {'$set': {'value': int(adjacency_storage)}},
+                                      upsert=True)
+        self._adjacency_storage = adjacency_storage
+
+    @property
+    def embedded_relations(self) -> bool:
+        return self.adjacency_storage == AdjacencyStorage.EMBEDDED
+
+    def migrate_adjacency_storage(self, adjacency_storage: AdjacencyStorage, batch_size: int = 1000) -> None:
+        """
+        Converts the database to another adjacency storage mode. Other clients must not write during the migration.
+        :param adjacency_storage: The new mode.
+        :param batch_size: The number of relations read per round trip when the relation arrays are rebuilt.
+        """
+        if adjacency_storage == self.adjacency_storage:
+            return
+        if adjacency_storage == AdjacencyStorage.DERIVED:
+            self.backfill_relation_endpoints()
+            # from here on the arrays are ignored, so a failure while removing them leaves a consistent database
+            self._store_adjacency_storage(adjacency_storage)
+            self.node_coll.update_many({}, {'$unset': {'in_relations': '', 'out_relations': '', 'bi_relations': ''}})
+            return
+        self.node_coll.update_many({}, {'$set': {'in_relations': [], 'out_relations': [], 'bi_relations': []}})
+        for collection, fields in ((self.uni_rel_coll, (('node_from', 'out_relations'), ('node_to', 'in_relations'))),
+                                   (self.bi_rel_coll, (('node_1', 'bi_relations'), ('node_2', 'bi_relations')))):
+            cursor = collection.find({}, {node_field: 1 for node_field, _ in fields}, batch_size=batch_size)
+            batch = list(islice(cursor, batch_size))
+            while batch:
+                node_pushes: Dict[Tuple[ObjectId, str], List[ObjectId]] = defaultdict(list)
+                for relation in batch:
+                    for node_field, relation_field in fields:
+                        node_pushes[(relation[node_field], relation_field)].append(relation['_id'])
+                self.node_coll.bulk_write([
+                    pymongo.UpdateOne({'_id': node_id}, {'$push': {field: {'$each': relation_ids}}})
+                    for (node_id, field), relation_ids in node_pushes.items()
+                ], ordered=False)
+                batch = list(islice(cursor, batch_size))
+        # the arrays are only read once they are complete
+        self._store_adjacency_storage(adjacency_storage)
+
+    @property
+    def closure_coll(self):
+        # materialized closure of the transitive relation types: {type, node_from, node_to}
+        return self.db['closure']
+
+    def set_profiler(self, profiler: QueryProfiler) -> None:
+        """
+        Registers a QueryProfiler as pymongo command listener. The statistics are available from profiler.stats().
+        Must be called before the first database access, as listeners can not be added to a connected client.
+        """
+        if self._client is not None:
+            raise RuntimeError('The profiler must be set before the backend connects')
+        self.profiler = profiler
+
+    def ensure_indexes(self, backfill: bool = True) -> None:
+        """
+        Creates all indexes declared in INDEXES. Existing indexes are left untouched, so this is idempotent.
+        Records the created indexes in the settings, connecting only calls this again if INDEXES changed.
+        :param backfill: Also add the indexed fields to the documents of older databases, see
+        backfill_relation_endpoints and backfill_name_search. These update every such document.
+        """
+        for collection_name, indexes in INDEXES.items():
+            self.db[collection_name].create_indexes([pymongo.IndexModel(keys, name=name) for keys, name in indexes])
+        if backfill:
+            self.backfill_relation_endpoints()
+            self.backfill_name_search()
+        self.settings_coll.update_one({'_id': 'indexes'}, {'$set': {'value': INDEXES_FINGERPRINT}}, upsert=True)
+
+    def index_report(self) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Compares the declared indexes with the existing ones.
+        :return: {collection name: {'missing': [index names], 'unused': [index names]}}. Unused indexes are existing
+        indexes without any access since the server started.
+        """
+        report = dict()
+        for collection_name, indexes in INDEXES.items():
+            collection = self.db[collection_name]
+            existing_keys = [list(info['key']) for info in collection.index_information().values()]
+            missing = [name for keys, name in indexes if keys not in existing_keys]
+            unused = [stats['name'] for stats in collection.aggregate([{'$indexStats': {}}])
+                      if stats['name'] != '_id_' and stats['accesses']['ops'] == 0]
+            report[collection_name] = {'missing': missing, 'unused': unused}
+        return report
+
+    def build_adjacency_index(self) -> AdjacencyIndex:
+        """
+        Loads all relations into an in-process adjacency index which is used for traversals from then on.
+        The index is kept in sync by the write methods of this backend.
+        :return: The new adjacency index.
+        """
+        self.adjacency_index = AdjacencyIndex.from_relation_dicts(
+            self.uni_rel_coll.find({}, {'type': 1, 'node_from': 1, 'node_to': 1}, batch_size=10000),
+            self.bi_rel_coll.find({}, {'type': 1, 'node_1': 1, 'node_2': 1}, batch_size=10000),
+        )
+        self._adjacency_index_requested = False
+        return self.adjacency_index
+
+    def drop_adjacency_index(self) -> None:
+        self.adjacency_index = None
+        self._adjacency_index_requested = False
+
+    @staticmethod
+    def _relation_document(relation: Union[UniRelation, BiRelation]) -> Dict:
+        # 'endpoints' allows $graphLookup to follow relations in both directions
+        relation_dict = relation.to_dict()
+        relation_dict['endpoints'] = [relation.node_1, relation.node_2]
+        return relation_dict
+
+    def backfill_relation_endpoints(self, batch_size: int = 1000) -> int:
+        """
+        Sets the 'endpoints' field on relations stored before it was introduced. Needed for undirected
+        server side traversals, which fall back to client side traversals until the backfill ran.
+        :param batch_size: The number of relations updated per round trip.
+        :return: The number of updated relations.
+        """
+        updated = 0
+        for collection in (self.uni_rel_coll, self.bi_rel_coll):
+            cursor = collection.find({'endpoints': {'$exists': False}}, {'_id': 1}, batch_size=batch_size)
+            batch = [relation['_id'] for relation in islice(cursor, batch_size)]
+            while batch:
+                updated += collection.update_many({'_id': {'$in': batch}},
+                                                  ENDPOINTS_BACKFILL[collection.name]).modified_count
+                batch = [relation['_id'] for relation in islice(cursor, batch_size)]
+        # all relations written from now on have the field
+        self.settings_coll.update_one({'_id': 'relation_endpoints'}, {'$set': {'value': True}}, upsert=True)
+        self._relation_endpoints = True
+        return updated
+
+    @property
+    def relation_endpoints(self) -> bool:
+        """
+        Whether all relations have the 'endpoints' field, see backfill_relation_endpoints.
+        """
+        if not self._relation_endpoints:
+            setting = self.settings_coll.find_one({'_id': 'relation_endpoints'})
+            self._relation_endpoints = setting is not None and setting['value']
+        return self._relation_endpoints
 
     def add_rel_type(self, rel_type: RelationType) -> ObjectId:
+        rel_type_dict = rel_type.to_dict(include_id=rel_type.id is not None)
+        rel_type_dict['usage_count'] = 0
         if rel_type.is_uni:
-            result = self.uni_rel_type_coll.insert_one(rel_type.to_dict())
+            result = self.uni_rel_type_coll.insert_one(rel_type_dict)
         else:
-            result = self.bi_rel_type_coll.insert_one(rel_type.to_dict())
+            result = self.bi_rel_type_coll.insert_one(rel_type_dict)
+        if self.relation_type_cache.loaded:
+            self.relation_type_cache.add(RelationType.from_dict(rel_type_dict))
         return result.inserted_id
 
+    def _load_relation_types(self) -> List[RelationType]:
+        return RelationType.from_dict_list(self.uni_rel_type_coll.find()) + \
+               RelationType.from_dict_list(self.bi_rel_type_coll.find())
+
+    @staticmethod
+    def _node_document(node: Node, include_relations: bool = True) -> Dict:
+        """
+        :param include_relations: Include the relation arrays (only with AdjacencyStorage.EMBEDDED).
+        :return: The node dictionary with the fields of the name search index.
+        """
+        node_dict = node.to_dict(include_id=node.id is not None, include_relations=include_relations)
+        node_dict['name_normalized'] = normalize_name(node.name)
+        node_dict['name_trigrams'] = sorted(name_trigrams(node_dict['name_normalized']))
+        return node_dict
+
+    @staticmethod
+    def _sloppy_name_query(node_name: str, unindexed_names: bool = False) -> Dict:
+        """
+        :param unindexed_names: Also match nodes without the fields of the name search index by their name, as long
+        as backfill_name_search did not run.
+        """
+        normalized_name = normalize_name(node_name)
+        query = {'name_normalized': {'$regex': re.escape(normalized_name)}}
+        trigrams = query_trigrams(normalized_name)
+        if trigrams:
+            # the trigram index narrows the candidates down, the regex checks their order
+            query['name_trigrams'] = {'$all': sorted(trigrams)}
+        if unindexed_names:
+            return {'$or': [query, MongoBackend._unindexed_name_query(re.escape(node_name))]}
+        return query
+
+    @staticmethod
+    def _unindexed_name_query(name_regex: str) -> Dict:
+        # a collection scan, only used until backfill_name_search ran
+        return {'name_normalized': {'$exists': False}, 'name': {'$regex': name_regex, '$options': 'i'}}
+
+    @staticmethod
+    def _unindexed_search_query(normalized_query: str, prefix: bool) -> Dict:
+        # the nodes without the name search fields for search_nodes, see _search_results
+        return MongoBackend._unindexed_name_query(('^' if prefix else '') + re.escape(normalized_query))
+
+    @property
+    def name_search_fields(self) -> bool:
+        """
+        Whether all nodes have the fields of the name search index, see backfill_name_search.
+        """
+        if not self._name_search_fields:
+            setting = self.settings_coll.find_one({'_id': 'name_search'})
+            self._name_search_fields = setting is not None and setting['value']
+        return self._name_search_fields
+
+    @staticmethod
+    def _name_search_update(node_dict: Dict) -> pymongo.UpdateOne:
+        # the fields of _node_document for a node stored before the name search
+        normalized_name = normalize_name(node_dict['name'])
+        return pymongo.UpdateOne({'_id': node_dict['_id']}, {'$set': {
+            'name_normalized': normalized_name,
+            'name_trigrams': sorted(name_trigrams(normalized_name)),
+        }})
+
+    def backfill_name_search(self, batch_size: int = 1000) -> int:
+        """
+        Adds the fields of the name search index to nodes stored before it was introduced.
+        :return: The number of updated nodes.
+        """
+        updated = 0
+        cursor = self.node_coll.find({'name_normalized': {'$exists': False}}, {'name': 1}, batch_size=batch_size)
+        batch = list(islice(cursor, batch_size))
+        while batch:
+            updated += self.node_coll.bulk_write([self._name_search_update(node_dict) for node_dict in batch],
+                                                 ordered=False).modified_count
+            batch = list(islice(cursor, batch_size))
+        # all nodes written from now on have the fields
+        self.settings_coll.update_one({'_id': 'name_search'}, {'$set': {'value': True}}, upsert=True)
+        self._name_search_fields = True
+        return updated
+
     def add_node(self, node: Node) -> ObjectId:
         # TODO: prevent allowing node names which could be an object id
-        result = self.node_coll.insert_one(node.to_dict())
+        result = self.node_coll.insert_one(self._node_document(node, self.embedded_relations))
         return result.inserted_id
 
-    def delete_node(self, node_id: ObjectId) -> None:
+    def delete_nodes(self, node_ids: Iterable[ObjectId], batch_size: int = 1000, use_transaction: bool = False) -> None:
         """
-        Deletes a node and all relations to that node
-        :param node_id: The ID of the deleted node
+        Deletes nodes, all their relations and the IDs of these relations on the remaining neighbour nodes.
+        :param node_ids: The IDs of the deleted nodes.
+        :param batch_size: The number of nodes deleted per batch.
+        :param use_transaction: Run every batch in a transaction (requires a replica set).
         """
-        relations = self.get_relation_ids_of_node(node_id)
-        self.uni_rel_coll.delete_many({'_id': {'$in': relations['in_relations'] + relations['out_relations']}})
-        self.bi_rel_coll.delete_many({'_id': {'$in': relations['bi_relations']}})
-        self.node_coll.delete_one({'_id': node_id})
+        node_ids = iter(node_ids)
+        batch = list(islice(node_ids, batch_size))
+        while batch:
+            if use_transaction:
+                with self.client.start_session() as session:
+                    session.with_transaction(lambda s: self._delete_node_batch(batch, s))
+            else:
+                self._delete_node_batch(batch)
+            if self.adjacency_index is not None:
+                self.adjacency_index.remove_nodes(batch)
+            batch = list(islice(node_ids, batch_size))
+
+    def _delete_node_batch(self, node_ids: List[ObjectId], session=None) -> None:
+        deleted = set(node_ids)
+        closure_affected = self._closure_before_delete(node_ids, session)
+        uni_relations = list(self.uni_rel_coll.find(self._touching_query(node_ids, uni=True),
+                                                    {'node_from': 1, 'node_to': 1, 'type': 1}, session=session))
+        bi_relations = list(self.bi_rel_coll.find(self._touching_query(node_ids, uni=False),
+                                                  {'node_1': 1, 'node_2': 1, 'type': 1}, session=session))
+        pulls = self._pull_updates(uni_relations, bi_relations, deleted) if self.embedded_relations else []
+        if pulls:
+            self.node_coll.bulk_write(pulls, ordered=False, session=session)
+        if uni_relations:
+            self.uni_rel_coll.delete_many({'_id': {'$in': [relation['_id'] for relation in uni_relations]}},
+                                          session=session)
+        if bi_relations:
+            self.bi_rel_coll.delete_many({'_id': {'$in': [relation['_id'] for relation in bi_relations]}},
+                                         session=session)
+        self.node_coll.delete_many({'_id': {'$in': node_ids}}, session=session)
+        self._increment_usage(self._deleted_usage(uni_relations, bi_relations), session)
+        self._closure_after_delete(node_ids, closure_affected, session)
+
+    @staticmethod
+    def _touching_query(node_ids: List[ObjectId], uni: bool) -> Dict:
+        """
+        :return: The query of the (uni or bi) relations starting or ending at any of the nodes.
+        """
+        node_1, node_2 = ('node_from', 'node_to') if uni else ('node_1', 'node_2')
+        return {'$or': [{node_1: {'$in': node_ids}}, {node_2: {'$in': node_ids}}]}
+
+    @staticmethod
+    def _pull_updates(uni_relations: List[Dict], bi_relations: List[Dict],
+                      deleted: Set[ObjectId]) -> List[pymongo.UpdateOne]:
+        """
+        :return: The updates removing the IDs of the deleted relations from the nodes which are not deleted.
+        """
+        # {(node id, field): [relation ids]}
+        node_pulls: Dict[Tuple[ObjectId, str], List[ObjectId]] = defaultdict(list)
+        for relation in uni_relations:
+            if relation['node_from'] not in deleted:
+                node_pulls[(relation['node_from'], 'out_relations')].append(relation['_id'])
+            if relation['node_to'] not in deleted:
+                node_pulls[(relation['node_to'], 'in_relations')].append(relation['_id'])
+        for relation in bi_relations:
+            for node_field in ('node_1', 'node_2'):
+                if relation[node_field] not in deleted:
+                    node_pulls[(relation[node_field], 'bi_relations')].append(relation['_id'])
+        return [pymongo.UpdateOne({'_id': node_id}, {'$pull': {field: {'$in': relation_ids}}})
+                for (node_id, field), relation_ids in node_pulls.items()]
+
+    @staticmethod
+    def _deleted_usage(uni_relations: List[Dict], bi_relations: List[Dict]) -> Counter:
+        usage_changes = Counter()
+        usage_changes.subtract((True, relation['type']) for relation in uni_relations)
+        usage_changes.subtract((False, relation['type']) for relation in bi_relations)
+        return usage_changes
 
     def add_nodes(self, nodes):
-        result = self.node_coll.insert_many([node.to_dict() for node in nodes])
+        include_relations = self.embedded_relations
+        result = self.node_coll.insert_many([self._node_document(node, include_relations) for node in nodes])
         return result.inserted_ids
 
     def add_relation(self, relation: Union[UniRelation, BiRelation]):
+        self._check_relation(relation, self.get_relation_type(relation.type, relation.is_uni))
+
         if relation.is_uni:
-            relation_type = RelationType.from_dict(self.uni_rel_type_coll.find_one({'_id': relation.type}))
-        else:
-            relation_type = RelationType.from_dict(self.bi_rel_type_coll.find_one({'_id': relation.type}))
-
-        if relation.node_1 == relation.node_2 and not relation_type.reflexive:
-            raise KnowledgeNetExceptions.ReflexiveException(
-                'Tried to apply a reflexive relation of non-reflexive relation type!'
-            )
-        if relation.probability != 1.0 and not relation_type.probabilistic:
-            raise KnowledgeNetExceptions.ProbabilisticException(
-                f'Tried to add an uncertain relation with non-probabilistic type (\"{relation_type.name}\")!'
-            )
-        if relation.is_uni:
-            new_relation = self.uni_rel_coll.insert_one(relation.to_dict())
+            new_relation = self.uni_rel_coll.insert_one(self._relation_document(relation))
             relation_id = new_relation.inserted_id
-            self.node_coll.update_one({'_id': relation.node_from}, {'$push': {'out_relations': relation_id}})
-            self.node_coll.update_one({'_id': relation.node_to}, {'$push': {'in_relations': relation_id}})
+            if self.embedded_relations:
+                self.node_coll.update_one({'_id': relation.node_from}, {'$push': {'out_relations': relation_id}})
+                self.node_coll.update_one({'_id': relation.node_to}, {'$push': {'in_relations': relation_id}})
         else:
-            new_relation = self.bi_rel_coll.insert_one(relation.to_dict())
+            new_relation = self.bi_rel_coll.insert_one(self._relation_document(relation))
             relation_id = new_relation.inserted_id
-            self.node_coll.update_one({'_id': relation.node_1}, {'$push': {'bi_relations': relation_id}})
-            self.node_coll.update_one({'_id': relation.node_2}, {'$push': {'bi_relations': relation_id}})
+            if self.embedded_relations:
+                self.node_coll.update_one({'_id': relation.node_1}, {'$push': {'bi_relations': relation_id}})
+                self.node_coll.update_one({'_id': relation.node_2}, {'$push': {'bi_relations': relation_id}})
+        self._increment_usage({(relation.is_uni, relation.type): 1})
+        if self.adjacency_index is not None:
+            self.adjacency_index.add_relation(relation, relation_id)
+        self._closure_after_add([relation])
         return relation_id
 
-    def get_node(self, node_id):
-        return Node.from_dict(self.node_coll.find_one({'_id': node_id}))
+    def add_relations(self,
+                      relations: Iterable[Union[UniRelation, BiRelation]],
+                      batch_size: int = 1000,
+                      ) -> Tuple[List[ObjectId], List[Tuple[int, Exception]]]:
+        """
+        Adds many relations in batches. Per batch, every distinct relation type is fetched once, the relations
+        are inserted with one insert_many per collection and the relation ids are pushed onto the nodes with
+        one unordered bulk_write.
+        :param relations: The relations to add.
+        :param batch_size: The number of relations written per batch.
+        :return: The IDs of the inserted relations and a list of (position, exception) tuples of the relations
+        which could not be added.
+        """
+        inserted_ids: List[ObjectId] = list()
+        failures: List[Tuple[int, Exception]] = list()
+        relations = iter(relations)
+        offset = 0
+        batch = list(islice(relations, batch_size))
+        while batch:
+            batch_ids, batch_failures = self._add_relation_batch(batch, offset)
+            inserted_ids += batch_ids
+            failures += batch_failures
+            offset += len(batch)
+            batch = list(islice(relations, batch_size))
+        return inserted_ids, failures
 
-    def get_nodes(self, node_ids):
-        return Node.from_dict_list(self.node_coll.find({'_id': {'$in': node_ids}}))
+    def _add_relation_batch(self,
+                            relations: List[Union[UniRelation, BiRelation]],
+                            offset: int,
+                            ) -> Tuple[List[ObjectId], List[Tuple[int, Exception]]]:
+        relation_types = {(rel_type_id, uni): self.get_relation_type(rel_type_id, uni)
+                          for rel_type_id, uni in {(rel.type, rel.is_uni) for rel in relations}}
+        pending, failures = self._pending_relations(relations, offset, relation_types)
+        inserted: List[Tuple[int, Union[UniRelation, BiRelation], ObjectId]] = list()
+        for uni, collection in ((True, self.uni_rel_coll), (False, self.bi_rel_coll)):
+            if not pending[uni]:
+                continue
+            error = None
+            try:
+                collection.insert_many([relation_dict for _, _, relation_dict in pending[uni]], ordered=False)
+            except BulkWriteError as e:
+                error = e
+            inserted += self._inserted_relations(pending[uni], error, failures)
+        if inserted and self.embedded_relations:
+            self.node_coll.bulk_write(self._push_updates(inserted), ordered=False)
 
-    def get_relation_type_name(self, rel_type_id: ObjectId, uni: bool) -> str:
-        if uni:
-            return self.uni_rel_type_coll.find_one({'_id': rel_type_id}, {'name': 1})['name']
-        else:
-            return self.bi_rel_coll.find_one({'_id': rel_type_id}, {'name': 1})['name']
+        self._increment_usage(Counter((relation.is_uni, relation.type) for _, relation, _ in inserted))
+        if self.adjacency_index is not None:
+            for _, relation, relation_id in inserted:
+                self.adjacency_index.add_relation(relation, relation_id)
+        self._closure_after_add(relation for _, relation, _ in inserted)
+        inserted.sort(key=lambda insert: insert[0])
+        failures.sort(key=lambda failure: failure[0])
+        return [relation_id for _, _, relation_id in inserted], failures
+
+    @classmethod
+    def _pending_relations(cls,
+                           relations: List[Union[UniRelation, BiRelation]],
+                           offset: int,
+                           relation_types: Dict[Tuple[ObjectId, bool], Optional[RelationType]],
+                           ) -> Tuple[Dict[bool, List[Tuple[int, Union[UniRelation, BiRelation], Dict]]],
+                                      List[Tuple[int, Exception]]]:
+        """
+        Validates a batch of add_relations and assigns the ids client side, so they are known even if some
+        inserts fail.
+        :param relation_types: {(relation type ID, uni): relation type} of the relations.
+        :return: {uni: [(position, relation, relation document)]} and the (position, exception) tuples of the
+        invalid relations.
+        """
+        failures: List[Tuple[int, Exception]] = list()
+        pending: Dict[bool, List[Tuple[int, Union[UniRelation, BiRelation], Dict]]] = {True: list(), False: list()}
+        for position, relation in enumerate(relations, start=offset):
+            try:
+                cls._check_relation(relation, relation_types[(relation.type, relation.is_uni)])
+            except Exception as e:
+                failures.append((position, e))
+                continue
+            relation_dict = cls._relation_document(relation)
+            relation_dict['_id'] = ObjectId()
+            pending[relation.is_uni].append((position, relation, relation_dict))
+        return pending, failures
+
+    @staticmethod
+    def _inserted_relations(pending: List[Tuple[int, Union[UniRelation, BiRelation], Dict]],
+                            error: Optional[BulkWriteError],
+                            failures: List[Tuple[int, Exception]],
+                            ) -> List[Tuple[int, Union[UniRelation, BiRelation], ObjectId]]:
+        """
+        :param pending: The relations passed to one unordered insert_many, see _pending_relations.
+        :param error: The error of the insert_many, if any. The failed relations are appended to failures.
+        :return: The (position, relation, relation ID) tuples of the inserted relations.
+        """
+        failed_indices = set()
+        if error is not None:
+            for write_error in error.details['writeErrors']:
+                failed_indices.add(write_error['index'])
+                failures.append((pending[write_error['index']][0], error))
+        return [(position, relation, relation_dict['_id'])
+                for i, (position, relation, relation_dict) in enumerate(pending) if i not in failed_indices]
+
+    @staticmethod
+    def _push_updates(inserted: List[Tuple[int, Union[UniRelation, BiRelation], ObjectId]],
+                      ) -> List[pymongo.UpdateOne]:
+        """
+        :return: The updates adding the IDs of the inserted relations to the relation arrays of their nodes.
+        """
+        node_pushes: Dict[Tuple[ObjectId, str], List[ObjectId]] = defaultdict(list)
+        for _, relation, relation_id in inserted:
+            if relation.is_uni:
+                node_pushes[(relation.node_from, 'out_relations')].append(relation_id)
+                node_pushes[(relation.node_to, 'in_relations')].append(relation_id)
+            else:
+                node_pushes[(relation.node_1, 'bi_relations')].append(relation_id)
+                node_pushes[(relation.node_2, 'bi_relations')].append(relation_id)
+        return [pymongo.UpdateOne({'_id': node_id}, {'$push': {field: {'$each': relation_ids}}})
+                for (node_id, field), relation_ids in node_pushes.items()]
+
+    @staticmethod
+    def _node_projection(view: NodeView) -> Optional[Dict]:
+        if view == NodeView.SUMMARY:
+            return {'name': 1, 'description': 1}
+        return {'name_normalized': 0, 'name_trigrams': 0}
+
+    def _relation_loader(self, node_id: ObjectId):
+        return partial(self.get_relation_ids_of_node, node_id)
+
+    def _nodes_from_cursor(self, cursor, view: NodeView) -> List[Node]:
+        if view == NodeView.SUMMARY:
+            return Node.from_dict_list(cursor, self._relation_loader)
+        if self.embedded_relations:
+            return Node.from_dict_list(cursor)
+        node_dicts = list(cursor)
+        relation_ids = self._relation_ids_of_nodes([node_dict['_id'] for node_dict in node_dicts])
+        for node_dict in node_dicts:
+            node_dict.update(relation_ids[node_dict['_id']])
+        return Node.from_dict_list(node_dicts)
+
+    def get_node(self, node_id, view: NodeView = NodeView.FULL):
+        node_dict = self.node_coll.find_one({'_id': node_id}, self._node_projection(view))
+        if view == NodeView.SUMMARY:
+            return Node.from_dict(node_dict, self._relation_loader(node_id))
+        return self._nodes_from_cursor([node_dict], view)[0]
+
+    def _relation_ids_of_nodes(self, node_ids: List[ObjectId]) -> Dict[ObjectId, Dict[str, List[ObjectId]]]:
+        """
+        Queries the relation id arrays of nodes from the relation collections (see AdjacencyStorage.DERIVED).
+        :return: {node id: {'in_relations': [...], 'out_relations': [...], 'bi_relations': [...]}}
+        """
+        return self._relation_ids_by_node(
+            node_ids,
+            self.uni_rel_coll.find(self._touching_query(node_ids, uni=True),
+                                   {'node_from': 1, 'node_to': 1}).sort('_id', pymongo.ASCENDING),
+            self.bi_rel_coll.find(self._touching_query(node_ids, uni=False),
+                                  {'node_1': 1, 'node_2': 1}).sort('_id', pymongo.ASCENDING))
+
+    @staticmethod
+    def _relation_ids_by_node(node_ids: List[ObjectId], uni_relations: Iterable[Dict],
+                              bi_relations: Iterable[Dict]) -> Dict[ObjectId, Dict[str, List[ObjectId]]]:
+        """
+        Groups the relations of _relation_ids_of_nodes into the relation id arrays of the nodes.
+        """
+        relation_ids = {node_id: {'in_relations': [], 'out_relations': [], 'bi_relations': []} for node_id in node_ids}
+        for relation in uni_relations:
+            if relation['node_from'] in relation_ids:
+                relation_ids[relation['node_from']]['out_relations'].append(relation['_id'])
+            if relation['node_to'] in relation_ids:
+                relation_ids[relation['node_to']]['in_relations'].append(relation['_id'])
+        for relation in bi_relations:
+            for node_field in ('node_1', 'node_2'):
+                if relation[node_field] in relation_ids:
+                    relation_ids[relation[node_field]]['bi_relations'].append(relation['_id'])
+        return relation_ids
+
+    def get_nodes(self, node_ids, view: NodeView = NodeView.FULL):
+        return self._nodes_from_cursor(self.node_coll.find({'_id': {'$in': node_ids}}, self._node_projection(view)),
+                                       view)
 
     def get_relation_ids_of_node(self, node_id: ObjectId) -> Dict:
         """
@@ -87,11 +691,23 @@ class MongoBackend:
         :param node_id: The ID of the node.
         :return: dictionary of lists of relations ('in_relations', 'out_relations' and 'bi_relations' of the node.
         """
+        if not self.embedded_relations:
+            if self.node_coll.find_one({'_id': node_id}, {'_id': 1}) is None:
+                return None
+            return dict(_id=node_id, **self._relation_ids_of_nodes([node_id])[node_id])
         return self.node_coll.find_one(
             {'_id': node_id},
             {'in_relations': 1, 'out_relations': 1, 'bi_relations': 1})
 
     def get_relation_objects_of_node(self, node_id):
+        if not self.embedded_relations:
+            # one query per collection, without the detour over the relation ids
+            uni_relations, bi_relations = self.get_relations_of_nodes([node_id])
+            return {
+                'in_relations': [relation for relation in uni_relations if relation.node_to == node_id],
+                'out_relations': [relation for relation in uni_relations if relation.node_from == node_id],
+                'bi_relations': bi_relations,
+            }
         relations = self.get_relation_ids_of_node(node_id)
         return {
             'in_relations': Relation.from_dict_list(self.uni_rel_coll.find({'_id': {'$in': relations['in_relations']}})),
@@ -99,50 +715,164 @@ class MongoBackend:
             'bi_relations': Relation.from_dict_list(self.bi_rel_coll.find({'_id': {'$in': relations['bi_relations']}}))
         }
 
-    def list_nodes_by_name(self, node_name:str, sloppy: bool = False):
+    def list_nodes_by_name(self, node_name:str, sloppy: bool = False, view: NodeView = NodeView.FULL):
         if sloppy:
-            return Node.from_dict_list(self.node_coll.find({'name': {'$regex': node_name, '$options': 'i'}}))
-        return Node.from_dict_list(self.node_coll.find({'name': node_name}))
+            query = self._sloppy_name_query(node_name, not self.name_search_fields)
+        else:
+            query = {'name': node_name}
+        return self._nodes_from_cursor(self.node_coll.find(query, self._node_projection(view)), view)
 
-    def list_relationtypes_by_name(self, relation_type_name, uni):
-        if uni:
-            return RelationType.from_dict_list(self.uni_rel_type_coll.find({'name': relation_type_name}))
+    def search_nodes(self,
+                     query: str,
+                     limit: int = 10,
+                     prefix: bool = False,
+                     min_similarity: float = 0.2,
+                     view: NodeView = NodeView.SUMMARY,
+                     ) -> List[Tuple[Node, float]]:
+        normalized_query = normalize_name(query)
+        projection = self._search_projection(view)
+        if prefix:
+            cursor = self.node_coll.find(self._prefix_name_query(normalized_query), dict(projection, name_normalized=1))
+            node_dicts = list(cursor.sort('name_normalized', pymongo.ASCENDING).limit(limit))
         else:
-            return RelationType.from_dict_list(self.bi_rel_type_coll.find({'name': relation_type_name}))
+            node_dicts = list(self.node_coll.aggregate(
+                self._similar_names_pipeline(normalized_query, projection, min_similarity, limit)))
+        unindexed_dicts = []
+        if not self.name_search_fields:
+            unindexed_dicts = self.node_coll.find(self._unindexed_search_query(normalized_query, prefix), projection)
+        node_dicts, scores = self._search_results(normalized_query, limit, prefix, min_similarity, node_dicts,
+                                                  unindexed_dicts)
+        return list(zip(self._nodes_from_cursor(node_dicts, view), scores))
 
-    def get_relation_info_of_node(self, node_id) -> Dict:
-        relations = self.get_relation_objects_of_node(node_id)
-        return {
-            'in_relations': [{
-                'id': relation.id,
-                'prob': relation.probability,
-                'type': RelationType.from_dict(self.uni_rel_type_coll.find_one({'_id': relation.type})),
-                'from': Node.from_dict(self.node_coll.find_one({'_id': relation.node_from}))
-            } for relation in relations['in_relations']],
-            'out_relations': [{
-                'id': relation.id,
-                'prob': relation.probability,
-                'type': RelationType.from_dict(self.uni_rel_type_coll.find_one({'_id': relation.type})),
-                'to': Node.from_dict(self.node_coll.find_one({'_id': relation.node_to}))
-            } for relation in relations['out_relations']],
-            'bi_relations': [{
-                'id': relation.id,
-                'prob': relation.probability,
-                'type': RelationType.from_dict(self.bi_rel_type_coll.find_one({'_id': relation.type})),
-                'with': Node.from_dict(self.node_coll.find_one({'_id': relation.node_1}))
-                if relation.node_1 != node_id
-                else Node.from_dict(self.node_coll.find_one({'_id': relation.node_2}))
-            } for relation in relations['bi_relations']]
-        }
+    @staticmethod
+    def _search_projection(view: NodeView) -> Dict:
+        projection = {'name': 1, 'description': 1}
+        if view == NodeView.FULL:
+            projection.update({'in_relations': 1, 'out_relations': 1, 'bi_relations': 1})
+        return projection
+
+    @staticmethod
+    def _prefix_name_query(normalized_query: str) -> Dict:
+        return {'name_normalized': {'$gte': normalized_query, '$lt': normalized_query + PREFIX_END}}
+
+    @staticmethod
+    def _similar_names_pipeline(normalized_query: str, projection: Dict, min_similarity: float,
+                                limit: int) -> List[Dict]:
+        """
+        :return: The aggregation of the fuzzy search_nodes, which adds the similarity to the query as 'score'.
+        """
+        trigrams = sorted(name_trigrams(normalized_query))
+        return [
+            {'$match': {'name_trigrams': {'$in': trigrams}}},
+            {'$project': dict(projection, score={'$let': {
+                'vars': {'shared': {'$size': {'$filter': {
+                    'input': '$name_trigrams', 'as': 'trigram', 'cond': {'$in': ['$$trigram', trigrams]}}}}},
+                # Jaccard similarity of the trigram sets, as NameSearch.similarity
+                'in': {'$divide': ['$$shared', {'$subtract': [
+                    {'$add': [len(trigrams), {'$size': '$name_trigrams'}]}, '$$shared']}]},
+            }})},
+            {'$match': {'score': {'$gte': min_similarity}}},
+            {'$sort': {'score': -1, '_id': 1}},
+            {'$limit': limit},
+        ]
+
+    @staticmethod
+    def _search_results(normalized_query: str, limit: int, prefix: bool, min_similarity: float,
+                        node_dicts: List[Dict], unindexed_dicts: Iterable[Dict]) -> Tuple[List[Dict], List[float]]:
+        """
+        Scores the results of search_nodes. The nodes stored before name search existed are matched by a regex as
+        long as backfill_name_search did not run, they are scored client side and merged into the results.
+        :return: The node dictionaries and their scores.
+        """
+        if prefix:
+            scores = [similarity(normalized_query, node_dict['name_normalized']) for node_dict in node_dicts]
+        else:
+            scores = [node_dict['score'] for node_dict in node_dicts]
+        results = list(zip(node_dicts, scores))
+        for node_dict in unindexed_dicts:
+            normalized_name = normalize_name(node_dict['name'])
+            score = similarity(normalized_query, normalized_name)
+            if prefix:
+                node_dict['name_normalized'] = normalized_name
+            elif score < min_similarity:
+                continue
+            results.append((node_dict, score))
+        if prefix:
+            results.sort(key=lambda result: result[0]['name_normalized'])
+        else:
+            results.sort(key=lambda result: (-result[1], result[0]['_id']))
+        results = results[:limit]
+        return [node_dict for node_dict, _ in results], [score for _, score in results]
+
+    def iter_nodes(self,
+                   name_prefix: Optional[str] = None,
+                   after: Optional[ObjectId] = None,
+                   limit: Optional[int] = None,
+                   fields: Sequence[str] = ('name',),
+                   batch_size: int = 1000,
+                   ) -> Iterator[Dict]:
+        cursor = self.node_coll.find(self._iter_nodes_query(name_prefix, after), {field: 1 for field in fields},
+                                     batch_size=batch_size)
+        cursor = cursor.sort('_id', pymongo.ASCENDING)
+        if limit:
+            cursor = cursor.limit(limit)
+        yield from cursor
+
+    @staticmethod
+    def _iter_nodes_query(name_prefix: Optional[str], after: Optional[ObjectId]) -> Dict:
+        query = dict()
+        if after is not None:
+            query['_id'] = {'$gt': after}
+        if name_prefix:
+            # an anchored, case sensitive regex can use the name index
+            query['name'] = {'$regex': '^' + re.escape(name_prefix)}
+        return query
+
+    def set_node_field(self, field: str, values: Dict[ObjectId, Any]) -> None:
+        self._check_node_field(field)
+        items = iter(values.items())
+        batch = list(islice(items, 1000))
+        while batch:
+            self.node_coll.bulk_write([pymongo.UpdateOne({'_id': node_id}, {'$set': {field: value}})
+                                       for node_id, value in batch], ordered=False)
+            batch = list(islice(items, 1000))
+
+    def get_node_field(self, field: str, node_ids: Optional[List[ObjectId]] = None) -> Dict[ObjectId, Any]:
+        query = {field: {'$exists': True}}
+        if node_ids is not None:
+            query['_id'] = {'$in': node_ids}
+        return {node['_id']: node[field] for node in self.node_coll.find(query, {field: 1})}
 
-    def get_all_node_names(self):
-        return [node['name'] for node in self.node_coll.find()]
+    def _traversal_mode(self, mode: Optional[TraversalMode]) -> TraversalMode:
+        if self._adjacency_index_requested and mode in (None, TraversalMode.INDEX):
+            self.build_adjacency_index()
+        if mode is None:
+            return TraversalMode.CLIENT if self.adjacency_index is None else TraversalMode.INDEX
+        if mode == TraversalMode.INDEX and self.adjacency_index is None:
+            raise ValueError('The adjacency index has not been built!')
+        return mode
 
-    def get_all_uni_connected_nodes(self, start_node_id, relation_type_id, stop_at: Optional[ObjectId]=None, include_direction=True, inverse_direction=False) -> List[ObjectId]:
+    def get_all_uni_connected_nodes(self, start_node_id, relation_type_id, stop_at: Optional[ObjectId]=None, include_direction=True, inverse_direction=False, mode: Optional[TraversalMode] = None, max_depth: Optional[int] = None) -> List[ObjectId]:
+        """
+        Returns the IDs of all nodes reachable from the start node via unidirectional relations of one type.
+        :param mode: How the traversal is run. Defaults to the adjacency index if it is built, otherwise to a
+        client side breadth first search.
+        :param max_depth: The maximal number of hops from the start node.
+        """
+        mode = self._traversal_mode(mode)
+        if mode == TraversalMode.SERVER:
+            return self.graph_lookup_connected_nodes(start_node_id, relation_type_id, uni=True,
+                                                     include_direction=include_direction,
+                                                     inverse_direction=inverse_direction, max_depth=max_depth)
+        if mode == TraversalMode.INDEX:
+            return self.adjacency_index.connected_nodes(start_node_id, relation_type_id, stop_at=stop_at,
+                                                        include_direction=include_direction,
+                                                        inverse_direction=inverse_direction, max_depth=max_depth)
         visited_nodes = set()
         current_nodes = {start_node_id}
+        depth = 0
         if include_direction:
-            while current_nodes and (stop_at is None or stop_at in visited_nodes):
+            while current_nodes and (stop_at is None or stop_at not in visited_nodes) and (max_depth is None or depth < max_depth):
                 result = self.uni_rel_coll.find(
                     {
                         'node_from': {'$in': list(current_nodes)},
@@ -158,8 +888,9 @@ class MongoBackend:
                 visited_nodes |= current_nodes
                 current_nodes = set([result_elem['node_to'] for result_elem in result])
                 current_nodes -= visited_nodes
+                depth += 1
         else:
-            while current_nodes and (stop_at is None or stop_at in visited_nodes):
+            while current_nodes and (stop_at is None or stop_at not in visited_nodes) and (max_depth is None or depth < max_depth):
                 result = self.uni_rel_coll.find(
                     {
                         '$or': [
@@ -182,12 +913,28 @@ class MongoBackend:
                     [result_elem['node_from'] for result_elem in result] +
                     [result_elem['node_to'] for result_elem in result])
                 current_nodes -= visited_nodes
+                depth += 1
+        if max_depth is not None:
+            visited_nodes |= current_nodes
         return list(visited_nodes)
 
-    def get_all_bi_connected_nodes(self, start_node_id: ObjectId, relation_type_id: ObjectId, stop_at: Optional[ObjectId] = None) -> List[ObjectId]:
+    def get_all_bi_connected_nodes(self, start_node_id: ObjectId, relation_type_id: ObjectId, stop_at: Optional[ObjectId] = None, mode: Optional[TraversalMode] = None, max_depth: Optional[int] = None) -> List[ObjectId]:
+        """
+        Returns the IDs of all nodes reachable from the start node via bidirectional relations of one type.
+        :param mode: How the traversal is run. Defaults to the adjacency index if it is built, otherwise to a
+        client side breadth first search.
+        :param max_depth: The maximal number of hops from the start node.
+        """
+        mode = self._traversal_mode(mode)
+        if mode == TraversalMode.SERVER:
+            return self.graph_lookup_connected_nodes(start_node_id, relation_type_id, uni=False, max_depth=max_depth)
+        if mode == TraversalMode.INDEX:
+            return self.adjacency_index.connected_nodes(start_node_id, relation_type_id, stop_at=stop_at,
+                                                        max_depth=max_depth)
         visited_nodes = set()
         current_nodes = {start_node_id}
-        while current_nodes and (stop_at is None or stop_at in visited_nodes):
+        depth = 0
+        while current_nodes and (stop_at is None or stop_at not in visited_nodes) and (max_depth is None or depth < max_depth):
             result = self.bi_rel_coll.find(
                 {
                     '$or': [
@@ -210,13 +957,185 @@ class MongoBackend:
                 [result_elem['node_1'] for result_elem in result] +
                 [result_elem['node_2'] for result_elem in result])
             current_nodes -= visited_nodes
+            depth += 1
+        if max_depth is not None:
+            visited_nodes |= current_nodes
         return list(visited_nodes)
 
-    def get_uni_relationtype_usage_number(self, relation_type_id: ObjectId) -> int:
-        return self.uni_rel_coll.count({'type': relation_type_id})
+    def graph_lookup_connected_nodes(self,
+                                     start_node_id: ObjectId,
+                                     relation_type_id: ObjectId,
+                                     uni: bool,
+                                     include_direction: bool = True,
+                                     inverse_direction: bool = False,
+                                     max_depth: Optional[int] = None,
+                                     full_nodes: bool = False,
+                                     ) -> Union[List[ObjectId], List[Node]]:
+        """
+        Computes the nodes reachable from the start node with a single $graphLookup aggregation.
+        Undirected traversals follow the 'endpoints' field of the relations and run client side if relations might
+        lack it (see backfill_relation_endpoints).
+        :param start_node_id: The ID of the node to start at.
+        :param relation_type_id: The ID of the relation type to follow.
+        :param uni: Whether the relation type is unidirectional.
+        :param include_direction: Only follow unidirectional relations in one direction.
+        :param inverse_direction: Follow unidirectional relations against their direction instead.
+        :param max_depth: The maximal number of hops from the start node.
+        :param full_nodes: Return the Node objects instead of their IDs.
+        :return: The IDs (or Nodes) of all reachable nodes, including the start node.
+        """
+        if max_depth is not None and max_depth < 1:
+            return self.get_nodes([start_node_id]) if full_nodes else [start_node_id]
+        if uni and include_direction:
+            connect_from, connect_to = ('node_from', 'node_to') if inverse_direction else ('node_to', 'node_from')
+            reached = {'$setUnion': [['$_id'], f'$edges.{connect_from}']}
+        elif self.relation_endpoints:
+            connect_from = connect_to = 'endpoints'
+            reached = {'$reduce': {'input': '$edges.endpoints', 'initialValue': ['$_id'],
+                                   'in': {'$setUnion': ['$$value', '$$this']}}}
+        else:
+            if uni:
+                node_ids = self.get_all_uni_connected_nodes(start_node_id, relation_type_id, include_direction=False,
+                                                            mode=TraversalMode.CLIENT, max_depth=max_depth)
+            else:
+                node_ids = self.get_all_bi_connected_nodes(start_node_id, relation_type_id,
+                                                           mode=TraversalMode.CLIENT, max_depth=max_depth)
+            return self.get_nodes(node_ids) if full_nodes else node_ids
+
+        graph_lookup = {
+            'from': (self.uni_rel_coll if uni else self.bi_rel_coll).name,
+            'startWith': '$_id',
+            'connectFromField': connect_from,
+            'connectToField': connect_to,
+            'as': 'edges',
+            'restrictSearchWithMatch': {'type': relation_type_id},
+        }
+        if max_depth is not None:
+            graph_lookup['maxDepth'] = max_depth - 1
+        # one output document per reached node, a single document with all of them could exceed the size limit
+        pipeline = [
+            {'$match': {'_id': start_node_id}},
+            {'$graphLookup': graph_lookup},
+            {'$project': {'_id': 0, 'nodes': reached}},
+            {'$unwind': '$nodes'},
+        ]
+        if full_nodes:
+            pipeline += [
+                {'$lookup': {'from': self.node_coll.name, 'localField': 'nodes', 'foreignField': '_id',
+                             'as': 'node'}},
+                {'$unwind': '$node'},
+                {'$replaceRoot': {'newRoot': '$node'}},
+            ]
+            return self._nodes_from_cursor(self.node_coll.aggregate(pipeline), NodeView.FULL)
+        # like the client side traversal, a missing start node only reaches itself
+        return [result['nodes'] for result in self.node_coll.aggregate(pipeline)] or [start_node_id]
+
+    def _closure_neighbours(self, relation_type_id: ObjectId, node_ids: List[ObjectId], targets: bool,
+                            session=None) -> Set[ObjectId]:
+        known, wanted = ('node_from', 'node_to') if targets else ('node_to', 'node_from')
+        return {pair[wanted] for pair in self.closure_coll.find(
+            {'type': relation_type_id, known: {'$in': node_ids}}, {'_id': 0, wanted: 1}, session=session)}
+
+    def _closure_contains(self, relation_type_id: ObjectId, node_from_id: ObjectId, node_to_id: ObjectId) -> bool:
+        return self.closure_coll.find_one(
+            {'type': relation_type_id, 'node_from': node_from_id, 'node_to': node_to_id}, {'_id': 1}) is not None
+
+    def _add_closure_pairs(self, relation_type_id: ObjectId, pairs: Iterable[Tuple[ObjectId, ObjectId]],
+                           session=None) -> None:
+        pairs = iter(pairs)
+        batch = list(islice(pairs, 1000))
+        while batch:
+            self.closure_coll.bulk_write(self._closure_pair_updates(relation_type_id, batch), ordered=False,
+                                         session=session)
+            batch = list(islice(pairs, 1000))
 
-    def get_bi_relationtype_usage_number(self, relation_type_id: ObjectId) -> int:
-        return self.bi_rel_coll.count({'type': relation_type_id})
+    @staticmethod
+    def _closure_pair_updates(relation_type_id: ObjectId,
+                              pairs: List[Tuple[ObjectId, ObjectId]]) -> List[pymongo.UpdateOne]:
+        # upserts, so that pairs which are already stored are ignored
+        return [pymongo.UpdateOne({'type': relation_type_id, 'node_from': node_from_id, 'node_to': node_to_id},
+                                  {'$setOnInsert': {'type': relation_type_id}}, upsert=True)
+                for node_from_id, node_to_id in pairs]
+
+    def _delete_closure_sources(self, relation_type_id: ObjectId, node_ids: Optional[List[ObjectId]],
+                                session=None) -> None:
+        query = {'type': relation_type_id}
+        if node_ids is not None:
+            query['node_from'] = {'$in': node_ids}
+        self.closure_coll.delete_many(query, session=session)
+
+    @staticmethod
+    def _count_by_type(collection, match: Optional[Dict] = None) -> Dict[ObjectId, int]:
+        pipeline = [{'$match': match}] if match else []
+        pipeline.append({'$group': {'_id': '$type', 'count': {'$sum': 1}}})
+        return {group['_id']: group['count'] for group in collection.aggregate(pipeline)}
+
+    def get_relationtype_usage_numbers(self, relation_type_ids: List[ObjectId], uni: bool) -> Dict[ObjectId, int]:
+        type_coll, rel_coll = (self.uni_rel_type_coll, self.uni_rel_coll) if uni else \
+            (self.bi_rel_type_coll, self.bi_rel_coll)
+        usage_numbers = dict()
+        uncounted_ids = list()
+        for rel_type_dict in type_coll.find({'_id': {'$in': relation_type_ids}}, {'usage_count': 1}):
+            if 'usage_count' in rel_type_dict:
+                usage_numbers[rel_type_dict['_id']] = rel_type_dict['usage_count']
+            else:
+                uncounted_ids.append(rel_type_dict['_id'])
+        if uncounted_ids:
+            # relation types stored before the counters, until rebuild_relation_type_usage is run
+            counts = self._count_by_type(rel_coll, {'type': {'$in': uncounted_ids}})
+            usage_numbers.update({rel_type_id: counts.get(rel_type_id, 0) for rel_type_id in uncounted_ids})
+        return usage_numbers
+
+    @staticmethod
+    def _usage_updates(counts: Dict[Tuple[bool, ObjectId], int], uni: bool) -> List[pymongo.UpdateOne]:
+        """
+        :param counts: {(uni, relation type ID): change of the usage counter}
+        :return: The updates of the relation types of one direction.
+        """
+        # relation types without a counter are counted on demand, see get_relationtype_usage_numbers
+        return [pymongo.UpdateOne({'_id': rel_type_id, 'usage_count': {'$exists': True}},
+                                  {'$inc': {'usage_count': count}})
+                for (is_uni, rel_type_id), count in counts.items() if is_uni == uni and count]
+
+    def _increment_usage(self, counts: Dict[Tuple[bool, ObjectId], int], session=None) -> None:
+        for uni, type_coll in ((True, self.uni_rel_type_coll), (False, self.bi_rel_type_coll)):
+            updates = self._usage_updates(counts, uni)
+            if updates:
+                type_coll.bulk_write(updates, ordered=False, session=session)
+
+    def rebuild_relation_type_usage(self) -> None:
+        """
+        Recounts the relations of every relation type with one $group aggregation per relation collection.
+        Relations written by other clients while the aggregation runs may be missed.
+        """
+        for type_coll, rel_coll in ((self.uni_rel_type_coll, self.uni_rel_coll),
+                                    (self.bi_rel_type_coll, self.bi_rel_coll)):
+            counts = self._count_by_type(rel_coll)
+            updates = [pymongo.UpdateOne({'_id': rel_type_dict['_id']},
+                                         {'$set': {'usage_count': counts.get(rel_type_dict['_id'], 0)}})
+                       for rel_type_dict in type_coll.find({}, {'_id': 1})]
+            if updates:
+                type_coll.bulk_write(updates, ordered=False)
+
+    def iter_relations(self,
+                       uni: bool,
+                       relation_type_ids: Optional[List[ObjectId]] = None,
+                       batch_size: int = 1000,
+                       ) -> Iterator[Union[UniRelation, BiRelation]]:
+        query = {} if relation_type_ids is None else {'type': {'$in': relation_type_ids}}
+        fields = ['type', 'probability'] + (['node_from', 'node_to'] if uni else ['node_1', 'node_2'])
+        cursor = (self.uni_rel_coll if uni else self.bi_rel_coll).find(
+            query, {field: 1 for field in fields}, batch_size=batch_size)
+        for relation_dict in cursor:
+            relation_dict['is_uni'] = uni
+            yield Relation.from_dict(relation_dict)
+
+    def get_relation_batch(self, uni: bool, relation_type_ids: Optional[List[ObjectId]] = None) -> RelationBatch:
+        query = {} if relation_type_ids is None else {'type': {'$in': relation_type_ids}}
+        fields = ['type', 'probability'] + (['node_from', 'node_to'] if uni else ['node_1', 'node_2'])
+        cursor = (self.uni_rel_coll if uni else self.bi_rel_coll).find(
+            query, {field: 1 for field in fields}, batch_size=10000)
+        return RelationBatch.from_cursor(cursor, uni)
 
     def get_relations_between(self, node_1_id: ObjectId, node_2_id: ObjectId) -> Tuple[List[UniRelation], List[BiRelation]]:
         uni_relations = self.uni_rel_coll.find({'$or': [
@@ -241,28 +1160,71 @@ class MongoBackend:
         ]})
         return Relation.from_dict_list(uni_relations), Relation.from_dict_list(bi_relations)
 
-    def get_uni_relationtypes(self, relation_ids: Optional[List[ObjectId]] = None) -> List[RelationType]:
-        if relation_ids is None:
-            return RelationType.from_dict_list(self.uni_rel_type_coll.find())
-        return RelationType.from_dict_list(self.uni_rel_type_coll.find({
-            '_id': {'$in': relation_ids}
-        }))
+    def _relations_between_pairs(self,
+                                 pairs: List[Tuple[ObjectId, ObjectId]],
+                                 ) -> Tuple[List[UniRelation], List[BiRelation]]:
+        uni_relations = list()
+        bi_relations = list()
+        for uni_query, bi_query in self._pair_queries(pairs):
+            uni_relations += self.uni_rel_coll.find(uni_query)
+            bi_relations += self.bi_rel_coll.find(bi_query)
+        return Relation.from_dict_list(uni_relations), Relation.from_dict_list(bi_relations)
 
-    def get_bi_relationtypes(self, relation_ids: Optional[List[ObjectId]] = None) -> List[RelationType]:
-        if relation_ids is None:
-            return RelationType.from_dict_list(self.bi_rel_type_coll.find())
-        return RelationType.from_dict_list(self.bi_rel_type_coll.find({
-            '_id': {'$in': relation_ids}
-        }))
+    @staticmethod
+    def _pair_queries(pairs: List[Tuple[ObjectId, ObjectId]]) -> Iterator[Tuple[Dict, Dict]]:
+        """
+        :return: The (unidirectional, bidirectional) queries of _relations_between_pairs, one per chunk of
+        PAIR_QUERY_BRANCHES nodes.
+        """
+        # one $or branch per node with the nodes it is paired with, so only relations of the given pairs match and
+        # every branch is an equality on node_from or node_1 served by the node_from_type and node_1_type indexes
+        partners: Dict[ObjectId, List[ObjectId]] = defaultdict(list)
+        for node_1_id, node_2_id in pairs:
+            partners[node_1_id].append(node_2_id)
+            if node_2_id != node_1_id:
+                partners[node_2_id].append(node_1_id)
+        partners = list(partners.items())
+        for start in range(0, len(partners), PAIR_QUERY_BRANCHES):
+            chunk = partners[start:start + PAIR_QUERY_BRANCHES]
+            yield ({'$or': [{'node_from': node_id, 'node_to': {'$in': partner_ids}} for node_id, partner_ids in chunk]},
+                   {'$or': [{'node_1': node_id, 'node_2': {'$in': partner_ids}} for node_id, partner_ids in chunk]})
+
+    def get_relations_of_nodes(self,
+                               node_ids: List[ObjectId],
+                               relation_type_ids: Optional[List[ObjectId]] = None,
+                               outgoing: bool = True,
+                               incoming: bool = True,
+                               session=None,
+                               ) -> Tuple[List[UniRelation], List[BiRelation]]:
+        uni_query, bi_query = self._relations_of_nodes_queries(node_ids, relation_type_ids, outgoing, incoming)
+        uni_relations = []
+        if uni_query is not None:
+            uni_relations = Relation.from_dict_list(self.uni_rel_coll.find(uni_query, session=session))
+        bi_relations = Relation.from_dict_list(self.bi_rel_coll.find(bi_query, session=session))
+        return uni_relations, bi_relations
 
+    @staticmethod
+    def _relations_of_nodes_queries(node_ids: List[ObjectId],
+                                    relation_type_ids: Optional[List[ObjectId]],
+                                    outgoing: bool,
+                                    incoming: bool,
+                                    ) -> Tuple[Optional[Dict], Dict]:
+        """
+        :return: The queries of get_relations_of_nodes. The unidirectional query is None if no direction is wanted.
+        """
+        type_query = {} if relation_type_ids is None else {'type': {'$in': relation_type_ids}}
+        uni_branches = []
+        if outgoing:
+            uni_branches.append({'node_from': {'$in': node_ids}})
+        if incoming:
+            uni_branches.append({'node_to': {'$in': node_ids}})
+        uni_query = {'$or': uni_branches, **type_query} if uni_branches else None
+        bi_query = {'$or': [{'node_1': {'$in': node_ids}}, {'node_2': {'$in': node_ids}}], **type_query}
+        return uni_query, bi_query
 
-b = MongoBackend('mongodb://localhost:27017/')
 
-# TODO: virtual relations (cached)
 # TODO: required/optional relations together with other relations -> prompt when creating a new one
-# TODO; fix relation between
 # TODO: more options in node info view
-# TODO: mark relation types as transitional
 # TODO: values on relations and relation types
 # TODO: probabilistic relations
 # TODO: reflexive_check finish
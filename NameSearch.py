@@ -0,0 +1,45 @@
+import unicodedata
+from typing import Set
+
+# names are padded before splitting them into trigrams, so that the start and the end of a name get trigrams too
+PADDING = '  '
+# the upper bound of a range query on a prefix of normalized names
+PREFIX_END = '\U0010ffff'
+
+
+def normalize_name(name: str) -> str:
+    """
+    The searchable form of a name: without accents, case folded and with single spaces.
+    """
+    decomposed = unicodedata.normalize('NFKD', name)
+    without_accents = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(without_accents.casefold().split())
+
+
+def name_trigrams(normalized_name: str) -> Set[str]:
+    """
+    :param normalized_name: A name normalized with normalize_name.
+    :return: The trigrams of the padded name.
+    """
+    padded = f'{PADDING}{normalized_name} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def query_trigrams(normalized_query: str) -> Set[str]:
+    """
+    :return: The trigrams of a query which every name containing the query has. Empty for queries shorter than
+    three characters.
+    """
+    return {normalized_query[i:i + 3] for i in range(len(normalized_query) - 2)}
+
+
+def similarity(normalized_query: str, normalized_name: str) -> float:
+    """
+    Jaccard similarity of the trigram sets, between 0 (nothing in common) and 1 (equal names).
+    """
+    query = name_trigrams(normalized_query)
+    name = name_trigrams(normalized_name)
+    if not query or not name:
+        return 0.0
+    shared = len(query & name)
+    return shared / (len(query) + len(name) - shared)
@@ -1,8 +1,15 @@
-from typing import List, Dict, Optional
+from enum import IntEnum
+from typing import List, Dict, Optional, Callable
 from bson import ObjectId
 
 
+class NodeView(IntEnum):
+    SUMMARY = 0  # _id, name and description; the relation id arrays are loaded lazily
+    FULL = 1
+
+
 class Node:
+    __slots__ = ('name', 'description', '_in_relations', '_out_relations', '_bi_relations', 'id', '_relation_loader')
 
     def __init__(self,
                  name: str,
@@ -10,48 +17,102 @@ class Node:
                  in_relations: Optional[List[ObjectId]] = None,
                  out_relations: Optional[List[ObjectId]] = None,
                  bi_relations: Optional[List[ObjectId]] = None,
-                 object_id: Optional[ObjectId] = None
+                 object_id: Optional[ObjectId] = None,
+                 relation_loader: Optional[Callable[[], Dict]] = None,
                  ):
+        """
+        :param relation_loader: Callable returning a dictionary with the relation id arrays of the node. If it is
+        given, relation arrays which are None are loaded with it on first access. Otherwise they default to empty
+        lists.
+        """
         self.name = name
         self.description = description
-        if in_relations:
-            self.in_relations = in_relations
-        else:
-            self.in_relations = list()
-        if out_relations:
-            self.out_relations = out_relations
-        else:
-            self.out_relations = list()
-        if bi_relations:
-            self.bi_relations = bi_relations
-        else:
-            self.bi_relations = list()
+        self._relation_loader = relation_loader
+        if relation_loader is None:
+            in_relations = in_relations or list()
+            out_relations = out_relations or list()
+            bi_relations = bi_relations or list()
+        self._in_relations = in_relations
+        self._out_relations = out_relations
+        self._bi_relations = bi_relations
 
         self.id = object_id
 
+    def _load_relations(self) -> None:
+        relations = self._relation_loader() or dict()
+        self._relation_loader = None
+        if self._in_relations is None:
+            self._in_relations = relations.get('in_relations', list())
+        if self._out_relations is None:
+            self._out_relations = relations.get('out_relations', list())
+        if self._bi_relations is None:
+            self._bi_relations = relations.get('bi_relations', list())
+
+    @property
+    def in_relations(self) -> List[ObjectId]:
+        if self._in_relations is None:
+            self._load_relations()
+        return self._in_relations
+
+    @in_relations.setter
+    def in_relations(self, in_relations: List[ObjectId]):
+        self._in_relations = in_relations
+
+    @property
+    def out_relations(self) -> List[ObjectId]:
+        if self._out_relations is None:
+            self._load_relations()
+        return self._out_relations
+
+    @out_relations.setter
+    def out_relations(self, out_relations: List[ObjectId]):
+        self._out_relations = out_relations
+
+    @property
+    def bi_relations(self) -> List[ObjectId]:
+        if self._bi_relations is None:
+            self._load_relations()
+        return self._bi_relations
+
+    @bi_relations.setter
+    def bi_relations(self, bi_relations: List[ObjectId]):
+        self._bi_relations = bi_relations
+
     @classmethod
-    def from_dict(cls, node_dict: Dict):
+    def from_dict(cls, node_dict: Dict, relation_loader: Optional[Callable[[], Dict]] = None):
+        """
+        Creates a node from a (possibly projected) node dictionary.
+        :param node_dict: The node dictionary. Only '_id' and 'name' are required.
+        :param relation_loader: Loads the relation arrays missing in node_dict, see __init__.
+        """
         return cls(
             name=node_dict['name'],
-            description=node_dict['description'],
-            in_relations=node_dict['in_relations'],
-            out_relations=node_dict['out_relations'],
-            bi_relations=node_dict['bi_relations'],
+            description=node_dict.get('description', ''),
+            in_relations=node_dict.get('in_relations'),
+            out_relations=node_dict.get('out_relations'),
+            bi_relations=node_dict.get('bi_relations'),
             object_id=node_dict['_id'],
+            relation_loader=relation_loader,
         )
 
     @classmethod
-    def from_dict_list(cls, node_dict_list):
-        return [cls.from_dict(node_dict) for node_dict in node_dict_list]
+    def from_dict_list(cls, node_dict_list, relation_loader_factory: Optional[Callable[[ObjectId], Callable]] = None):
+        """
+        :param relation_loader_factory: Returns the relation loader of a node, given the node id.
+        """
+        if relation_loader_factory is None:
+            return [cls.from_dict(node_dict) for node_dict in node_dict_list]
+        return [cls.from_dict(node_dict, relation_loader_factory(node_dict['_id'])) for node_dict in node_dict_list]
 
-    def to_dict(self, include_id: bool = False):
+    def to_dict(self, include_id: bool = False, include_relations: bool = True):
         node_dict = {
             'name': self.name,
             'description': self.description,
-            'in_relations': self.in_relations,
-            'out_relations': self.out_relations,
-            'bi_relations': self.bi_relations,
         }
+        if include_relations:
+            node_dict['in_relations'] = self.in_relations
+            node_dict['out_relations'] = self.out_relations
+            node_dict['bi_relations'] = self.bi_relations
         if include_id:
             node_dict['_id'] = self.id
         return node_dict
@@ -0,0 +1,136 @@
+from array import array
+from typing import List, Dict, Optional, Iterable, Iterator, Union
+from bson import ObjectId
+from NetElements.Relations.Relations import BiRelation, UniRelation
+
+OBJECT_ID_SIZE = 12
+NO_ID = bytes(OBJECT_ID_SIZE)
+
+
+class RelationBatch:
+    """
+    Columnar container of many relations of one direction (uni or bi).
+    Relation and node IDs are stored as packed 12 byte ObjectIds, the relation types as indices into a table of
+    the distinct type IDs and the probabilities as doubles. A relation takes about 44 bytes instead of a few hundred
+    bytes as a UniRelation/BiRelation object.
+    """
+
+    def __init__(self, uni: bool):
+        self.is_uni = uni
+        self.type_ids: List[ObjectId] = list()
+        self._type_index: Dict[ObjectId, int] = dict()
+        self.types = array('I')
+        self._ids = bytearray()
+        self._nodes_1 = bytearray()
+        self._nodes_2 = bytearray()
+        self.probabilities = array('d')
+
+    @classmethod
+    def from_cursor(cls, relation_dicts: Iterable[Dict], uni: bool):
+        """
+        Builds a batch from relation documents, e.g. a pymongo cursor.
+        :param relation_dicts: Documents containing 'type', the node fields ('node_from' and 'node_to' or
+        'node_1' and 'node_2') and optionally '_id' and 'probability'.
+        :param uni: Whether the relations are unidirectional.
+        :return: The new RelationBatch.
+        """
+        batch = cls(uni)
+        node_1_field, node_2_field = ('node_from', 'node_to') if uni else ('node_1', 'node_2')
+        for relation_dict in relation_dicts:
+            batch.append(relation_dict['type'], relation_dict[node_1_field], relation_dict[node_2_field],
+                         relation_dict.get('probability', 1), relation_dict.get('_id'))
+        return batch
+
+    @classmethod
+    def from_relations(cls, relations: Iterable[Union[UniRelation, BiRelation]], uni: bool):
+        batch = cls(uni)
+        for relation in relations:
+            batch.append(relation.type, relation.node_1, relation.node_2, relation.probability, relation.id)
+        return batch
+
+    def append(self,
+               relation_type_id: ObjectId,
+               node_1_id: ObjectId,
+               node_2_id: ObjectId,
+               probability: float = 1,
+               relation_id: Optional[ObjectId] = None,
+               ) -> None:
+        type_index = self._type_index.get(relation_type_id)
+        if type_index is None:
+            type_index = self._type_index[relation_type_id] = len(self.type_ids)
+            self.type_ids.append(relation_type_id)
+        self.types.append(type_index)
+        self._ids += relation_id.binary if relation_id is not None else NO_ID
+        self._nodes_1 += node_1_id.binary
+        self._nodes_2 += node_2_id.binary
+        self.probabilities.append(probability)
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    @staticmethod
+    def _object_id(column: bytearray, i: int) -> ObjectId:
+        return ObjectId(bytes(column[i * OBJECT_ID_SIZE:(i + 1) * OBJECT_ID_SIZE]))
+
+    def relation_id(self, i: int) -> Optional[ObjectId]:
+        binary = bytes(self._ids[i * OBJECT_ID_SIZE:(i + 1) * OBJECT_ID_SIZE])
+        return ObjectId(binary) if binary != NO_ID else None
+
+    def type_id(self, i: int) -> ObjectId:
+        return self.type_ids[self.types[i]]
+
+    def node_1(self, i: int) -> ObjectId:
+        """
+        :return: The first node of relation i (node_from of unidirectional relations).
+        """
+        return self._object_id(self._nodes_1, i)
+
+    def node_2(self, i: int) -> ObjectId:
+        """
+        :return: The second node of relation i (node_to of unidirectional relations).
+        """
+        return self._object_id(self._nodes_2, i)
+
+    def node_ids(self) -> Iterator[ObjectId]:
+        """
+        :return: Iterator over all node IDs of the batch (node_1 and node_2 of every relation, with duplicates).
+        """
+        for column in (self._nodes_1, self._nodes_2):
+            for start in range(0, len(column), OBJECT_ID_SIZE):
+                yield ObjectId(bytes(column[start:start + OBJECT_ID_SIZE]))
+
+    def __getitem__(self, i: int) -> Union[UniRelation, BiRelation]:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('RelationBatch index out of range')
+        if self.is_uni:
+            return UniRelation(relation_type_id=self.type_id(i),
+                               node_from_id=self.node_1(i),
+                               node_to_id=self.node_2(i),
+                               probability=self.probabilities[i],
+                               relation_id=self.relation_id(i))
+        return BiRelation(relation_type_id=self.type_id(i),
+                          node_1_id=self.node_1(i),
+                          node_2_id=self.node_2(i),
+                          probability=self.probabilities[i],
+                          relation_id=self.relation_id(i))
+
+    def __iter__(self) -> Iterator[Union[UniRelation, BiRelation]]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def as_numpy(self) -> Dict:
+        """
+        Zero copy NumPy views of the columns. Requires numpy. The batch can not be appended to while the views exist.
+        :return: Dictionary with 'types' (uint32 indices into type_ids), 'probabilities' (float64) and 'ids',
+        'nodes_1', 'nodes_2' (one 12 byte row per relation).
+        """
+        import numpy
+        return {
+            'types': numpy.frombuffer(self.types, dtype=numpy.uint32),
+            'probabilities': numpy.frombuffer(self.probabilities, dtype=numpy.float64),
+            'ids': numpy.frombuffer(self._ids, dtype=numpy.uint8).reshape(-1, OBJECT_ID_SIZE),
+            'nodes_1': numpy.frombuffer(self._nodes_1, dtype=numpy.uint8).reshape(-1, OBJECT_ID_SIZE),
+            'nodes_2': numpy.frombuffer(self._nodes_2, dtype=numpy.uint8).reshape(-1, OBJECT_ID_SIZE),
+        }
@@ -5,6 +5,7 @@ from abc import abstractclassmethod
 EPSILON = 0.000000001
 
 class RelationType:
+    __slots__ = ('name', 'description', 'values', 'reflexive', 'probabilistic', 'transitive', 'is_uni', 'id')
 
     def __init__(self,
                  name: str,
@@ -14,7 +15,12 @@ class RelationType:
                  reflexive: bool = False,
                  probabilistic: bool = False,
                  relation_type_id: Optional[ObjectId] = None,
+                 transitive: bool = False,
                  ):
+        """
+        :param transitive: Whether a relation of this type from a to b and one from b to c imply one from a to c.
+        The backends maintain the transitive closure of these types.
+        """
         self.name = name
         self.description = description
         if not values:
@@ -22,6 +28,7 @@ class RelationType:
         self.values = values
         self.reflexive = reflexive
         self.probabilistic = probabilistic
+        self.transitive = transitive
         self.is_uni = uni
         self.id = relation_type_id
 
@@ -36,6 +43,7 @@ class RelationType:
                 reflexive=relation_type_dict['reflexive'],
                 probabilistic=relation_type_dict['probabilistic'],
                 relation_type_id=relation_type_dict['_id'],
+                transitive=relation_type_dict.get('transitive', False),
             )
         return cls(
                 name=relation_type_dict['node_from'],
@@ -44,6 +52,7 @@ class RelationType:
                 values=relation_type_dict['values'],
                 reflexive=relation_type_dict['reflexive'],
                 probabilistic=relation_type_dict['probabilistic'],
+                transitive=relation_type_dict.get('transitive', False),
         )
 
     @classmethod
@@ -58,6 +67,7 @@ class RelationType:
             'values': self.values,
             'reflexive': self.reflexive,
             'probabilistic': self.probabilistic,
+            'transitive': self.transitive,
         }
         if include_id:
             relation_type_dict['_id'] = self.id
@@ -103,6 +113,8 @@ class Relation:
 
 
 class UniRelation:
+    __slots__ = ('type', 'node_from', 'node_to', 'probability', 'id')
+    is_uni = True
 
     def __init__(self,
                  relation_type_id: ObjectId,
@@ -115,7 +127,6 @@ class UniRelation:
         self.type = relation_type_id
         self.node_from = node_from_id
         self.node_to = node_to_id
-        self.is_uni = True
         self.probability = probability
         self.id = relation_id
 
@@ -163,6 +174,8 @@ class UniRelation:
 
 
 class BiRelation:
+    __slots__ = ('type', 'node_1', 'node_2', 'probability', 'id')
+    is_uni = False
 
     def __init__(self,
                  relation_type_id: ObjectId,
@@ -175,8 +188,6 @@ class BiRelation:
         self.node_1 = node_1_id
         self.node_2 = node_2_id
         self.probability = probability
-
-        self.is_uni = False
         self.id = relation_id
 
     @property
@@ -0,0 +1,190 @@
+import functools
+import inspect
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Tuple
+import bson
+from pymongo import monitoring
+
+# upper bounds of the latency histogram buckets in milliseconds, the last bucket takes everything slower
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+UNATTRIBUTED = '<none>'
+
+# the outermost backend method running in the current context, set by instrument_methods
+_current_operation: ContextVar[str] = ContextVar('knowledgenet_operation', default=UNATTRIBUTED)
+
+
+def current_operation() -> str:
+    return _current_operation.get()
+
+
+class OperationStats:
+    """
+    Statistics of the database commands issued by one backend method.
+    """
+    __slots__ = ('calls', 'queries', 'documents', 'bytes', 'failures', 'total_ms', 'max_ms', 'histogram', 'commands')
+
+    def __init__(self):
+        self.calls = 0
+        self.queries = 0
+        self.documents = 0
+        self.bytes = 0
+        self.failures = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.commands: Dict[str, int] = dict()
+
+    def record(self, command_name: str, duration_ms: float, documents: int = 0, size: int = 0,
+               failed: bool = False) -> None:
+        self.queries += 1
+        self.documents += documents
+        self.bytes += size
+        self.failures += failed
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.histogram[bisect_left(LATENCY_BUCKETS_MS, duration_ms)] += 1
+        self.commands[command_name] = self.commands.get(command_name, 0) + 1
+
+    def to_dict(self) -> Dict:
+        return {
+            'calls': self.calls,
+            'queries': self.queries,
+            'documents': self.documents,
+            'bytes': self.bytes,
+            'failures': self.failures,
+            'total_ms': self.total_ms,
+            'max_ms': self.max_ms,
+            'histogram': {f'<={bound}ms' if i < len(LATENCY_BUCKETS_MS) else f'>{LATENCY_BUCKETS_MS[-1]}ms': count
+                          for i, (bound, count) in enumerate(zip(LATENCY_BUCKETS_MS + (None,), self.histogram))},
+            'commands': dict(self.commands),
+        }
+
+
+class QueryProfiler(monitoring.CommandListener):
+    """
+    pymongo command listener collecting OperationStats per backend method (see instrument_methods).
+    Register it with MongoBackend.set_profiler before the backend connects.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, OperationStats] = dict()
+        # {(connection, request id): operation} of the running commands
+        self._running: Dict[Tuple, Tuple[str, str]] = dict()
+
+    def _operation_stats(self, operation: str) -> OperationStats:
+        stats = self._stats.get(operation)
+        if stats is None:
+            stats = self._stats[operation] = OperationStats()
+        return stats
+
+    def count_call(self, operation: str) -> None:
+        with self._lock:
+            self._operation_stats(operation).calls += 1
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        with self._lock:
+            self._running[(event.connection_id, event.request_id)] = (current_operation(), event.command_name)
+
+    @staticmethod
+    def _reply_documents(reply: Dict) -> int:
+        cursor = reply.get('cursor')
+        if cursor is not None:
+            return len(cursor.get('firstBatch', cursor.get('nextBatch', ())))
+        return reply.get('n', 0)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        size = len(bson.encode(event.reply))
+        with self._lock:
+            operation, command_name = self._running.pop((event.connection_id, event.request_id),
+                                                        (UNATTRIBUTED, event.command_name))
+            self._operation_stats(operation).record(command_name, event.duration_micros / 1000,
+                                                    self._reply_documents(event.reply), size)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        with self._lock:
+            operation, command_name = self._running.pop((event.connection_id, event.request_id),
+                                                        (UNATTRIBUTED, event.command_name))
+            self._operation_stats(operation).record(command_name, event.duration_micros / 1000, failed=True)
+
+    def stats(self) -> Dict[str, Dict]:
+        """
+        :return: {backend method: statistics dictionary (see OperationStats.to_dict)}
+        """
+        with self._lock:
+            return {operation: stats.to_dict() for operation, stats in self._stats.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = dict()
+
+    def summary(self) -> str:
+        """
+        :return: A table with one line per backend method, the methods with the most queries first.
+        """
+        stats = sorted(self.stats().items(), key=lambda item: item[1]['queries'], reverse=True)
+        lines = ['{:<36} {:>6} {:>8} {:>10} {:>10} {:>10} {:>10}'.format(
+            'method', 'calls', 'queries', 'documents', 'KiB', 'total ms', 'max ms')]
+        for operation, operation_stats in stats:
+            lines.append('{:<36} {:>6} {:>8} {:>10} {:>10.1f} {:>10.2f} {:>10.2f}'.format(
+                operation, operation_stats['calls'], operation_stats['queries'], operation_stats['documents'],
+                operation_stats['bytes'] / 1024, operation_stats['total_ms'], operation_stats['max_ms']))
+        return '\n'.join(lines)
+
+
+def _instrument(name: str, method):
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def generator_wrapper(self, *args, **kwargs):
+            # the operation is only set while the inner generator runs, not while the caller holds it at a yield
+            generator = method(self, *args, **kwargs)
+            counted = False
+            try:
+                while True:
+                    token = None
+                    if _current_operation.get() == UNATTRIBUTED:
+                        if not counted and self.profiler is not None:
+                            self.profiler.count_call(name)
+                        counted = True
+                        token = _current_operation.set(name)
+                    try:
+                        item = next(generator)
+                    except StopIteration as stop:
+                        return stop.value
+                    finally:
+                        if token is not None:
+                            _current_operation.reset(token)
+                    yield item
+            finally:
+                generator.close()
+        return generator_wrapper
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if _current_operation.get() != UNATTRIBUTED:
+            return method(self, *args, **kwargs)
+        if self.profiler is not None:
+            self.profiler.count_call(name)
+        token = _current_operation.set(name)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            _current_operation.reset(token)
+    return wrapper
+
+
+def instrument_methods(cls):
+    """
+    Class decorator attributing the database commands of every public method (including inherited ones) to the
+    method. Commands of nested calls are attributed to the outermost method. The instance needs a 'profiler'
+    attribute, which may be None.
+    """
+    for name in dir(cls):
+        if name.startswith('_'):
+            continue
+        attribute = inspect.getattr_static(cls, name)
+        if inspect.isfunction(attribute):
+            setattr(cls, name, _instrument(name, attribute))
+    return cls
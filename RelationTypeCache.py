@@ -0,0 +1,82 @@
+import threading
+from typing import List, Dict, Tuple, Optional, Iterable, Callable
+from bson import ObjectId
+from NetElements.Relations.Relations import RelationType
+
+
+class RelationTypeCache:
+    """
+    Cache of all relation types, keyed by direction and id and by (name, uni).
+    The cache is filled completely by the backend on first use and emptied again by invalidate(). Loads, reloads and
+    additions are serialized by a lock, lookups read the maps without it.
+    """
+
+    def __init__(self):
+        self._by_id: Dict[bool, Dict[ObjectId, RelationType]] = {True: dict(), False: dict()}
+        self._by_name: Dict[Tuple[str, bool], List[RelationType]] = dict()
+        self.loaded = False
+        # incremented by every load, see reload
+        self.generation = 0
+        self._lock = threading.RLock()
+
+    def load(self, relation_types: Iterable[RelationType]) -> None:
+        by_id = {True: dict(), False: dict()}
+        by_name = dict()
+        for relation_type in relation_types:
+            by_id[relation_type.is_uni][relation_type.id] = relation_type
+            by_name.setdefault((relation_type.name, relation_type.is_uni), list()).append(relation_type)
+        with self._lock:
+            # the maps are replaced instead of refilled, so concurrent lookups never see a partly loaded cache
+            self._by_id = by_id
+            self._by_name = by_name
+            self.generation += 1
+            self.loaded = True
+
+    def ensure_loaded(self, loader: Callable[[], Iterable[RelationType]]) -> None:
+        """
+        Loads the relation types returned by loader, unless the cache is loaded already.
+        """
+        with self._lock:
+            if not self.loaded:
+                self.load(loader())
+
+    def reload(self, loader: Callable[[], Iterable[RelationType]], generation: int) -> None:
+        """
+        Reloads the relation types returned by loader, unless the cache was loaded again since it had the given
+        generation. Several callers missing at the same time thereby share one reload.
+        """
+        with self._lock:
+            if self.generation == generation:
+                self.load(loader())
+
+    def add(self, relation_type: RelationType) -> None:
+        with self._lock:
+            self._by_id[relation_type.is_uni][relation_type.id] = relation_type
+            self._by_name.setdefault((relation_type.name, relation_type.is_uni), list()).append(relation_type)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._by_id = {True: dict(), False: dict()}
+            self._by_name = dict()
+            self.loaded = False
+
+    def get(self, relation_type_id: ObjectId, uni: Optional[bool] = None) -> Optional[RelationType]:
+        by_id = self._by_id
+        if uni is not None:
+            return by_id[uni].get(relation_type_id)
+        relation_type = by_id[True].get(relation_type_id)
+        return relation_type if relation_type is not None else by_id[False].get(relation_type_id)
+
+    def knows(self, relation_type_id: ObjectId) -> bool:
+        """
+        :return: Whether a relation type of either direction has the id. Lookups in the wrong direction miss
+        without the relation type being unknown.
+        """
+        by_id = self._by_id
+        return relation_type_id in by_id[True] or relation_type_id in by_id[False]
+
+    def by_name(self, name: str, uni: bool) -> List[RelationType]:
+        return list(self._by_name.get((name, uni), list()))
+
+    def all(self, uni: bool) -> List[RelationType]:
+        return list(self._by_id[uni].values())
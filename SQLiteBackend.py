@@ -0,0 +1,679 @@
+import json
+import re
+import sqlite3
+from bson import ObjectId
+from collections import Counter
+from functools import partial
+from itertools import islice
+from typing import List, Dict, Set, Tuple, Optional, Union, Iterable, Iterator, Sequence, Any
+from NetElements.Nodes.Node import Node, NodeView
+from NetElements.Relations.Relations import BiRelation, UniRelation, RelationType
+from NetElements.Relations.RelationBatch import RelationBatch
+from KnowledgeNetBackend import KnowledgeNetBackend
+from NameSearch import PREFIX_END, normalize_name, name_trigrams, query_trigrams, similarity
+
+# SQLite limits the number of host parameters of a single statement
+MAX_PARAMS = 900
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS nodes (
+    id BLOB PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    name_normalized TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS nodes_name ON nodes (name);
+CREATE INDEX IF NOT EXISTS nodes_name_normalized ON nodes (name_normalized);
+
+CREATE TABLE IF NOT EXISTS node_trigrams (
+    trigram TEXT NOT NULL,
+    node BLOB NOT NULL,
+    PRIMARY KEY (trigram, node)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS node_trigrams_node ON node_trigrams (node);
+
+CREATE TABLE IF NOT EXISTS node_fields (
+    node BLOB NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (node, field)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS node_fields_field ON node_fields (field);
+
+CREATE TABLE IF NOT EXISTS relation_types (
+    id BLOB PRIMARY KEY,
+    is_uni INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    "values" TEXT NOT NULL DEFAULT '{}',
+    reflexive INTEGER NOT NULL DEFAULT 0,
+    probabilistic INTEGER NOT NULL DEFAULT 0,
+    transitive INTEGER NOT NULL DEFAULT 0,
+    usage_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS uni_relations (
+    id BLOB PRIMARY KEY,
+    type BLOB NOT NULL,
+    node_from BLOB NOT NULL,
+    node_to BLOB NOT NULL,
+    probability REAL NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS uni_relations_from_type ON uni_relations (node_from, type);
+CREATE INDEX IF NOT EXISTS uni_relations_to_type ON uni_relations (node_to, type);
+CREATE INDEX IF NOT EXISTS uni_relations_type ON uni_relations (type);
+
+CREATE TABLE IF NOT EXISTS bi_relations (
+    id BLOB PRIMARY KEY,
+    type BLOB NOT NULL,
+    node_1 BLOB NOT NULL,
+    node_2 BLOB NOT NULL,
+    probability REAL NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS bi_relations_1_type ON bi_relations (node_1, type);
+CREATE INDEX IF NOT EXISTS bi_relations_2_type ON bi_relations (node_2, type);
+CREATE INDEX IF NOT EXISTS bi_relations_type ON bi_relations (type);
+
+CREATE TABLE IF NOT EXISTS closure (
+    type BLOB NOT NULL,
+    node_from BLOB NOT NULL,
+    node_to BLOB NOT NULL,
+    PRIMARY KEY (type, node_from, node_to)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS closure_type_to ON closure (type, node_to);
+'''
+
+# columns added to existing tables after their creation: (table, column, definition)
+MIGRATIONS = [
+    ('relation_types', 'transitive', 'INTEGER NOT NULL DEFAULT 0'),
+    ('nodes', 'name_normalized', "TEXT NOT NULL DEFAULT ''"),
+    ('relation_types', 'usage_count', 'INTEGER NOT NULL DEFAULT 0'),
+]
+
+
+def _blob(object_id: ObjectId) -> bytes:
+    return object_id.binary
+
+
+def _oid(blob: bytes) -> ObjectId:
+    return ObjectId(blob)
+
+
+def _chunks(items: List, size: int = MAX_PARAMS) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _placeholders(count: int) -> str:
+    return ', '.join('?' * count)
+
+
+class SQLiteBackend(KnowledgeNetBackend):
+    """
+    Embedded backend storing the KnowledgeNet in a single SQLite file (or in memory), without a database server.
+    The relation arrays of the nodes are not stored, but derived from the indexed relation tables.
+    """
+
+    def __init__(self, db_path: str = ':memory:'):
+        super().__init__()
+        self.connection = sqlite3.connect(db_path)
+        added_columns = self._migrate()
+        self.connection.executescript(SCHEMA)
+        if ('nodes', 'name_normalized') in added_columns:
+            self.backfill_name_search()
+        if ('relation_types', 'usage_count') in added_columns:
+            self.rebuild_relation_type_usage()
+
+    def _migrate(self) -> List[Tuple[str, str]]:
+        """
+        Adds the columns of MIGRATIONS to tables created before them. Runs before SCHEMA, whose indexes may
+        cover these columns.
+        :return: The added (table, column) tuples.
+        """
+        added_columns = list()
+        for table, column, definition in MIGRATIONS:
+            columns = {row[1] for row in self.connection.execute(f'PRAGMA table_info({table})')}
+            if columns and column not in columns:
+                with self.connection:
+                    self.connection.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+                added_columns.append((table, column))
+        return added_columns
+
+    def backfill_name_search(self) -> int:
+        rows = self.connection.execute('SELECT id, name FROM nodes').fetchall()
+        with self.connection:
+            self.connection.execute('DELETE FROM node_trigrams')
+            self._index_names(rows)
+        return len(rows)
+
+    def _index_names(self, rows: List[Tuple[bytes, str]]) -> None:
+        """
+        :param rows: (node id blob, name) tuples.
+        """
+        normalized_names = [(normalize_name(name), node_blob) for node_blob, name in rows]
+        self.connection.executemany('UPDATE nodes SET name_normalized = ? WHERE id = ?', normalized_names)
+        self.connection.executemany(
+            'INSERT OR IGNORE INTO node_trigrams (trigram, node) VALUES (?, ?)',
+            ((trigram, node_blob) for normalized, node_blob in normalized_names for trigram in name_trigrams(normalized)))
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def ensure_indexes(self) -> None:
+        self.connection.executescript(SCHEMA)
+
+    def index_report(self) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Compares the indexes declared in SCHEMA with the existing ones. SQLite keeps no usage statistics, so no index
+        is reported as unused.
+        """
+        existing = {name for name, in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        report = dict()
+        for name, table in re.findall(r'CREATE INDEX IF NOT EXISTS (\w+) ON (\w+)', SCHEMA):
+            table_report = report.setdefault(table, {'missing': list(), 'unused': list()})
+            if name not in existing:
+                table_report['missing'].append(name)
+        return report
+
+    # relation types
+    ################
+
+    def add_rel_type(self, rel_type: RelationType) -> ObjectId:
+        rel_type_id = rel_type.id or ObjectId()
+        with self.connection:
+            self.connection.execute(
+                'INSERT INTO relation_types (id, is_uni, name, description, "values", reflexive, probabilistic, '
+                'transitive) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (_blob(rel_type_id), rel_type.is_uni, rel_type.name, rel_type.description,
+                 json.dumps(rel_type.values), rel_type.reflexive, rel_type.probabilistic, rel_type.transitive))
+        if self.relation_type_cache.loaded:
+            rel_type_dict = rel_type.to_dict()
+            rel_type_dict['_id'] = rel_type_id
+            self.relation_type_cache.add(RelationType.from_dict(rel_type_dict))
+        return rel_type_id
+
+    def _load_relation_types(self) -> List[RelationType]:
+        return [
+            RelationType(
+                name=name,
+                uni=bool(is_uni),
+                description=description,
+                values=json.loads(values),
+                reflexive=bool(reflexive),
+                probabilistic=bool(probabilistic),
+                relation_type_id=_oid(rel_type_id),
+                transitive=bool(transitive),
+            ) for rel_type_id, is_uni, name, description, values, reflexive, probabilistic, transitive
+            in self.connection.execute(
+                'SELECT id, is_uni, name, description, "values", reflexive, probabilistic, transitive '
+                'FROM relation_types')
+        ]
+
+    def get_relationtype_usage_numbers(self, relation_type_ids: List[ObjectId], uni: bool) -> Dict[ObjectId, int]:
+        usage_numbers = dict()
+        for chunk in _chunks([_blob(relation_type_id) for relation_type_id in relation_type_ids], MAX_PARAMS - 1):
+            usage_numbers.update((_oid(rel_type_blob), usage_count) for rel_type_blob, usage_count in
+                                 self.connection.execute(
+                                     f'SELECT id, usage_count FROM relation_types '
+                                     f'WHERE is_uni = ? AND id IN ({_placeholders(len(chunk))})', [uni] + chunk))
+        return usage_numbers
+
+    def _increment_usage(self, counts: Dict[bytes, int]) -> None:
+        """
+        Must be called inside the transaction of the relation writes.
+        :param counts: {relation type blob: change of the usage counter}
+        """
+        self.connection.executemany('UPDATE relation_types SET usage_count = usage_count + ? WHERE id = ?',
+                                    [(count, rel_type_blob) for rel_type_blob, count in counts.items() if count])
+
+    def rebuild_relation_type_usage(self) -> None:
+        with self.connection:
+            self.connection.execute(
+                'UPDATE relation_types SET usage_count = CASE WHEN is_uni '
+                'THEN (SELECT COUNT(*) FROM uni_relations WHERE uni_relations.type = relation_types.id) '
+                'ELSE (SELECT COUNT(*) FROM bi_relations WHERE bi_relations.type = relation_types.id) END')
+
+    # nodes
+    #######
+
+    def add_node(self, node: Node) -> ObjectId:
+        return self.add_nodes([node])[0]
+
+    def add_nodes(self, nodes: Iterable[Node]) -> List[ObjectId]:
+        rows = [(_blob(node.id or ObjectId()), node.name, node.description, normalize_name(node.name))
+                for node in nodes]
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO nodes (id, name, description, name_normalized) VALUES (?, ?, ?, ?)', rows)
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO node_trigrams (trigram, node) VALUES (?, ?)',
+                ((trigram, row[0]) for row in rows for trigram in name_trigrams(row[3])))
+        return [_oid(row[0]) for row in rows]
+
+    def delete_nodes(self, node_ids: Iterable[ObjectId], batch_size: int = MAX_PARAMS) -> None:
+        node_ids = list(node_ids)
+        closure_affected = self._closure_before_delete(node_ids)
+        node_blobs = [_blob(node_id) for node_id in node_ids]
+        with self.connection:
+            for chunk in _chunks(node_blobs, min(batch_size, MAX_PARAMS)):
+                placeholders = _placeholders(len(chunk))
+                for table, columns in (('uni_relations', ('node_from', 'node_to')),
+                                       ('bi_relations', ('node_1', 'node_2'))):
+                    self._increment_usage({rel_type_blob: -count for rel_type_blob, count in self.connection.execute(
+                        f'SELECT type, COUNT(*) FROM {table} WHERE {columns[0]} IN ({placeholders}) '
+                        f'OR {columns[1]} IN ({placeholders}) GROUP BY type', chunk * 2)})
+                self.connection.execute(
+                    f'DELETE FROM uni_relations WHERE node_from IN ({placeholders}) OR node_to IN ({placeholders})',
+                    chunk * 2)
+                self.connection.execute(
+                    f'DELETE FROM bi_relations WHERE node_1 IN ({placeholders}) OR node_2 IN ({placeholders})',
+                    chunk * 2)
+                self.connection.execute(f'DELETE FROM node_fields WHERE node IN ({placeholders})', chunk)
+                self.connection.execute(f'DELETE FROM node_trigrams WHERE node IN ({placeholders})', chunk)
+                self.connection.execute(f'DELETE FROM nodes WHERE id IN ({placeholders})', chunk)
+            self._closure_after_delete(node_ids, closure_affected)
+
+    def _relation_ids_of_nodes(self, node_ids: List[ObjectId]) -> Dict[ObjectId, Dict[str, List[ObjectId]]]:
+        relation_ids = {node_id: {'_id': node_id, 'in_relations': list(), 'out_relations': list(),
+                                  'bi_relations': list()}
+                        for node_id in node_ids}
+        queries = (
+            ('in_relations', 'SELECT node_to, id FROM uni_relations WHERE node_to IN ({}) ORDER BY rowid'),
+            ('out_relations', 'SELECT node_from, id FROM uni_relations WHERE node_from IN ({}) ORDER BY rowid'),
+            ('bi_relations', 'SELECT node_1, id FROM bi_relations WHERE node_1 IN ({}) '
+                             'UNION ALL SELECT node_2, id FROM bi_relations WHERE node_2 IN ({}) AND node_1 != node_2'),
+        )
+        for chunk in _chunks([_blob(node_id) for node_id in relation_ids]):
+            for field, query in queries:
+                params = chunk * query.count('{}')
+                query = query.format(*[_placeholders(len(chunk))] * query.count('{}'))
+                for node_blob, relation_blob in self.connection.execute(query, params):
+                    relation_ids[_oid(node_blob)][field].append(_oid(relation_blob))
+        return relation_ids
+
+    def _nodes_from_rows(self, rows: List[Tuple], view: NodeView = NodeView.FULL) -> List[Node]:
+        if view == NodeView.SUMMARY:
+            return [Node(name=name, description=description, object_id=_oid(node_blob),
+                         relation_loader=partial(self.get_relation_ids_of_node, _oid(node_blob)))
+                    for node_blob, name, description in rows]
+        relation_ids = self._relation_ids_of_nodes([_oid(row[0]) for row in rows])
+        nodes = list()
+        for node_blob, name, description in rows:
+            node_id = _oid(node_blob)
+            nodes.append(Node(
+                name=name,
+                description=description,
+                in_relations=relation_ids[node_id]['in_relations'],
+                out_relations=relation_ids[node_id]['out_relations'],
+                bi_relations=relation_ids[node_id]['bi_relations'],
+                object_id=node_id,
+            ))
+        return nodes
+
+    def get_node(self, node_id: ObjectId, view: NodeView = NodeView.FULL) -> Optional[Node]:
+        nodes = self.get_nodes([node_id], view)
+        return nodes[0] if nodes else None
+
+    def get_nodes(self, node_ids: List[ObjectId], view: NodeView = NodeView.FULL) -> List[Node]:
+        rows = list()
+        for chunk in _chunks([_blob(node_id) for node_id in node_ids]):
+            rows += self.connection.execute(
+                f'SELECT id, name, description FROM nodes WHERE id IN ({_placeholders(len(chunk))})', chunk).fetchall()
+        return self._nodes_from_rows(rows, view)
+
+    def list_nodes_by_name(self, node_name: str, sloppy: bool = False, view: NodeView = NodeView.FULL) -> List[Node]:
+        if sloppy:
+            return self._nodes_from_rows(self._rows_containing(normalize_name(node_name)), view)
+        else:
+            rows = self.connection.execute(
+                'SELECT id, name, description FROM nodes WHERE name = ?', (node_name,)).fetchall()
+        return self._nodes_from_rows(rows, view)
+
+    def _rows_containing(self, normalized_query: str) -> List[Tuple]:
+        trigrams = sorted(query_trigrams(normalized_query))[:MAX_PARAMS]
+        if not trigrams:
+            # too short for the trigram index
+            return [row[:3] for row in self.connection.execute(
+                'SELECT id, name, description, name_normalized FROM nodes WHERE instr(name_normalized, ?) > 0',
+                (normalized_query,))]
+        rows = list()
+        for chunk in _chunks([row[0] for row in self.connection.execute(
+                f'SELECT node FROM node_trigrams WHERE trigram IN ({_placeholders(len(trigrams))}) '
+                f'GROUP BY node HAVING COUNT(*) = ?', trigrams + [len(trigrams)])]):
+            rows += self.connection.execute(
+                f'SELECT id, name, description, name_normalized FROM nodes WHERE id IN ({_placeholders(len(chunk))})',
+                chunk).fetchall()
+        # the trigrams can occur in another order than in the query
+        return [row[:3] for row in rows if normalized_query in row[3]]
+
+    def search_nodes(self,
+                     query: str,
+                     limit: int = 10,
+                     prefix: bool = False,
+                     min_similarity: float = 0.2,
+                     view: NodeView = NodeView.SUMMARY,
+                     ) -> List[Tuple[Node, float]]:
+        normalized_query = normalize_name(query)
+        if prefix:
+            rows = self.connection.execute(
+                'SELECT id, name, description, name_normalized FROM nodes '
+                'WHERE name_normalized >= ? AND name_normalized < ? ORDER BY name_normalized LIMIT ?',
+                (normalized_query, normalized_query + PREFIX_END, limit)).fetchall()
+        else:
+            trigrams = sorted(name_trigrams(normalized_query))[:MAX_PARAMS - 1]
+            # the nodes sharing the most trigrams are ranked by their similarity
+            candidates = [node for node, in self.connection.execute(
+                f'SELECT node FROM node_trigrams WHERE trigram IN ({_placeholders(len(trigrams))}) '
+                f'GROUP BY node ORDER BY COUNT(*) DESC LIMIT ?', trigrams + [limit * 5])]
+            rows = self.connection.execute(
+                f'SELECT id, name, description, name_normalized FROM nodes '
+                f'WHERE id IN ({_placeholders(len(candidates))})', candidates).fetchall()
+        scores = [similarity(normalized_query, row[3]) for row in rows]
+        results = list(zip(self._nodes_from_rows([row[:3] for row in rows], view), scores))
+        if not prefix:
+            results = [result for result in results if result[1] >= min_similarity]
+            results.sort(key=lambda result: result[1], reverse=True)
+        return results[:limit]
+
+    def iter_nodes(self,
+                   name_prefix: Optional[str] = None,
+                   after: Optional[ObjectId] = None,
+                   limit: Optional[int] = None,
+                   fields: Sequence[str] = ('name',),
+                   batch_size: int = 1000,
+                   ) -> Iterator[Dict]:
+        fields = [field for field in fields if field in ('name', 'description')]
+        conditions, params = list(), list()
+        if after is not None:
+            conditions.append('id > ?')
+            params.append(_blob(after))
+        if name_prefix:
+            # a range condition instead of LIKE, which is case insensitive and could not use the name index
+            conditions.append('name >= ? AND name < ?')
+            params += [name_prefix, name_prefix + '\U0010ffff']
+        query = 'SELECT {} FROM nodes'.format(', '.join(['id'] + fields))
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY id'
+        if limit:
+            query += ' LIMIT ?'
+            params.append(limit)
+        cursor = self.connection.execute(query, params)
+        rows = cursor.fetchmany(batch_size)
+        while rows:
+            for row in rows:
+                node_dict = dict(zip(fields, row[1:]))
+                node_dict['_id'] = _oid(row[0])
+                yield node_dict
+            rows = cursor.fetchmany(batch_size)
+
+    def set_node_field(self, field: str, values: Dict[ObjectId, Any]) -> None:
+        self._check_node_field(field)
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO node_fields (node, field, value) VALUES (?, ?, ?)',
+                ((_blob(node_id), field, json.dumps(value)) for node_id, value in values.items()))
+
+    def get_node_field(self, field: str, node_ids: Optional[List[ObjectId]] = None) -> Dict[ObjectId, Any]:
+        if node_ids is None:
+            rows = self.connection.execute('SELECT node, value FROM node_fields WHERE field = ?', (field,))
+            return {_oid(node): json.loads(value) for node, value in rows}
+        values = dict()
+        for chunk in _chunks([_blob(node_id) for node_id in node_ids], MAX_PARAMS - 1):
+            values.update((_oid(node), json.loads(value)) for node, value in self.connection.execute(
+                f'SELECT node, value FROM node_fields WHERE field = ? AND node IN ({_placeholders(len(chunk))})',
+                [field] + chunk))
+        return values
+
+    def get_all_node_names(self) -> List[str]:
+        return [name for name, in self.connection.execute('SELECT name FROM nodes')]
+
+    # relations
+    ###########
+
+    def add_relation(self, relation: Union[UniRelation, BiRelation]) -> ObjectId:
+        self._check_relation(relation, self.get_relation_type(relation.type, relation.is_uni))
+        relation_id = ObjectId()
+        with self.connection:
+            self._insert_relations([(relation, relation_id)])
+            self._closure_after_add([relation])
+        return relation_id
+
+    def _insert_relations(self, relations: List[Tuple[Union[UniRelation, BiRelation], ObjectId]]) -> None:
+        uni_rows = [(_blob(relation_id), _blob(relation.type), _blob(relation.node_from), _blob(relation.node_to),
+                     relation.probability)
+                    for relation, relation_id in relations if relation.is_uni]
+        bi_rows = [(_blob(relation_id), _blob(relation.type), _blob(relation.node_1), _blob(relation.node_2),
+                    relation.probability)
+                   for relation, relation_id in relations if not relation.is_uni]
+        if uni_rows:
+            self.connection.executemany(
+                'INSERT INTO uni_relations (id, type, node_from, node_to, probability) VALUES (?, ?, ?, ?, ?)',
+                uni_rows)
+        if bi_rows:
+            self.connection.executemany(
+                'INSERT INTO bi_relations (id, type, node_1, node_2, probability) VALUES (?, ?, ?, ?, ?)',
+                bi_rows)
+        self._increment_usage(Counter(row[1] for row in uni_rows + bi_rows))
+
+    def add_relations(self,
+                      relations: Iterable[Union[UniRelation, BiRelation]],
+                      batch_size: int = 1000,
+                      ) -> Tuple[List[ObjectId], List[Tuple[int, Exception]]]:
+        inserted_ids: List[ObjectId] = list()
+        failures: List[Tuple[int, Exception]] = list()
+        relations = iter(relations)
+        offset = 0
+        batch = list(islice(relations, batch_size))
+        while batch:
+            valid = list()
+            for position, relation in enumerate(batch, start=offset):
+                try:
+                    self._check_relation(relation, self.get_relation_type(relation.type, relation.is_uni))
+                except Exception as e:
+                    failures.append((position, e))
+                    continue
+                valid.append((relation, ObjectId()))
+            with self.connection:
+                self._insert_relations(valid)
+                self._closure_after_add(relation for relation, _ in valid)
+            inserted_ids += [relation_id for _, relation_id in valid]
+            offset += len(batch)
+            batch = list(islice(relations, batch_size))
+        return inserted_ids, failures
+
+    def get_relation_ids_of_node(self, node_id: ObjectId) -> Dict:
+        return self._relation_ids_of_nodes([node_id])[node_id]
+
+    @staticmethod
+    def _uni_relations_from_rows(rows: Iterable[Tuple]) -> List[UniRelation]:
+        return [UniRelation(relation_type_id=_oid(rel_type), node_from_id=_oid(node_from), node_to_id=_oid(node_to),
+                            probability=probability, relation_id=_oid(relation_id))
+                for relation_id, rel_type, node_from, node_to, probability in rows]
+
+    @staticmethod
+    def _bi_relations_from_rows(rows: Iterable[Tuple]) -> List[BiRelation]:
+        return [BiRelation(relation_type_id=_oid(rel_type), node_1_id=_oid(node_1), node_2_id=_oid(node_2),
+                           probability=probability, relation_id=_oid(relation_id))
+                for relation_id, rel_type, node_1, node_2, probability in rows]
+
+    def get_relation_objects_of_node(self, node_id: ObjectId) -> Dict:
+        node_blob = _blob(node_id)
+        return {
+            'in_relations': self._uni_relations_from_rows(self.connection.execute(
+                'SELECT id, type, node_from, node_to, probability FROM uni_relations WHERE node_to = ? '
+                'ORDER BY rowid', (node_blob,))),
+            'out_relations': self._uni_relations_from_rows(self.connection.execute(
+                'SELECT id, type, node_from, node_to, probability FROM uni_relations WHERE node_from = ? '
+                'ORDER BY rowid', (node_blob,))),
+            'bi_relations': self._bi_relations_from_rows(self.connection.execute(
+                'SELECT id, type, node_1, node_2, probability FROM bi_relations WHERE node_1 = ? OR node_2 = ? '
+                'ORDER BY rowid', (node_blob, node_blob))),
+        }
+
+    def iter_relations(self,
+                       uni: bool,
+                       relation_type_ids: Optional[List[ObjectId]] = None,
+                       batch_size: int = 1000,
+                       ) -> Iterator[Union[UniRelation, BiRelation]]:
+        if uni:
+            query = 'SELECT id, type, node_from, node_to, probability FROM uni_relations'
+        else:
+            query = 'SELECT id, type, node_1, node_2, probability FROM bi_relations'
+        params = list()
+        if relation_type_ids is not None:
+            query += f' WHERE type IN ({_placeholders(len(relation_type_ids))})'
+            params = [_blob(relation_type_id) for relation_type_id in relation_type_ids]
+        from_rows = self._uni_relations_from_rows if uni else self._bi_relations_from_rows
+        cursor = self.connection.execute(query, params)
+        rows = cursor.fetchmany(batch_size)
+        while rows:
+            yield from from_rows(rows)
+            rows = cursor.fetchmany(batch_size)
+
+    def get_relation_batch(self, uni: bool, relation_type_ids: Optional[List[ObjectId]] = None) -> RelationBatch:
+        if uni:
+            query = 'SELECT id, type, node_from, node_to, probability FROM uni_relations'
+        else:
+            query = 'SELECT id, type, node_1, node_2, probability FROM bi_relations'
+        params = list()
+        if relation_type_ids is not None:
+            # the number of relation types is small, so a single IN clause is fine
+            query += f' WHERE type IN ({_placeholders(len(relation_type_ids))})'
+            params = [_blob(relation_type_id) for relation_type_id in relation_type_ids]
+        batch = RelationBatch(uni)
+        for relation_id, rel_type, node_1, node_2, probability in self.connection.execute(query, params):
+            batch.append(_oid(rel_type), _oid(node_1), _oid(node_2), probability, _oid(relation_id))
+        return batch
+
+    def get_relations_between(self, node_1_id: ObjectId, node_2_id: ObjectId) -> Tuple[List[UniRelation], List[BiRelation]]:
+        node_1_blob, node_2_blob = _blob(node_1_id), _blob(node_2_id)
+        uni_relations = self.connection.execute(
+            'SELECT id, type, node_from, node_to, probability FROM uni_relations '
+            'WHERE (node_from = ? AND node_to = ?) OR (node_from = ? AND node_to = ?)',
+            (node_1_blob, node_2_blob, node_2_blob, node_1_blob))
+        bi_relations = self.connection.execute(
+            'SELECT id, type, node_1, node_2, probability FROM bi_relations '
+            'WHERE (node_1 = ? AND node_2 = ?) OR (node_1 = ? AND node_2 = ?)',
+            (node_1_blob, node_2_blob, node_2_blob, node_1_blob))
+        return self._uni_relations_from_rows(uni_relations), self._bi_relations_from_rows(bi_relations)
+
+    def _relations_between_pairs(self,
+                                 pairs: List[Tuple[ObjectId, ObjectId]],
+                                 ) -> Tuple[List[UniRelation], List[BiRelation]]:
+        uni_relations, bi_relations = [], []
+        for chunk in _chunks(pairs, MAX_PARAMS // 2):
+            values = ', '.join(['(?, ?)'] * len(chunk))
+            params = [_blob(node_id) for pair in chunk for node_id in pair]
+            # one indexed join per direction, an OR in the join condition would prevent the use of the indexes
+            for table, columns, from_rows, relations in (
+                    ('uni_relations', ('node_from', 'node_to'), self._uni_relations_from_rows, uni_relations),
+                    ('bi_relations', ('node_1', 'node_2'), self._bi_relations_from_rows, bi_relations)):
+                rows = self.connection.execute(
+                    f'WITH pairs (a, b) AS (VALUES {values}) '
+                    f'SELECT id, type, {columns[0]}, {columns[1]}, probability FROM {table} '
+                    f'JOIN pairs ON {columns[0]} = a AND {columns[1]} = b '
+                    f'UNION '
+                    f'SELECT id, type, {columns[0]}, {columns[1]}, probability FROM {table} '
+                    f'JOIN pairs ON {columns[0]} = b AND {columns[1]} = a', params)
+                relations += from_rows(rows)
+        return uni_relations, bi_relations
+
+    def get_relations_of_nodes(self,
+                               node_ids: List[ObjectId],
+                               relation_type_ids: Optional[List[ObjectId]] = None,
+                               outgoing: bool = True,
+                               incoming: bool = True,
+                               session=None,
+                               ) -> Tuple[List[UniRelation], List[BiRelation]]:
+        type_filter, type_params = '', []
+        if relation_type_ids is not None:
+            type_filter = f' AND type IN ({_placeholders(len(relation_type_ids))})'
+            type_params = [_blob(relation_type_id) for relation_type_id in relation_type_ids]
+        uni_columns = [column for column, selected in (('node_from', outgoing), ('node_to', incoming)) if selected]
+        uni_relations, bi_relations = [], []
+        for chunk in _chunks([_blob(node_id) for node_id in node_ids], (MAX_PARAMS - len(type_params)) // 2):
+            placeholders = _placeholders(len(chunk))
+            if uni_columns:
+                condition = ' OR '.join(f'{column} IN ({placeholders})' for column in uni_columns)
+                uni_relations += self._uni_relations_from_rows(self.connection.execute(
+                    f'SELECT id, type, node_from, node_to, probability FROM uni_relations '
+                    f'WHERE ({condition}){type_filter}', chunk * len(uni_columns) + type_params))
+            bi_relations += self._bi_relations_from_rows(self.connection.execute(
+                f'SELECT id, type, node_1, node_2, probability FROM bi_relations '
+                f'WHERE (node_1 IN ({placeholders}) OR node_2 IN ({placeholders})){type_filter}',
+                chunk * 2 + type_params))
+        # a relation between two nodes of different chunks is returned once per chunk
+        uni_relations = list({relation.id: relation for relation in uni_relations}.values())
+        bi_relations = list({relation.id: relation for relation in bi_relations}.values())
+        return uni_relations, bi_relations
+
+    def _closure_neighbours(self, relation_type_id: ObjectId, node_ids: List[ObjectId], targets: bool,
+                            session=None) -> Set[ObjectId]:
+        known, wanted = ('node_from', 'node_to') if targets else ('node_to', 'node_from')
+        neighbours = set()
+        for chunk in _chunks([_blob(node_id) for node_id in node_ids], MAX_PARAMS - 1):
+            neighbours.update(_oid(node) for node, in self.connection.execute(
+                f'SELECT {wanted} FROM closure WHERE type = ? AND {known} IN ({_placeholders(len(chunk))})',
+                [_blob(relation_type_id)] + chunk))
+        return neighbours
+
+    def _closure_contains(self, relation_type_id: ObjectId, node_from_id: ObjectId, node_to_id: ObjectId) -> bool:
+        return self.connection.execute(
+            'SELECT 1 FROM closure WHERE type = ? AND node_from = ? AND node_to = ?',
+            (_blob(relation_type_id), _blob(node_from_id), _blob(node_to_id))).fetchone() is not None
+
+    def _add_closure_pairs(self, relation_type_id: ObjectId, pairs: Iterable[Tuple[ObjectId, ObjectId]],
+                           session=None) -> None:
+        type_blob = _blob(relation_type_id)
+        self.connection.executemany(
+            'INSERT OR IGNORE INTO closure (type, node_from, node_to) VALUES (?, ?, ?)',
+            ((type_blob, _blob(node_from_id), _blob(node_to_id)) for node_from_id, node_to_id in pairs))
+
+    def _delete_closure_sources(self, relation_type_id: ObjectId, node_ids: Optional[List[ObjectId]],
+                                session=None) -> None:
+        if node_ids is None:
+            self.connection.execute('DELETE FROM closure WHERE type = ?', (_blob(relation_type_id),))
+            return
+        for chunk in _chunks([_blob(node_id) for node_id in node_ids], MAX_PARAMS - 1):
+            self.connection.execute(
+                f'DELETE FROM closure WHERE type = ? AND node_from IN ({_placeholders(len(chunk))})',
+                [_blob(relation_type_id)] + chunk)
+
+    def rebuild_transitive_closure(self, relation_type_id: Optional[ObjectId] = None) -> None:
+        with self.connection:
+            super().rebuild_transitive_closure(relation_type_id)
+
+    # traversals
+    ############
+
+    def get_all_uni_connected_nodes(self, start_node_id: ObjectId, relation_type_id: ObjectId, stop_at: Optional[ObjectId] = None, include_direction: bool = True, inverse_direction: bool = False) -> List[ObjectId]:
+        """
+        Computes the closure with a single recursive query. stop_at is accepted for compatibility, the closure is
+        always computed completely.
+        """
+        if not include_direction:
+            steps = ('SELECT r.node_to FROM uni_relations r JOIN reach ON r.node_from = reach.node WHERE r.type = ? '
+                     'UNION SELECT r.node_from FROM uni_relations r JOIN reach ON r.node_to = reach.node '
+                     'WHERE r.type = ?')
+            params = (_blob(start_node_id), _blob(relation_type_id), _blob(relation_type_id))
+        elif inverse_direction:
+            steps = 'SELECT r.node_from FROM uni_relations r JOIN reach ON r.node_to = reach.node WHERE r.type = ?'
+            params = (_blob(start_node_id), _blob(relation_type_id))
+        else:
+            steps = 'SELECT r.node_to FROM uni_relations r JOIN reach ON r.node_from = reach.node WHERE r.type = ?'
+            params = (_blob(start_node_id), _blob(relation_type_id))
+        return [_oid(node) for node, in self.connection.execute(
+            f'WITH RECURSIVE reach(node) AS (SELECT ? UNION {steps}) SELECT node FROM reach', params)]
+
+    def get_all_bi_connected_nodes(self, start_node_id: ObjectId, relation_type_id: ObjectId, stop_at: Optional[ObjectId] = None) -> List[ObjectId]:
+        """
+        Computes the closure with a single recursive query. stop_at is accepted for compatibility, the closure is
+        always computed completely.
+        """
+        return [_oid(node) for node, in self.connection.execute(
+            'WITH RECURSIVE reach(node) AS (SELECT ? '
+            'UNION SELECT r.node_2 FROM bi_relations r JOIN reach ON r.node_1 = reach.node WHERE r.type = ? '
+            'UNION SELECT r.node_1 FROM bi_relations r JOIN reach ON r.node_2 = reach.node WHERE r.type = ?) '
+            'SELECT node FROM reach',
+            (_blob(start_node_id), _blob(relation_type_id), _blob(relation_type_id)))]
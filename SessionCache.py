@@ -0,0 +1,184 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Optional, Union, Iterable
+from bson import ObjectId
+from NetElements.Nodes.Node import Node, NodeView
+from NetElements.Relations.Relations import BiRelation, UniRelation
+from KnowledgeNetBackend import KnowledgeNetBackend
+
+
+class BoundedCache:
+    """
+    Least recently used mapping with a maximal size. Safe to use from several threads.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class CachingBackend:
+    """
+    Read-through cache of the nodes and relation infos of one session in front of a backend, e.g. for browsing the
+    net in the frontend. Writes made through this object invalidate the affected entries, writes of other clients
+    are not seen until an entry is evicted.
+    All other methods are passed through to the backend.
+    """
+
+    def __init__(self, backend: KnowledgeNetBackend, max_size: int = 256, prefetch: bool = False,
+                 max_prefetch: int = 32):
+        """
+        :param backend: The backend to cache.
+        :param max_size: The maximal number of cached nodes and of cached relation infos.
+        :param prefetch: Fetch the relation infos of the neighbours of every fetched relation info in a background
+        thread. Ignored if the backend can not be used from several threads (see KnowledgeNetBackend.thread_safe).
+        :param max_prefetch: The maximal number of neighbours prefetched per relation info.
+        """
+        self.backend = backend
+        self._nodes = BoundedCache(max_size)
+        self._relation_infos = BoundedCache(max_size)
+        self.max_prefetch = max_prefetch
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if prefetch and backend.thread_safe:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='knowledgenet-prefetch')
+        # incremented by every write, prefetched entries are dropped if a write happened while they were fetched
+        self._generation = 0
+        self._generation_lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def stop_prefetch(self) -> None:
+        """
+        Cancels the pending prefetches and stops the background thread.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    # reads
+    #######
+
+    def get_node(self, node_id: ObjectId, view: NodeView = NodeView.FULL) -> Optional[Node]:
+        node = self._nodes.get((node_id, view))
+        if node is None:
+            node = self.backend.get_node(node_id, view)
+            if node is not None:
+                self._nodes.put((node_id, view), node)
+        return node
+
+    def get_nodes(self, node_ids: List[ObjectId], view: NodeView = NodeView.FULL) -> List[Node]:
+        nodes = {node_id: self._nodes.get((node_id, view)) for node_id in node_ids}
+        missing_ids = [node_id for node_id, node in nodes.items() if node is None]
+        if missing_ids:
+            for node in self.backend.get_nodes(missing_ids, view):
+                self._nodes.put((node.id, view), node)
+                nodes[node.id] = node
+        return [node for node in nodes.values() if node is not None]
+
+    def get_relation_info_of_node(self, node_id: ObjectId) -> Dict:
+        relation_info = self._relation_infos.get(node_id)
+        if relation_info is None:
+            relation_info = self._fetch_relation_info(node_id, self._generation)
+        if self._executor is not None:
+            self._executor.submit(self._prefetch, self._neighbour_ids(relation_info), self._generation)
+        return relation_info
+
+    def _fetch_relation_info(self, node_id: ObjectId, generation: int) -> Dict:
+        relation_info = self.backend.get_relation_info_of_node(node_id)
+        with self._generation_lock:
+            if generation != self._generation:
+                return relation_info
+            self._relation_infos.put(node_id, relation_info)
+            # the neighbours are listed as summaries, which is what browsing to them fetches
+            for relations, key in ((relation_info['in_relations'], 'from'), (relation_info['out_relations'], 'to'),
+                                   (relation_info['bi_relations'], 'with')):
+                for relation in relations:
+                    self._nodes.put((relation[key].id, NodeView.SUMMARY), relation[key])
+        return relation_info
+
+    @staticmethod
+    def _neighbour_ids(relation_info: Dict) -> List[ObjectId]:
+        neighbour_ids = [relation['from'].id for relation in relation_info['in_relations']]
+        neighbour_ids += [relation['to'].id for relation in relation_info['out_relations']]
+        neighbour_ids += [relation['with'].id for relation in relation_info['bi_relations']]
+        return list(dict.fromkeys(neighbour_ids))
+
+    def _prefetch(self, node_ids: List[ObjectId], generation: int) -> None:
+        for node_id in node_ids[:self.max_prefetch]:
+            if generation != self._generation:
+                return
+            if node_id not in self._relation_infos:
+                self._fetch_relation_info(node_id, generation)
+
+    # writes
+    ########
+
+    def _invalidate(self, node_ids: Iterable[ObjectId] = (), everything: bool = False) -> None:
+        with self._generation_lock:
+            self._generation += 1
+            if everything:
+                self._nodes.clear()
+                self._relation_infos.clear()
+                return
+            for node_id in node_ids:
+                for view in NodeView:
+                    self._nodes.pop((node_id, view))
+                self._relation_infos.pop(node_id)
+
+    def add_relation(self, relation: Union[UniRelation, BiRelation]) -> ObjectId:
+        try:
+            return self.backend.add_relation(relation)
+        finally:
+            self._invalidate((relation.node_1, relation.node_2))
+
+    def add_relations(self, relations: Iterable[Union[UniRelation, BiRelation]], *args, **kwargs) -> Tuple:
+        relations = list(relations)
+        try:
+            return self.backend.add_relations(relations, *args, **kwargs)
+        finally:
+            self._invalidate({node_id for relation in relations for node_id in (relation.node_1, relation.node_2)})
+
+    def delete_node(self, node_id: ObjectId) -> None:
+        self.delete_nodes([node_id])
+
+    def delete_nodes(self, node_ids: Iterable[ObjectId], *args, **kwargs) -> None:
+        node_ids = list(node_ids)
+        try:
+            self.backend.delete_nodes(node_ids, *args, **kwargs)
+        finally:
+            # the neighbours of the deleted nodes are not known without querying, but their cached nodes hold the
+            # IDs of the deleted relations and their relation infos list the deleted nodes
+            self._invalidate(everything=True)
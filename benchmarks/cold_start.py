@@ -0,0 +1,52 @@
+#! /usr/bin/env python
+"""
+Measures the cold start time of the frontend: every sample runs a command in a fresh interpreter.
+Prints the results as JSON, e.g.
+
+    python benchmarks/cold_start.py --runs 20 --db sqlite:// node list
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_command(command, runs):
+    samples = list()
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=REPO_DIR, stdout=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'command': ' '.join(command[1:]),
+        'runs': runs,
+        'min_ms': min(samples),
+        'median_ms': statistics.median(samples),
+        'max_ms': max(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold start benchmark of the KnowledgeNet frontend')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--db', default='sqlite://', help='backend URI used for the frontend command')
+    parser.add_argument('command', nargs='*', default=['node', 'list'], help='frontend command to time')
+    args = parser.parse_args()
+
+    results = [
+        # the interpreter alone, as a baseline
+        time_command([sys.executable, '-c', 'pass'], args.runs),
+        # importing the modules must not have any side effects
+        time_command([sys.executable, '-c', 'import KnowledgeNetFrontend'], args.runs),
+        time_command([sys.executable, 'KnowledgeNetFrontend.py', '--db', args.db] + args.command, args.runs),
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Seeded generator of synthetic KnowledgeNet graphs for the benchmarks.
+"""
+import itertools
+import random
+from typing import List, Dict, Iterator
+from bson import ObjectId
+
+from NetElements.Nodes.Node import Node
+from NetElements.Relations.Relations import BiRelation, UniRelation, RelationType
+
+WORDS = ['animal', 'plant', 'city', 'river', 'person', 'company', 'language', 'planet', 'element', 'instrument',
+         'disease', 'mineral', 'building', 'vehicle', 'festival']
+
+
+class GraphSpec:
+    def __init__(self,
+                 nodes: int = 10000,
+                 mean_degree: float = 4.0,
+                 degree_distribution: str = 'powerlaw',
+                 uni_relation_types: int = 4,
+                 bi_relation_types: int = 2,
+                 probabilistic_share: float = 0.25,
+                 seed: int = 0,
+                 ):
+        """
+        :param nodes: The number of nodes.
+        :param mean_degree: The mean number of relations per node.
+        :param degree_distribution: 'uniform' or 'powerlaw' (a few hub nodes take part in most relations).
+        :param uni_relation_types: The number of unidirectional relation types.
+        :param bi_relation_types: The number of bidirectional relation types.
+        :param probabilistic_share: The share of probabilistic relation types.
+        :param seed: The seed of the random number generator.
+        """
+        if degree_distribution not in ('uniform', 'powerlaw'):
+            raise ValueError('degree_distribution must be "uniform" or "powerlaw"')
+        self.nodes = nodes
+        self.mean_degree = mean_degree
+        self.degree_distribution = degree_distribution
+        self.uni_relation_types = uni_relation_types
+        self.bi_relation_types = bi_relation_types
+        self.probabilistic_share = probabilistic_share
+        self.seed = seed
+
+    @property
+    def relations(self) -> int:
+        return int(self.nodes * self.mean_degree / 2)
+
+    def to_dict(self) -> Dict:
+        return dict(vars(self))
+
+
+class GraphGenerator:
+    """
+    Generates relation types, nodes and relations of a GraphSpec. The same spec always yields the same graph
+    (up to the IDs assigned by the backend).
+    """
+
+    def __init__(self, spec: GraphSpec):
+        self.spec = spec
+        self.random = random.Random(spec.seed)
+        # the relative probability of every node to take part in a relation
+        if spec.degree_distribution == 'powerlaw':
+            weights = [self.random.paretovariate(1.5) for _ in range(spec.nodes)]
+        else:
+            weights = [1.0] * spec.nodes
+        self._cumulative_weights = list(itertools.accumulate(weights))
+
+    def relation_types(self) -> List[RelationType]:
+        relation_types = list()
+        type_count = self.spec.uni_relation_types + self.spec.bi_relation_types
+        for i in range(type_count):
+            relation_types.append(RelationType(
+                name=f'relation-{i}',
+                uni=i < self.spec.uni_relation_types,
+                probabilistic=self.random.random() < self.spec.probabilistic_share,
+            ))
+        return relation_types
+
+    def nodes(self) -> Iterator[Node]:
+        for i in range(self.spec.nodes):
+            yield Node(name=f'{self.random.choice(WORDS)}-{i}', description=f'synthetic node {i}')
+
+    def random_node_index(self) -> int:
+        return self.random.choices(range(self.spec.nodes), cum_weights=self._cumulative_weights)[0]
+
+    def relations(self, node_ids: List[ObjectId], relation_types: List[RelationType]) -> Iterator:
+        """
+        :param node_ids: The IDs of the stored nodes, in generation order.
+        :param relation_types: The stored relation types (with IDs).
+        """
+        for _ in range(self.spec.relations):
+            relation_type = self.random.choice(relation_types)
+            node_1 = self.random_node_index()
+            node_2 = self.random_node_index()
+            while node_2 == node_1:
+                node_2 = self.random.randrange(self.spec.nodes)
+            probability = round(self.random.uniform(0.05, 1.0), 3) if relation_type.probabilistic else 1
+            if relation_type.is_uni:
+                yield UniRelation(relation_type.id, node_ids[node_1], node_ids[node_2], probability)
+            else:
+                yield BiRelation(relation_type.id, node_ids[node_1], node_ids[node_2], probability)
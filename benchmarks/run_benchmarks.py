@@ -0,0 +1,202 @@
+#! /usr/bin/env python
+"""
+Times the core backend operations on a seeded synthetic graph and prints the results as JSON, e.g.
+
+    python benchmarks/run_benchmarks.py --db sqlite:// --nodes 10000 --output results.json
+    python benchmarks/run_benchmarks.py --db mongodb://localhost:27017/ --db-name kn_benchmark --compare results.json
+
+'sqlite://' runs against the embedded backend in process. 'mongomock://' runs the MongoBackend in process against
+mongomock (if it is installed), which exercises the MongoBackend code paths but not the performance of mongod.
+A MongoDB database is dropped before the graph is generated.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Dict, Callable, Optional
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from KnowledgeNetBackend import KnowledgeNetBackend, open_backend  # noqa: E402
+from NetElements.Nodes.Node import Node  # noqa: E402
+from NetElements.Relations.Relations import BiRelation, UniRelation  # noqa: E402
+from graph_generator import GraphSpec, GraphGenerator  # noqa: E402
+
+
+def open_benchmark_backend(uri: str, db_name: str, adjacency_storage: Optional[str] = None) -> KnowledgeNetBackend:
+    mongo_kwargs = {'db_name': db_name}
+    if adjacency_storage is not None:
+        from MongoBackend import AdjacencyStorage
+        mongo_kwargs['adjacency_storage'] = AdjacencyStorage[adjacency_storage.upper()]
+    if uri.startswith('mongomock://'):
+        import mongomock
+        import MongoBackend
+        backend = MongoBackend.MongoBackend('mongodb://localhost:27017/', **mongo_kwargs)
+        backend._client = mongomock.MongoClient()
+        backend._db = backend._client[db_name]
+        backend.ensure_indexes()
+        return backend
+    backend = open_backend(uri, **mongo_kwargs) if uri.startswith('mongodb') else open_backend(uri)
+    if uri.startswith('mongodb'):
+        backend.client.drop_database(db_name)
+        backend.ensure_indexes()
+    return backend
+
+
+def summarize(samples: List[float]) -> Dict:
+    samples = sorted(samples)
+    return {
+        'runs': len(samples),
+        'total_ms': sum(samples),
+        'mean_ms': statistics.mean(samples),
+        'median_ms': statistics.median(samples),
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'min_ms': samples[0],
+        'max_ms': samples[-1],
+    }
+
+
+def time_operation(operation: Callable[[int], object], runs: int) -> Dict:
+    """
+    :param operation: Called with the number of the run.
+    """
+    samples = list()
+    for run in range(runs):
+        start = time.perf_counter()
+        operation(run)
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(backend: KnowledgeNetBackend, spec: GraphSpec, runs: int) -> Dict[str, Dict]:
+    generator = GraphGenerator(spec)
+    results = dict()
+
+    relation_types = generator.relation_types()
+    for relation_type in relation_types:
+        relation_type.id = backend.add_rel_type(relation_type)
+    uni_types = [relation_type for relation_type in relation_types if relation_type.is_uni]
+    bi_types = [relation_type for relation_type in relation_types if not relation_type.is_uni]
+
+    # bulk load
+    nodes = list(generator.nodes())
+    start = time.perf_counter()
+    node_ids = backend.add_nodes(nodes)
+    results['add_nodes'] = summarize([(time.perf_counter() - start) * 1000])
+    results['add_nodes']['items'] = len(nodes)
+
+    relations = list(generator.relations(node_ids, relation_types))
+    start = time.perf_counter()
+    backend.add_relations(relations)
+    results['add_relations'] = summarize([(time.perf_counter() - start) * 1000])
+    results['add_relations']['items'] = len(relations)
+
+    # single writes
+    results['add_node'] = time_operation(
+        lambda run: node_ids.append(backend.add_node(Node(name=f'added-{run}'))), runs)
+
+    def add_relation(run):
+        relation_type = uni_types[run % len(uni_types)] if uni_types else bi_types[run % len(bi_types)]
+        node_1, node_2 = node_ids[generator.random_node_index()], node_ids[-1 - run]
+        if relation_type.is_uni:
+            backend.add_relation(UniRelation(relation_type.id, node_1, node_2))
+        else:
+            backend.add_relation(BiRelation(relation_type.id, node_1, node_2))
+    results['add_relation'] = time_operation(add_relation, runs)
+
+    # reads, on nodes picked with the degree distribution
+    sample_nodes = [generator.random_node_index() for _ in range(runs)]
+    results['get_relation_info_of_node'] = time_operation(
+        lambda run: backend.get_relation_info_of_node(node_ids[sample_nodes[run]]), runs)
+    if uni_types:
+        results['get_all_uni_connected_nodes'] = time_operation(
+            lambda run: backend.get_all_uni_connected_nodes(node_ids[sample_nodes[run]],
+                                                            uni_types[run % len(uni_types)].id), runs)
+    if bi_types:
+        results['get_all_bi_connected_nodes'] = time_operation(
+            lambda run: backend.get_all_bi_connected_nodes(node_ids[sample_nodes[run]],
+                                                           bi_types[run % len(bi_types)].id), runs)
+    results['get_relations_between'] = time_operation(
+        lambda run: backend.get_relations_between(relations[run % len(relations)].node_1,
+                                                  relations[run % len(relations)].node_2), runs)
+    pairs = [(relation.node_1, relation.node_2) for relation in relations[:1000]]
+    results['get_relations_between_many'] = time_operation(
+        lambda run: backend.get_relations_between_many(pairs), max(1, runs // 10))
+    results['get_relations_between_many']['items'] = len(pairs)
+    results['list_nodes_by_name'] = time_operation(
+        lambda run: backend.list_nodes_by_name(nodes[sample_nodes[run]].name), runs)
+    results['list_nodes_by_name_sloppy'] = time_operation(
+        lambda run: backend.list_nodes_by_name(nodes[sample_nodes[run]].name.split('-')[1], sloppy=True), runs)
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict]) -> Dict[str, float]:
+    """
+    :return: {operation: median of the results / median of the baseline}
+    """
+    return {operation: result['median_ms'] / baseline[operation]['median_ms']
+            for operation, result in results.items()
+            if operation in baseline and baseline[operation]['median_ms'] > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the core KnowledgeNet backend operations')
+    parser.add_argument('--db', default='sqlite://', help='backend URI, or mongomock:// for an in-process MongoDB')
+    parser.add_argument('--db-name', default='knowledgenet_benchmark', help='database name (dropped first!)')
+    parser.add_argument('--nodes', type=int, default=10000)
+    parser.add_argument('--mean-degree', type=float, default=4.0)
+    parser.add_argument('--degree-distribution', choices=['uniform', 'powerlaw'], default='powerlaw')
+    parser.add_argument('--uni-types', type=int, default=4)
+    parser.add_argument('--bi-types', type=int, default=2)
+    parser.add_argument('--probabilistic-share', type=float, default=0.25)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--adjacency-storage', choices=['embedded', 'derived'], default=None,
+                        help='adjacency storage mode of the MongoDB backend')
+    parser.add_argument('--runs', type=int, default=50, help='samples per read and single write operation')
+    parser.add_argument('--output', default=None, help='write the JSON results to this file')
+    parser.add_argument('--compare', default=None, help='JSON results of an earlier run to compare against')
+    args = parser.parse_args()
+
+    spec = GraphSpec(nodes=args.nodes, mean_degree=args.mean_degree, degree_distribution=args.degree_distribution,
+                     uni_relation_types=args.uni_types, bi_relation_types=args.bi_types,
+                     probabilistic_share=args.probabilistic_share, seed=args.seed)
+    backend = open_benchmark_backend(args.db, args.db_name, args.adjacency_storage)
+    report = {
+        'meta': {
+            'db': args.db,
+            'adjacency_storage': args.adjacency_storage,
+            'spec': spec.to_dict(),
+            'runs': args.runs,
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'results': run(backend, spec, args.runs),
+    }
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            report['median_ratio_to_baseline'] = compare(report['results'], json.load(baseline_file)['results'])
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
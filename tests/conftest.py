@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pytest
+
+# the modules live in the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SQLiteBackend import SQLiteBackend  # noqa: E402
+
+
+@pytest.fixture
+def sqlite_backend():
+    backend = SQLiteBackend(':memory:')
+    yield backend
+    backend.connection.close()
+
+
+@pytest.fixture
+def mongo_backend(monkeypatch):
+    """
+    A MongoBackend on an in-memory mongomock database. Server-only aggregation stages are not available.
+    """
+    mongomock = pytest.importorskip('mongomock')
+    import pymongo
+    from MongoBackend import MongoBackend
+    # backends opened by the test share the database like on a server
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(pymongo, 'MongoClient', lambda *args, **kwargs: client)
+    return MongoBackend('mongodb://localhost', db_name='knowledgenet_test')
+
+
+@pytest.fixture(params=['sqlite', 'mongo'])
+def backend(request):
+    return request.getfixturevalue(f'{request.param}_backend')
+
+
+@pytest.fixture
+def mongo_server_backend():
+    """
+    A MongoBackend on a real server, for aggregation stages mongomock lacks. Set KNOWLEDGENET_TEST_MONGODB_URI to
+    run these tests, the database knowledgenet_test is dropped before and after every test.
+    """
+    uri = os.environ.get('KNOWLEDGENET_TEST_MONGODB_URI')
+    if not uri:
+        pytest.skip('KNOWLEDGENET_TEST_MONGODB_URI is not set')
+    from MongoBackend import MongoBackend
+    backend = MongoBackend(uri, db_name='knowledgenet_test', ensure_indexes=False)
+    backend.client.drop_database(backend.db_name)
+    backend.ensure_indexes()
+    yield backend
+    backend.client.drop_database(backend.db_name)
+    backend.client.close()
@@ -0,0 +1,79 @@
+import random
+
+import pytest
+from bson import ObjectId
+
+import AdjacencyIndex
+from NetElements.Relations.Relations import BiRelation, UniRelation
+
+
+def _reachable(edges, start, directed, outgoing=True):
+    reached = {start}
+    frontier = [start]
+    while frontier:
+        node = frontier.pop()
+        for source, target in edges:
+            for node_from, node_to in ([(source, target)] if directed else [(source, target), (target, source)]):
+                if not outgoing:
+                    node_from, node_to = node_to, node_from
+                if node_from == node and node_to not in reached:
+                    reached.add(node_to)
+                    frontier.append(node_to)
+    return reached
+
+
+@pytest.mark.parametrize('delta_min_size', [0, 5, 1000])
+def test_matches_a_search_over_all_edges(monkeypatch, delta_min_size):
+    monkeypatch.setattr(AdjacencyIndex, 'DELTA_MIN_SIZE', delta_min_size)
+    rng = random.Random(delta_min_size)
+    uni_type, bi_type = ObjectId(), ObjectId()
+    node_ids = [ObjectId() for _ in range(40)]
+    index = AdjacencyIndex.AdjacencyIndex()
+    edges = {uni_type: dict(), bi_type: dict()}
+    for step in range(300):
+        relation_type = rng.choice((uni_type, bi_type))
+        node_1_id, node_2_id = rng.choice(node_ids), rng.choice(node_ids)
+        relation_id = ObjectId()
+        relation_class = UniRelation if relation_type == uni_type else BiRelation
+        index.add_relation(relation_class(relation_type, node_1_id, node_2_id), relation_id)
+        edges[relation_type][relation_id] = (node_1_id, node_2_id)
+        if step % 50 == 49:
+            removed = rng.sample(node_ids, 2)
+            index.remove_nodes(removed)
+            for type_edges in edges.values():
+                for edge_id, edge in list(type_edges.items()):
+                    if set(edge) & set(removed):
+                        del type_edges[edge_id]
+        if step % 7 == 0:
+            start = rng.choice(node_ids)
+            uni_edges = list(edges[uni_type].values())
+            assert set(index.connected_nodes(start, uni_type)) == _reachable(uni_edges, start, True)
+            assert set(index.connected_nodes(start, uni_type, inverse_direction=True)) == \
+                _reachable(uni_edges, start, True, outgoing=False)
+            assert set(index.connected_nodes(start, bi_type)) == \
+                _reachable(list(edges[bi_type].values()), start, False)
+
+
+def test_writes_only_rebuild_the_changed_type(monkeypatch):
+    builds = list()
+    build = AdjacencyIndex._TypeAdjacency._build
+
+    def counting_build(type_adjacency, node_count):
+        builds.append(type_adjacency)
+        build(type_adjacency, node_count)
+    monkeypatch.setattr(AdjacencyIndex._TypeAdjacency, '_build', counting_build)
+    uni_type, other_type = ObjectId(), ObjectId()
+    node_ids = [ObjectId() for _ in range(4)]
+    index = AdjacencyIndex.AdjacencyIndex()
+    index.add_relation(UniRelation(uni_type, node_ids[0], node_ids[1]), ObjectId())
+    index.add_relation(UniRelation(other_type, node_ids[1], node_ids[2]), ObjectId())
+    index.connected_nodes(node_ids[0], uni_type)
+    index.connected_nodes(node_ids[1], other_type)
+    assert len(builds) == 2
+
+    # new nodes and relations of the other type, then a traversal of both types
+    index.add_relation(UniRelation(other_type, node_ids[2], node_ids[3]), ObjectId())
+    index.add_relation(UniRelation(uni_type, node_ids[1], node_ids[3]), ObjectId())
+    assert set(index.connected_nodes(node_ids[0], uni_type)) == {node_ids[0], node_ids[1], node_ids[3]}
+    assert set(index.connected_nodes(node_ids[1], other_type)) == {node_ids[1], node_ids[2], node_ids[3]}
+    assert len(builds) == 2
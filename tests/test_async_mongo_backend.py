@@ -0,0 +1,296 @@
+import asyncio
+from itertools import islice
+
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+import AsyncMongoBackend  # noqa: E402
+from bson import ObjectId  # noqa: E402
+from MongoBackend import AdjacencyStorage, MongoBackend, INDEXES_FINGERPRINT  # noqa: E402
+from NetElements.Nodes.Node import Node  # noqa: E402
+from NetElements.Relations.Relations import BiRelation, RelationType, UniRelation  # noqa: E402
+
+
+class AsyncCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, *args, **kwargs):
+        self._cursor = self._cursor.limit(*args, **kwargs)
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(iter(self._cursor))
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length=None):
+        return list(self._cursor if length is None else islice(self._cursor, length))
+
+
+class AsyncCollection:
+    """
+    The subset of the pymongo AsyncCollection API the backend uses, on top of a mongomock collection.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.name = collection.name
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self._collection.find(*args, **kwargs))
+
+    async def aggregate(self, *args, **kwargs):
+        return AsyncCursor(self._collection.aggregate(*args, **kwargs))
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class AsyncClient:
+    def __init__(self, client):
+        self._client = client
+
+    def __getitem__(self, db_name):
+        database = self._client[db_name]
+        return type('AsyncDatabase', (), {'__getitem__': lambda _, name: AsyncCollection(database[name])})()
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    """
+    An AsyncMongoBackend and a MongoBackend on the same mongomock database.
+    """
+    import pymongo
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(pymongo, 'MongoClient', lambda *args, **kwargs: client)
+    monkeypatch.setattr(AsyncMongoBackend, 'AsyncMongoClient', lambda *args, **kwargs: AsyncClient(client))
+    return (AsyncMongoBackend.AsyncMongoBackend('mongodb://localhost', db_name='knowledgenet_test'),
+            MongoBackend('mongodb://localhost', db_name='knowledgenet_test'))
+
+
+def test_requires_the_asyncio_api(monkeypatch):
+    monkeypatch.setattr(AsyncMongoBackend, 'AsyncMongoClient', None)
+    with pytest.raises(ImportError):
+        AsyncMongoBackend.AsyncMongoBackend('mongodb://localhost')
+
+
+def test_relation_info_matches_the_sync_backend(backends):
+    async_backend, backend = backends
+
+    async def fill():
+        node_ids = await async_backend.add_nodes([Node(name=name) for name in 'abc'])
+        is_a = await async_backend.add_rel_type(RelationType('is a', True, probabilistic=True))
+        knows = await async_backend.add_rel_type(RelationType('knows', False))
+        await async_backend.add_relation(UniRelation(is_a, node_ids[0], node_ids[1], 0.5))
+        inserted_ids, failures = await async_backend.add_relations([UniRelation(is_a, node_ids[2], node_ids[0]),
+                                                                    BiRelation(knows, node_ids[0], node_ids[2])])
+        assert len(inserted_ids) == 2 and failures == []
+        return node_ids, await async_backend.get_relation_info_of_nodes(node_ids)
+    node_ids, relation_infos = asyncio.run(fill())
+
+    for node_id, relation_info in zip(node_ids, relation_infos):
+        expected = backend.get_relation_info_of_node(node_id)
+        for key, neighbour_key in (('in_relations', 'from'), ('out_relations', 'to'), ('bi_relations', 'with')):
+            assert [(info['id'], info['prob'], info['type'].id, info[neighbour_key].id)
+                    for info in relation_info[key]] == \
+                   [(info['id'], info['prob'], info['type'].id, info[neighbour_key].id) for info in expected[key]]
+    assert len(relation_infos[0]['in_relations']) == 1 and len(relation_infos[0]['bi_relations']) == 1
+
+
+def test_delete_nodes_removes_back_references(backends):
+    async_backend, backend = backends
+
+    async def fill_and_delete():
+        node_ids = await async_backend.add_nodes([Node(name=name) for name in 'abcd'])
+        is_a = await async_backend.add_rel_type(RelationType('is a', True))
+        knows = await async_backend.add_rel_type(RelationType('knows', False))
+        await async_backend.add_relations([UniRelation(is_a, node_ids[0], node_ids[1]),
+                                           UniRelation(is_a, node_ids[1], node_ids[2]),
+                                           UniRelation(is_a, node_ids[2], node_ids[3]),
+                                           BiRelation(knows, node_ids[1], node_ids[3])])
+        await async_backend.delete_nodes(node_ids[1:3], batch_size=1)
+        return node_ids, is_a, knows
+    node_ids, is_a, knows = asyncio.run(fill_and_delete())
+
+    assert sorted(backend.get_all_node_names()) == ['a', 'd']
+    for node_id in (node_ids[0], node_ids[3]):
+        relation_ids = backend.get_relation_ids_of_node(node_id)
+        assert relation_ids['in_relations'] == relation_ids['out_relations'] == relation_ids['bi_relations'] == []
+    assert backend.uni_rel_coll.count_documents({}) == backend.bi_rel_coll.count_documents({}) == 0
+    assert backend.get_uni_relationtype_usage_number(is_a) == backend.get_bi_relationtype_usage_number(knows) == 0
+
+
+def test_closure_is_maintained(backends):
+    async_backend, backend = backends
+
+    async def fill():
+        node_ids = await async_backend.add_nodes([Node(name=name) for name in 'abcde'])
+        part_of = await async_backend.add_rel_type(RelationType('part of', True, transitive=True))
+        near = await async_backend.add_rel_type(RelationType('near', False, transitive=True))
+        await async_backend.add_relation(UniRelation(part_of, node_ids[0], node_ids[1]))
+        await async_backend.add_relations([UniRelation(part_of, node_ids[1], node_ids[2]),
+                                           UniRelation(part_of, node_ids[3], node_ids[1]),
+                                           UniRelation(part_of, node_ids[3], node_ids[0]),
+                                           BiRelation(near, node_ids[0], node_ids[4]),
+                                           BiRelation(near, node_ids[4], node_ids[3])])
+        return node_ids, part_of, near
+    node_ids, part_of, near = asyncio.run(fill())
+    a, b, c, d, e = node_ids
+    assert backend.is_reachable(a, c, part_of) and backend.is_reachable(d, c, part_of)
+    assert not backend.is_reachable(c, a, part_of)
+    assert backend.is_reachable(a, d, near) and backend.is_reachable(d, a, near)
+
+    asyncio.run(async_backend.delete_node(b))
+    assert not backend.is_reachable(a, c, part_of) and not backend.is_reachable(d, c, part_of)
+    assert backend.is_reachable(d, a, part_of)
+    asyncio.run(async_backend.delete_node(e))
+    assert not backend.is_reachable(a, d, near)
+    # the closure matches a rebuild from the remaining relations
+    pairs = sorted((pair['type'], pair['node_from'], pair['node_to']) for pair in backend.closure_coll.find())
+    assert pairs == [(part_of, d, a)]
+    backend.rebuild_transitive_closure()
+    assert pairs == sorted((pair['type'], pair['node_from'], pair['node_to']) for pair in backend.closure_coll.find())
+
+
+@pytest.mark.parametrize('adjacency_storage', list(AdjacencyStorage))
+def test_adjacency_storage(backends, adjacency_storage):
+    async_backend, backend = backends
+    backend = MongoBackend(backend.db_path, db_name=backend.db_name, adjacency_storage=adjacency_storage)
+    assert backend.adjacency_storage == adjacency_storage
+
+    async def fill():
+        assert await async_backend.adjacency_storage() == adjacency_storage
+        node_ids = await async_backend.add_nodes([Node(name=name) for name in 'abc'])
+        is_a = await async_backend.add_rel_type(RelationType('is a', True))
+        knows = await async_backend.add_rel_type(RelationType('knows', False))
+        relation_id = await async_backend.add_relation(UniRelation(is_a, node_ids[0], node_ids[1]))
+        relation_ids, _ = await async_backend.add_relations([BiRelation(knows, node_ids[0], node_ids[2]),
+                                                             UniRelation(is_a, node_ids[2], node_ids[0])])
+        relations = await async_backend.get_relation_objects_of_node(node_ids[0])
+        node = await async_backend.get_node(node_ids[0])
+        await async_backend.delete_node(node_ids[1])
+        return node_ids, [relation_id] + relation_ids, relations, node
+    node_ids, relation_ids, relations, node = asyncio.run(fill())
+
+    assert [relation.id for relation in relations['out_relations']] == [relation_ids[0]]
+    assert [relation.id for relation in relations['bi_relations']] == [relation_ids[1]]
+    assert [relation.id for relation in relations['in_relations']] == [relation_ids[2]]
+    assert (node.out_relations, node.bi_relations, node.in_relations) == ([relation_ids[0]], [relation_ids[1]],
+                                                                          [relation_ids[2]])
+    node_dict = backend.node_coll.find_one({'_id': node_ids[0]})
+    if adjacency_storage == AdjacencyStorage.DERIVED:
+        assert 'out_relations' not in node_dict
+    else:
+        assert node_dict['out_relations'] == [] and node_dict['bi_relations'] == [relation_ids[1]]
+    assert backend.get_relation_ids_of_node(node_ids[0])['out_relations'] == []
+
+
+def test_add_rel_type_keeps_the_id(backends):
+    async_backend, backend = backends
+    rel_type = RelationType('is a', True)
+    rel_type.id = ObjectId()
+    assert asyncio.run(async_backend.add_rel_type(rel_type)) == rel_type.id
+    assert backend.get_relation_type(rel_type.id, True).name == 'is a'
+
+
+def test_ensure_indexes_backfills(backends):
+    async_backend, backend = backends
+    node_id = backend.node_coll.insert_one({'name': 'Mount Everest'}).inserted_id
+    backend.settings_coll.delete_one({'_id': 'name_search'})
+    backend.settings_coll.delete_one({'_id': 'indexes'})
+
+    async def search():
+        found_before = await async_backend.list_nodes_by_name('everest', sloppy=True)
+        await async_backend.ensure_indexes()
+        return found_before, await async_backend.search_nodes('mount everest')
+    found_before, results = asyncio.run(search())
+    assert [node.id for node in found_before] == [node_id]
+    assert [node.id for node, _ in results] == [node_id]
+    assert backend.node_coll.find_one({'_id': node_id})['name_normalized'] == 'mount everest'
+    assert backend.settings_coll.find_one({'_id': 'indexes'})['value'] == INDEXES_FINGERPRINT
+
+
+def test_queries_match_the_sync_backend(backends):
+    async_backend, backend = backends
+    node_ids = backend.add_nodes([Node(name=name) for name in ('Alpha', 'Alpine', 'Beta', 'Gamma')])
+    is_a = backend.add_rel_type(RelationType('is a', True))
+    knows = backend.add_rel_type(RelationType('knows', False))
+    backend.add_relations([UniRelation(is_a, node_ids[0], node_ids[1]), UniRelation(is_a, node_ids[1], node_ids[2]),
+                           BiRelation(knows, node_ids[2], node_ids[3])])
+    pairs = [(node_ids[0], node_ids[1]), (node_ids[3], node_ids[2]), (node_ids[0], node_ids[3])]
+
+    async def query():
+        return await asyncio.gather(
+            async_backend.search_nodes('alp', prefix=True),
+            async_backend.search_nodes('alpah'),
+            async_backend.get_relations_between_many(pairs, batch_size=2),
+            async_backend.shortest_path(node_ids[0], node_ids[3]),
+            async_backend.shortest_path(node_ids[3], node_ids[0], directed=True),
+        )
+    prefix_results, fuzzy_results, between, path, directed_path = asyncio.run(query())
+    assert len(prefix_results) == 2 and fuzzy_results
+
+    for results, expected in ((prefix_results, backend.search_nodes('alp', prefix=True)),
+                              (fuzzy_results, backend.search_nodes('alpah'))):
+        assert [(node.id, score) for node, score in results] == [(node.id, score) for node, score in expected]
+
+    def relation_ids(results):
+        return {pair: tuple([(rel_type.id, relation.id) for rel_type, relation in typed_relations]
+                            for typed_relations in pair_relations) for pair, pair_relations in results.items()}
+    assert relation_ids(between) == relation_ids(backend.get_relations_between_many(pairs))
+    assert path[0] == backend.shortest_path(node_ids[0], node_ids[3])[0] == node_ids
+    assert directed_path is backend.shortest_path(node_ids[3], node_ids[0], directed=True) is None
+
+
+def test_iter_nodes(backends):
+    async_backend, backend = backends
+    backend.add_nodes([Node(name=name) for name in ('Alpha', 'Alpine', 'Beta')])
+
+    async def iterate(**kwargs):
+        return [node_dict async for node_dict in async_backend.iter_nodes(**kwargs)]
+    for kwargs in ({}, {'name_prefix': 'Alp'}, {'limit': 2, 'batch_size': 1}):
+        assert asyncio.run(iterate(**kwargs)) == list(backend.iter_nodes(**kwargs))
+
+
+def test_real_client(mongo_server_backend):
+    if AsyncMongoBackend.AsyncMongoClient is None:
+        pytest.skip('the asyncio API of pymongo needs pymongo 4.10 or newer')
+    backend = mongo_server_backend
+
+    async def fill_and_query():
+        async_backend = AsyncMongoBackend.AsyncMongoBackend(backend.db_path, db_name=backend.db_name)
+        try:
+            await async_backend.ensure_indexes()
+            node_ids = await async_backend.add_nodes([Node(name=name) for name in ('Alpha', 'Alpine', 'Beta')])
+            is_a = await async_backend.add_rel_type(RelationType('is a', True, transitive=True))
+            await async_backend.add_relations([UniRelation(is_a, node_ids[0], node_ids[1]),
+                                               UniRelation(is_a, node_ids[1], node_ids[2])])
+            results = await async_backend.search_nodes('alp', prefix=True)
+            path = await async_backend.shortest_path(node_ids[0], node_ids[2], directed=True)
+            await async_backend.delete_node(node_ids[1])
+            return node_ids, is_a, results, path
+        finally:
+            await async_backend.close()
+    node_ids, is_a, results, path = asyncio.run(fill_and_query())
+
+    assert [node.id for node, _ in results] == [node.id for node, _ in backend.search_nodes('alp', prefix=True)]
+    assert path[0] == node_ids
+    assert not backend.is_reachable(node_ids[0], node_ids[2], is_a)
+    assert backend.get_relation_ids_of_node(node_ids[0])['out_relations'] == []
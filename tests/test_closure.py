@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from NetElements.Nodes.Node import Node
+from NetElements.Relations.Relations import BiRelation, RelationType, UniRelation
+
+
+def _closure_pairs(backend, relation_type_id, node_ids):
+    return {(node_from_id, node_to_id) for node_from_id in node_ids
+            for node_to_id in backend._closure_neighbours(relation_type_id, [node_from_id], targets=True)}
+
+
+def _expected_pairs(relations, relation_type_id, uni):
+    adjacency = dict()
+    for relation in relations:
+        if relation.type == relation_type_id:
+            adjacency.setdefault(relation.node_1, set()).add(relation.node_2)
+            if not uni:
+                adjacency.setdefault(relation.node_2, set()).add(relation.node_1)
+    pairs = set()
+    for source in adjacency:
+        reached = set()
+        frontier = set(adjacency[source])
+        while frontier:
+            reached |= frontier
+            frontier = {neighbour for node in frontier for neighbour in adjacency.get(node, ())} - reached
+        pairs.update((source, target) for target in reached)
+    return pairs
+
+
+def test_closure_follows_adds_and_deletes(backend):
+    rng = random.Random(11)
+    part_of = backend.add_rel_type(RelationType('part of', True, transitive=True))
+    near = backend.add_rel_type(RelationType('near', False, transitive=True))
+    node_ids = backend.add_nodes([Node(name=f'node {i}') for i in range(20)])
+    for round_number in range(4):
+        new_relations = list()
+        for _ in range(10):
+            node_1_id, node_2_id = rng.sample(node_ids, 2)
+            new_relations.append(UniRelation(part_of, node_1_id, node_2_id) if rng.random() < 0.6 else
+                                 BiRelation(near, node_1_id, node_2_id))
+        backend.add_relation(new_relations[0])
+        backend.add_relations(new_relations[1:])
+        deleted = rng.sample(node_ids, 2)
+        backend.delete_nodes(deleted)
+        node_ids = [node_id for node_id in node_ids if node_id not in deleted]
+
+        relations = list(backend.iter_relations(True)) + list(backend.iter_relations(False))
+        for relation_type_id, uni in ((part_of, True), (near, False)):
+            assert _closure_pairs(backend, relation_type_id, node_ids + deleted) == \
+                _expected_pairs(relations, relation_type_id, uni)
+        for _ in range(20):
+            node_from_id, node_to_id = rng.sample(node_ids, 2)
+            assert backend.is_reachable(node_from_id, node_to_id, part_of) == \
+                (backend.shortest_path(node_from_id, node_to_id, [part_of], directed=True) is not None)
+
+
+def test_rebuild_matches_the_maintained_closure(backend):
+    part_of = backend.add_rel_type(RelationType('part of', True, transitive=True))
+    node_ids = backend.add_nodes([Node(name=name) for name in 'abcd'])
+    backend.add_relations([UniRelation(part_of, node_ids[i], node_ids[j]) for i, j in ((0, 1), (1, 2), (2, 0), (2, 3))])
+    maintained = _closure_pairs(backend, part_of, node_ids)
+    backend.rebuild_transitive_closure(part_of)
+    assert _closure_pairs(backend, part_of, node_ids) == maintained
+    # the nodes of the cycle reach themselves
+    assert (node_ids[0], node_ids[0]) in maintained and (node_ids[3], node_ids[3]) not in maintained
+
+
+def test_closure_follows_deletes_in_transactions(mongo_server_backend):
+    if 'setName' not in mongo_server_backend.client.admin.command('hello'):
+        pytest.skip('transactions require a replica set')
+    part_of = mongo_server_backend.add_rel_type(RelationType('part of', True, transitive=True))
+    node_ids = mongo_server_backend.add_nodes([Node(name=name) for name in 'abcd'])
+    mongo_server_backend.add_relations([UniRelation(part_of, node_ids[i], node_ids[i + 1]) for i in range(3)])
+    mongo_server_backend.delete_nodes([node_ids[1]], use_transaction=True)
+    assert not mongo_server_backend.is_reachable(node_ids[0], node_ids[2], part_of)
+    assert mongo_server_backend.is_reachable(node_ids[2], node_ids[3], part_of)
+    assert _closure_pairs(mongo_server_backend, part_of, node_ids) == {(node_ids[2], node_ids[3])}
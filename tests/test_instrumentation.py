@@ -0,0 +1,39 @@
+from QueryInstrumentation import QueryProfiler, UNATTRIBUTED, current_operation, instrument_methods
+
+
+@instrument_methods
+class Instrumented:
+    def __init__(self):
+        self.profiler = QueryProfiler()
+
+    def lookup(self):
+        return current_operation()
+
+    def iterate(self, count):
+        for _ in range(count):
+            yield current_operation(), self.lookup()
+
+
+def test_methods_set_the_operation():
+    instrumented = Instrumented()
+    assert instrumented.lookup() == 'lookup'
+    assert current_operation() == UNATTRIBUTED
+
+
+def test_generators_set_the_operation_only_while_running():
+    instrumented = Instrumented()
+    generator = instrumented.iterate(3)
+    assert next(generator) == ('iterate', 'iterate')
+    # paused at the yield, calls of the consumer are attributed to themselves
+    assert current_operation() == UNATTRIBUTED
+    assert instrumented.lookup() == 'lookup'
+    assert list(generator) == [('iterate', 'iterate')] * 2
+    assert instrumented.profiler.stats()['iterate']['calls'] == 1
+    assert instrumented.profiler.stats()['lookup']['calls'] == 1
+
+
+def test_closing_a_generator_resets_the_operation():
+    generator = Instrumented().iterate(3)
+    next(generator)
+    generator.close()
+    assert current_operation() == UNATTRIBUTED
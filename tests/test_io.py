@@ -0,0 +1,95 @@
+import io
+import json
+
+from bson import ObjectId
+
+import KnowledgeNetIO
+from NetElements.Nodes.Node import Node
+from NetElements.Relations.Relations import BiRelation, RelationType, UniRelation
+from SQLiteBackend import SQLiteBackend
+
+
+def _jsonl(*records) -> io.StringIO:
+    return io.StringIO(''.join(json.dumps(record) + '\n' if isinstance(record, dict) else record + '\n'
+                               for record in records))
+
+
+def _fill(backend):
+    node_ids = backend.add_nodes([Node(name=f'node {i}', description='with, "quotes"') for i in range(10)])
+    is_a = backend.add_rel_type(RelationType('is a', True, probabilistic=True, transitive=True, values={'a': 1}))
+    knows = backend.add_rel_type(RelationType('knows', False))
+    backend.add_relations([UniRelation(is_a, node_ids[i], node_ids[i + 1], 0.5) for i in range(9)] +
+                          [BiRelation(knows, node_ids[i], node_ids[i + 2]) for i in range(8)])
+    return node_ids, is_a, knows
+
+
+def test_round_trip(backend):
+    node_ids, is_a, knows = _fill(backend)
+    for file_format in KnowledgeNetIO.FORMATS:
+        output = io.StringIO()
+        assert KnowledgeNetIO.export_net(backend, output, file_format) == 2 + 10 + 17
+        target = SQLiteBackend(':memory:')
+        importer = KnowledgeNetIO.import_net(target, io.StringIO(output.getvalue()), file_format, batch_size=4)
+        assert importer.failures == []
+        assert importer.counts == {'relation_type': 2, 'node': 10, 'relation': 17}
+        assert sorted(target.get_all_node_names()) == sorted(backend.get_all_node_names())
+        assert target.get_node(node_ids[3]).description == 'with, "quotes"'
+        relation_type = target.get_relation_type(is_a)
+        assert relation_type.transitive and relation_type.probabilistic and relation_type.values == {'a': 1}
+        assert target.get_relation_type(knows).is_uni is False
+        uni_relations, bi_relations = target.get_relations_between(node_ids[0], node_ids[1])
+        assert [relation.probability for relation in uni_relations] == [0.5] and bi_relations == []
+
+
+def test_malformed_lines_are_failures(backend):
+    importer = KnowledgeNetIO.import_net(backend, _jsonl(
+        {'kind': 'relation_type', 'name': 'likes', 'uni': False},
+        {'kind': 'node', 'name': 'a'},
+        '{"kind": "node", "name": ',
+        '[1, 2]',
+        {'kind': 'node', 'name': 'b'},
+        {'kind': 'unknown'},
+        {'kind': 'relation', 'type': 'likes', 'uni': False, 'from': 'a', 'to': 'b'},
+        {'kind': 'relation', 'type': 'missing', 'from': 'a', 'to': 'b'},
+    ))
+    assert [line_number for line_number, _ in importer.failures] == [3, 4, 6, 8]
+    assert importer.failures[0][1].startswith('JSONDecodeError')
+    assert importer.counts == {'relation_type': 1, 'node': 2, 'relation': 1}
+    assert sorted(backend.get_all_node_names()) == ['a', 'b']
+
+
+def test_buffered_records_are_written_if_reading_fails(backend):
+    def records():
+        yield 1, {'kind': 'node', 'name': 'a'}
+        raise OSError('connection lost')
+
+    importer = KnowledgeNetIO.NetImporter(backend)
+    try:
+        importer.import_records(records())
+    except OSError:
+        pass
+    assert backend.get_all_node_names() == ['a']
+
+
+def test_existing_node_ids_are_failures(backend):
+    node_id = backend.add_node(Node(name='existing'))
+    new_id = ObjectId()
+    importer = KnowledgeNetIO.import_net(backend, _jsonl(
+        {'kind': 'node', 'id': str(node_id), 'name': 'existing'},
+        {'kind': 'node', 'id': str(new_id), 'name': 'new'},
+        {'kind': 'node', 'id': str(new_id), 'name': 'duplicate'},
+    ))
+    assert [line_number for line_number, _ in importer.failures] == [1, 3]
+    assert importer.counts['node'] == 1
+    assert sorted(backend.get_all_node_names()) == ['existing', 'new']
+
+
+def test_relations_to_buffered_nodes(backend):
+    backend.add_rel_type(RelationType('likes', True))
+    importer = KnowledgeNetIO.import_net(backend, _jsonl(
+        {'kind': 'node', 'name': 'a'},
+        {'kind': 'node', 'name': 'b'},
+        {'kind': 'relation', 'type': 'likes', 'from': 'a', 'to': 'b'},
+    ), batch_size=100)
+    assert importer.failures == []
+    assert importer.counts == {'relation_type': 0, 'node': 2, 'relation': 1}
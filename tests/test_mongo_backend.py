@@ -0,0 +1,162 @@
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+import pymongo  # noqa: E402
+from bson import ObjectId  # noqa: E402
+
+import MongoBackend  # noqa: E402
+from NetElements.Nodes.Node import Node  # noqa: E402
+from NetElements.Relations.Relations import Relation, RelationType  # noqa: E402
+
+
+@pytest.fixture
+def create_index_calls(monkeypatch):
+    calls = list()
+    create_indexes = mongomock.collection.Collection.create_indexes
+
+    def counting_create_indexes(collection, *args, **kwargs):
+        calls.append(collection.name)
+        return create_indexes(collection, *args, **kwargs)
+    monkeypatch.setattr(mongomock.collection.Collection, 'create_indexes', counting_create_indexes)
+    return calls
+
+
+def _open(backend):
+    other = MongoBackend.MongoBackend(backend.db_path, db_name=backend.db_name)
+    other.node_coll.find_one()
+    return other
+
+
+def test_indexes_are_created_on_the_first_connect_only(mongo_backend, create_index_calls):
+    mongo_backend.node_coll.find_one()
+    assert sorted(create_index_calls) == sorted(MongoBackend.INDEXES)
+    create_index_calls.clear()
+    _open(mongo_backend)
+    assert create_index_calls == []
+
+
+def test_changed_indexes_are_created_on_connect(mongo_backend, create_index_calls, monkeypatch):
+    mongo_backend.node_coll.find_one()
+    create_index_calls.clear()
+    monkeypatch.setattr(MongoBackend, 'INDEXES_FINGERPRINT', 'changed')
+    _open(mongo_backend)
+    assert sorted(create_index_calls) == sorted(MongoBackend.INDEXES)
+
+
+def test_connecting_to_an_older_database_does_not_backfill(mongo_backend):
+    # written without a backend, like a database from before the indexes were declared
+    db = pymongo.MongoClient()[mongo_backend.db_name]
+    node_ids = db['nodes'].insert_many([{'name': name, 'description': '', 'in_relations': [], 'out_relations': [],
+                                         'bi_relations': []} for name in 'ab']).inserted_ids
+    db['bi_relations'].insert_one({'type': ObjectId(), 'node_1': node_ids[0], 'node_2': node_ids[1]})
+    assert mongo_backend.get_node(node_ids[0]).name == 'a'
+    assert db['settings'].find_one({'_id': 'indexes'})['value'] == MongoBackend.INDEXES_FINGERPRINT
+    assert 'endpoints' not in db['bi_relations'].find_one()
+    assert db['nodes'].count_documents({'name_normalized': {'$exists': True}}) == 0
+    assert not mongo_backend.relation_endpoints and not mongo_backend.name_search_fields
+
+
+def test_new_databases_need_no_backfill(mongo_backend):
+    mongo_backend.add_node(Node(name='a'))
+    assert mongo_backend.relation_endpoints and mongo_backend.name_search_fields
+
+
+def _chain(backend, uni):
+    relation_type_id = backend.add_rel_type(RelationType('next', uni))
+    node_ids = backend.add_nodes([Node(name=f'node {i}') for i in range(5)])
+    backend.add_relations([Relation.create_relation(uni, relation_type_id, node_ids[i], node_ids[i + 1])
+                           for i in range(3)])
+    return relation_type_id, node_ids
+
+
+def test_backfill_is_recorded(mongo_backend):
+    mongo_backend.settings_coll.delete_one({'_id': 'relation_endpoints'})
+    assert not MongoBackend.MongoBackend(mongo_backend.db_path, db_name=mongo_backend.db_name).relation_endpoints
+    mongo_backend.ensure_indexes()
+    assert MongoBackend.MongoBackend(mongo_backend.db_path, db_name=mongo_backend.db_name).relation_endpoints
+
+
+def test_backfill_relation_endpoints(mongo_server_backend):
+    # mongomock does not evaluate update pipelines
+    relation_type_id, node_ids = _chain(mongo_server_backend, uni=True)
+    mongo_server_backend.uni_rel_coll.update_many({}, {'$unset': {'endpoints': ''}})
+    mongo_server_backend.backfill_relation_endpoints()
+    assert all(relation['endpoints'] == [relation['node_from'], relation['node_to']]
+               for relation in mongo_server_backend.uni_rel_coll.find())
+
+
+def test_undirected_lookup_without_endpoints_runs_client_side(mongo_backend):
+    relation_type_id, node_ids = _chain(mongo_backend, uni=False)
+    # a database from before the endpoints field
+    mongo_backend.bi_rel_coll.update_many({}, {'$unset': {'endpoints': ''}})
+    mongo_backend.settings_coll.delete_one({'_id': 'relation_endpoints'})
+    old_backend = MongoBackend.MongoBackend(mongo_backend.db_path, db_name=mongo_backend.db_name)
+    assert not old_backend.relation_endpoints
+    reached = old_backend.graph_lookup_connected_nodes(node_ids[1], relation_type_id, uni=False)
+    assert sorted(reached) == sorted(node_ids[:4])
+    reached = old_backend.graph_lookup_connected_nodes(node_ids[1], relation_type_id, uni=False, max_depth=1,
+                                                       full_nodes=True)
+    assert sorted(node.id for node in reached) == sorted(node_ids[:3])
+
+
+@pytest.mark.parametrize('uni, include_direction, inverse_direction', [
+    (True, True, False), (True, True, True), (True, False, False), (False, True, False)])
+@pytest.mark.parametrize('max_depth', [None, 1, 2])
+def test_server_traversal_matches_client_traversal(mongo_server_backend, uni, include_direction,
+                                                   inverse_direction, max_depth):
+    backend = mongo_server_backend
+    relation_type_id, node_ids = _chain(backend, uni)
+    for start_node_id in node_ids[:1] + node_ids[2:] + [ObjectId()]:
+        if uni:
+            expected = backend.get_all_uni_connected_nodes(
+                start_node_id, relation_type_id, include_direction=include_direction,
+                inverse_direction=inverse_direction, mode=MongoBackend.TraversalMode.CLIENT, max_depth=max_depth)
+        else:
+            expected = backend.get_all_bi_connected_nodes(start_node_id, relation_type_id,
+                                                          mode=MongoBackend.TraversalMode.CLIENT, max_depth=max_depth)
+        reached = backend.graph_lookup_connected_nodes(start_node_id, relation_type_id, uni, include_direction,
+                                                       inverse_direction, max_depth)
+        assert sorted(reached) == sorted(expected)
+        reached_nodes = backend.graph_lookup_connected_nodes(start_node_id, relation_type_id, uni, include_direction,
+                                                             inverse_direction, max_depth, full_nodes=True)
+        assert sorted(node.id for node in reached_nodes) == sorted(node.id for node in backend.get_nodes(expected))
+
+
+def _legacy_nodes(backend):
+    # a database from before the name search fields
+    backend.add_nodes([Node(name='Mount Everest'), Node(name='Everest Base Camp')])
+    backend.node_coll.insert_one({'name': 'Everest Massif', 'description': '', 'in_relations': [],
+                                  'out_relations': [], 'bi_relations': []})
+    backend.settings_coll.delete_one({'_id': 'name_search'})
+    return MongoBackend.MongoBackend(backend.db_path, db_name=backend.db_name)
+
+
+def test_sloppy_search_finds_nodes_without_name_search_fields(mongo_backend):
+    old_backend = _legacy_nodes(mongo_backend)
+    assert not old_backend.name_search_fields
+    assert sorted(node.name for node in old_backend.list_nodes_by_name('EVEREST', sloppy=True)) == \
+        ['Everest Base Camp', 'Everest Massif', 'Mount Everest']
+    assert [node.name for node, _ in old_backend.search_nodes('Ever', prefix=True)] == \
+        ['Everest Base Camp', 'Everest Massif']
+    assert old_backend.search_nodes('everest massif')[0][0].name == 'Everest Massif'
+
+
+def test_ensure_indexes_backfills_the_name_search_fields(mongo_backend):
+    old_backend = _legacy_nodes(mongo_backend)
+    old_backend.ensure_indexes()
+    assert old_backend.node_coll.count_documents({'name_normalized': {'$exists': False}}) == 0
+    new_backend = MongoBackend.MongoBackend(mongo_backend.db_path, db_name=mongo_backend.db_name)
+    assert new_backend.name_search_fields
+    assert sorted(node.name for node in new_backend.list_nodes_by_name('everest', sloppy=True)) == \
+        ['Everest Base Camp', 'Everest Massif', 'Mount Everest']
+
+
+def test_requested_adjacency_index_is_built_on_the_first_traversal(mongo_backend):
+    relation_type_id, node_ids = _chain(mongo_backend, uni=True)
+    backend = MongoBackend.MongoBackend(mongo_backend.db_path, db_name=mongo_backend.db_name, adjacency_index=True)
+    assert backend._client is None and backend.adjacency_index is None
+    backend.add_relation(Relation.create_relation(True, relation_type_id, node_ids[3], node_ids[4]))
+    assert backend.adjacency_index is None
+    assert sorted(backend.get_all_uni_connected_nodes(node_ids[0], relation_type_id)) == sorted(node_ids)
+    assert backend.adjacency_index is not None
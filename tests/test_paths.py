@@ -0,0 +1,135 @@
+import random
+from collections import deque
+
+import pytest
+from bson import ObjectId
+
+from NetElements.Nodes.Node import Node
+from NetElements.Relations.Relations import BiRelation, RelationType, UniRelation
+
+
+def _random_net(backend, seed):
+    rng = random.Random(seed)
+    uni_type = backend.add_rel_type(RelationType('uni', True, probabilistic=True))
+    bi_type = backend.add_rel_type(RelationType('bi', False, probabilistic=True))
+    node_ids = backend.add_nodes([Node(name=f'node {i}') for i in range(25)])
+    relations = list()
+    for _ in range(40):
+        node_1_id, node_2_id = rng.sample(node_ids, 2)
+        probability = rng.choice((0.2, 0.5, 0.9, 1.0))
+        relations.append(UniRelation(uni_type, node_1_id, node_2_id, probability) if rng.random() < 0.7 else
+                         BiRelation(bi_type, node_1_id, node_2_id, probability))
+    backend.add_relations(relations)
+    return rng, node_ids, uni_type, bi_type
+
+
+def _edges(relations, relation_type_ids, directed):
+    """
+    :return: [(node from, node to, relation)] of the relations in the directions they may be followed.
+    """
+    edges = list()
+    for relation in relations:
+        if relation.type not in relation_type_ids:
+            continue
+        edges.append((relation.node_1, relation.node_2, relation))
+        if not directed or not relation.is_uni:
+            edges.append((relation.node_2, relation.node_1, relation))
+    return edges
+
+
+def _distance(edges, start, goal):
+    distances = {start: 0}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        for node_from, node_to, _ in edges:
+            if node_from == node and node_to not in distances:
+                distances[node_to] = distances[node] + 1
+                queue.append(node_to)
+    return distances.get(goal)
+
+
+def _assert_valid_path(edges, path_nodes, path_relations, start, goal):
+    assert path_nodes[0] == start and path_nodes[-1] == goal
+    assert len(path_relations) == len(path_nodes) - 1
+    for node_from, node_to, relation in zip(path_nodes, path_nodes[1:], path_relations):
+        assert any(edge_from == node_from and edge_to == node_to and edge.id == relation.id
+                   for edge_from, edge_to, edge in edges)
+
+
+def test_shortest_path(backend):
+    rng, node_ids, uni_type, bi_type = _random_net(backend, seed=3)
+    relations = list(backend.iter_relations(True)) + list(backend.iter_relations(False))
+    for relation_type_ids, directed in (([uni_type, bi_type], False), ([uni_type, bi_type], True), ([uni_type], True)):
+        edges = _edges(relations, relation_type_ids, directed)
+        for _ in range(30):
+            start, goal = rng.sample(node_ids, 2)
+            distance = _distance(edges, start, goal)
+            path = backend.shortest_path(start, goal, relation_type_ids, directed=directed)
+            if distance is None:
+                assert path is None
+                continue
+            path_nodes, path_relations = path
+            assert len(path_relations) == distance
+            _assert_valid_path(edges, path_nodes, path_relations, start, goal)
+            assert backend.shortest_path(start, goal, relation_type_ids, max_depth=distance - 1,
+                                         directed=directed) is None
+
+
+def test_shortest_path_ends(backend):
+    node_id = backend.add_node(Node(name='alone'))
+    assert backend.shortest_path(node_id, node_id) == ([node_id], [])
+    assert backend.shortest_path(node_id, ObjectId()) is None
+
+
+def _best_probabilities(edges, start, max_depth=None):
+    """
+    Bellman-Ford on the probabilities. They are at most 1, so cycles never make a chain more probable.
+    """
+    best = {start: 1.0}
+    for _ in range(max_depth if max_depth is not None else len(edges)):
+        changed = dict()
+        for node_from, node_to, relation in edges:
+            probability = best.get(node_from, 0) * relation.probability
+            if probability > max(best.get(node_to, 0), changed.get(node_to, 0)):
+                changed[node_to] = probability
+        if not changed:
+            break
+        best.update(changed)
+    return best
+
+
+def test_most_probable_path(backend):
+    rng, node_ids, uni_type, bi_type = _random_net(backend, seed=5)
+    relations = list(backend.iter_relations(True)) + list(backend.iter_relations(False))
+    for directed, max_depth in ((False, None), (True, None), (False, 2)):
+        edges = _edges(relations, [uni_type, bi_type], directed)
+        for _ in range(20):
+            start, goal = rng.sample(node_ids, 2)
+            expected = _best_probabilities(edges, start, max_depth).get(goal)
+            path = backend.most_probable_path(start, goal, max_depth=max_depth, directed=directed)
+            if expected is None:
+                assert path is None
+                continue
+            probability, path_nodes, path_relations = path
+            assert abs(probability - expected) < 1e-9
+            _assert_valid_path(edges, path_nodes, path_relations, start, goal)
+            product = 1.0
+            for relation in path_relations:
+                product *= relation.probability
+            assert abs(product - probability) < 1e-9
+            assert backend.most_probable_path(start, goal, min_probability=expected * 1.01, max_depth=max_depth,
+                                              directed=directed) is None
+
+
+def test_most_probable_neighbours(backend):
+    rng, node_ids, uni_type, bi_type = _random_net(backend, seed=7)
+    relations = list(backend.iter_relations(True)) + list(backend.iter_relations(False))
+    edges = _edges(relations, [uni_type, bi_type], directed=False)
+    for start in rng.sample(node_ids, 5):
+        best = _best_probabilities(edges, start, max_depth=2)
+        del best[start]
+        neighbours = backend.most_probable_neighbours(start, k=4, max_depth=2)
+        assert [probability for _, probability in neighbours] == \
+            pytest.approx(sorted(best.values(), reverse=True)[:4])
+        assert all(abs(best[node_id] - probability) < 1e-9 for node_id, probability in neighbours)
@@ -0,0 +1,60 @@
+import threading
+
+from bson import ObjectId
+
+from NetElements.Relations.Relations import RelationType
+from RelationTypeCache import RelationTypeCache
+
+
+def _count_loads(backend):
+    loads = list()
+    load_relation_types = backend._load_relation_types
+
+    def counting_load():
+        loads.append(1)
+        return load_relation_types()
+    backend._load_relation_types = counting_load
+    return loads
+
+
+def test_wrong_direction_does_not_reload(backend):
+    uni_id = backend.add_rel_type(RelationType('is a', True))
+    loads = _count_loads(backend)
+    assert backend.get_relation_type(uni_id).name == 'is a'
+    assert backend.get_relation_type(uni_id, uni=False) is None
+    assert backend.get_relation_type(uni_id, uni=True).name == 'is a'
+    assert len(loads) == 1
+
+
+def test_unknown_id_reloads_once(backend):
+    loads = _count_loads(backend)
+    assert backend.get_relation_type(ObjectId()) is None
+    assert len(loads) == 2
+
+
+def test_types_of_other_processes_are_found(backend):
+    backend.get_uni_relationtypes()
+    # added behind the back of the cache
+    backend.relation_type_cache.loaded = False
+    relation_type_id = backend.add_rel_type(RelationType('knows', False))
+    backend.relation_type_cache.loaded = True
+    assert backend.get_relation_type(relation_type_id, uni=False).name == 'knows'
+
+
+def test_concurrent_misses_share_a_reload():
+    loads = list()
+    relation_type = RelationType('is a', True, relation_type_id=ObjectId())
+
+    def loader():
+        loads.append(1)
+        return [relation_type]
+    cache = RelationTypeCache()
+    cache.ensure_loaded(loader)
+    generation = cache.generation
+    threads = [threading.Thread(target=cache.reload, args=(loader, generation)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 2
+    assert cache.all(uni=True) == [relation_type]
@@ -0,0 +1,50 @@
+import random
+
+import MongoBackend
+from NetElements.Nodes.Node import Node
+from NetElements.Relations.Relations import BiRelation, RelationType, UniRelation
+
+
+def _random_net(backend, seed=1):
+    rng = random.Random(seed)
+    uni_type = backend.add_rel_type(RelationType('uni', True, reflexive=True))
+    bi_type = backend.add_rel_type(RelationType('bi', False))
+    node_ids = backend.add_nodes([Node(name=f'node {i}') for i in range(30)])
+    relations = [UniRelation(uni_type, node_ids[0], node_ids[0])]
+    for _ in range(120):
+        node_1_id, node_2_id = rng.sample(node_ids, 2)
+        relations.append(UniRelation(uni_type, node_1_id, node_2_id) if rng.random() < 0.6 else
+                         BiRelation(bi_type, node_1_id, node_2_id))
+    backend.add_relations(relations)
+    return rng, node_ids
+
+
+def _ids(relations):
+    return sorted(relation.id for relation in relations)
+
+
+def test_matches_get_relations_between(backend, monkeypatch):
+    # small query chunks to cover the chunking of the MongoBackend
+    monkeypatch.setattr(MongoBackend, 'PAIR_QUERY_BRANCHES', 7)
+    rng, node_ids = _random_net(backend)
+    pairs = [tuple(rng.sample(node_ids, 2)) for _ in range(200)] + [(node_ids[0], node_ids[0])]
+    pairs.append(pairs[0][::-1])
+    results = backend.get_relations_between_many(pairs, batch_size=37)
+    assert set(results) == set(pairs)
+    assert sum(len(uni) + len(bi) for uni, bi in results.values()) > 0
+    for pair in pairs:
+        uni_relations, bi_relations = backend.get_relations_between(*pair)
+        uni_results, bi_results = results[pair]
+        assert _ids(relation for _, relation in uni_results) == _ids(uni_relations)
+        assert _ids(relation for _, relation in bi_results) == _ids(bi_relations)
+        assert all(relation_type.id == relation.type for relation_type, relation in uni_results + bi_results)
+
+
+def test_unrelated_and_duplicate_pairs(backend):
+    node_ids = backend.add_nodes([Node(name=name) for name in 'abc'])
+    uni_type = backend.add_rel_type(RelationType('uni', True))
+    backend.add_relation(UniRelation(uni_type, node_ids[0], node_ids[1]))
+    pairs = [(node_ids[0], node_ids[1]), (node_ids[0], node_ids[1]), (node_ids[0], node_ids[2])]
+    results = backend.get_relations_between_many(pairs)
+    assert len(results[pairs[0]][0]) == 1
+    assert results[pairs[2]] == ([], [])
@@ -0,0 +1,42 @@
+from NetElements.Nodes.Node import Node, NodeView
+from NetElements.Relations.Relations import RelationType, UniRelation
+from SessionCache import CachingBackend
+
+
+def _pair(backend):
+    node_ids = backend.add_nodes([Node(name='a'), Node(name='b')])
+    is_a = backend.add_rel_type(RelationType('is a', True))
+    return node_ids, is_a
+
+
+def test_reads_are_cached(backend):
+    node_ids, is_a = _pair(backend)
+    cache = CachingBackend(backend)
+    assert cache.get_node(node_ids[0]) is cache.get_node(node_ids[0])
+    assert cache.get_relation_info_of_node(node_ids[0]) is cache.get_relation_info_of_node(node_ids[0])
+
+
+def test_writes_invalidate_the_nodes_and_their_neighbours(backend):
+    node_ids, is_a = _pair(backend)
+    cache = CachingBackend(backend)
+    cache.get_node(node_ids[1])
+    cache.get_relation_info_of_node(node_ids[1])
+    relation_id = cache.add_relation(UniRelation(is_a, node_ids[0], node_ids[1]))
+    assert cache.get_node(node_ids[1]).in_relations == [relation_id]
+    assert [info['from'].id for info in cache.get_relation_info_of_node(node_ids[1])['in_relations']] == \
+           [node_ids[0]]
+
+    cache.delete_node(node_ids[0])
+    assert cache.get_node(node_ids[1]).in_relations == []
+    assert cache.get_relation_info_of_node(node_ids[1])['in_relations'] == []
+    assert cache.get_nodes([node_ids[0]], NodeView.SUMMARY) == []
+
+
+def test_prefetch_fetches_the_neighbours(mongo_backend):
+    node_ids, is_a = _pair(mongo_backend)
+    mongo_backend.add_relation(UniRelation(is_a, node_ids[0], node_ids[1]))
+    mongo_backend.invalidate_relation_type_cache()
+    cache = CachingBackend(mongo_backend, prefetch=True)
+    cache.get_relation_info_of_node(node_ids[0])
+    cache._executor.shutdown(wait=True)
+    assert node_ids[1] in cache._relation_infos
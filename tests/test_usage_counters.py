@@ -0,0 +1,61 @@
+from collections import Counter
+
+from NetElements.Nodes.Node import Node
+from NetElements.Relations.Relations import BiRelation, RelationType, UniRelation
+
+
+def _counted(backend, uni_types, bi_types):
+    return {**backend.get_relationtype_usage_numbers(uni_types, uni=True),
+            **backend.get_relationtype_usage_numbers(bi_types, uni=False)}
+
+
+def _actual(backend):
+    return Counter(relation.type for uni in (True, False) for relation in backend.iter_relations(uni))
+
+
+def test_counters_follow_writes(backend):
+    is_a = backend.add_rel_type(RelationType('is a', True))
+    part_of = backend.add_rel_type(RelationType('part of', True))
+    knows = backend.add_rel_type(RelationType('knows', False))
+    assert _counted(backend, [is_a, part_of], [knows]) == {is_a: 0, part_of: 0, knows: 0}
+
+    node_ids = backend.add_nodes([Node(name=name) for name in 'abcd'])
+    backend.add_relation(UniRelation(is_a, node_ids[0], node_ids[1]))
+    _, failures = backend.add_relations([
+        UniRelation(is_a, node_ids[1], node_ids[2]),
+        UniRelation(part_of, node_ids[2], node_ids[3]),
+        BiRelation(knows, node_ids[0], node_ids[3]),
+        BiRelation(knows, node_ids[1], node_ids[2]),
+        # not reflexive, rejected
+        UniRelation(part_of, node_ids[0], node_ids[0]),
+    ])
+    assert [position for position, _ in failures] == [4]
+    assert _counted(backend, [is_a, part_of], [knows]) == {is_a: 2, part_of: 1, knows: 2}
+    assert backend.get_uni_relationtype_usage_number(is_a) == 2
+    assert backend.get_bi_relationtype_usage_number(knows) == 2
+
+    backend.delete_nodes([node_ids[1]])
+    assert _counted(backend, [is_a, part_of], [knows]) == {is_a: 0, part_of: 1, knows: 1}
+    assert _counted(backend, [is_a, part_of], [knows]) == {**{is_a: 0, part_of: 0, knows: 0}, **_actual(backend)}
+
+
+def test_rebuild_recounts(backend):
+    is_a = backend.add_rel_type(RelationType('is a', True))
+    knows = backend.add_rel_type(RelationType('knows', False))
+    node_ids = backend.add_nodes([Node(name=name) for name in 'abc'])
+    backend.add_relations([UniRelation(is_a, node_ids[0], node_ids[1]), UniRelation(is_a, node_ids[1], node_ids[2]),
+                           BiRelation(knows, node_ids[0], node_ids[2])])
+    counted = _counted(backend, [is_a], [knows])
+    backend.rebuild_relation_type_usage()
+    assert _counted(backend, [is_a], [knows]) == counted == {is_a: 2, knows: 1}
+
+
+def test_types_without_counter_are_counted_on_demand(mongo_backend):
+    # relation types stored before the counters were introduced
+    is_a = mongo_backend.add_rel_type(RelationType('is a', True))
+    node_ids = mongo_backend.add_nodes([Node(name=name) for name in 'ab'])
+    mongo_backend.add_relation(UniRelation(is_a, node_ids[0], node_ids[1]))
+    mongo_backend.uni_rel_type_coll.update_many({}, {'$unset': {'usage_count': ''}})
+    assert mongo_backend.get_uni_relationtype_usage_number(is_a) == 1
+    mongo_backend.rebuild_relation_type_usage()
+    assert mongo_backend.uni_rel_type_coll.find_one({'_id': is_a})['usage_count'] == 1